@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from .models import CustomUser
+from .pagination import EstimatedCountPaginator
+from .search import search_users
 
 
 @admin.register(CustomUser)
@@ -23,3 +25,11 @@ class CustomUserAdmin(UserAdmin):
     search_fields = ('email', 'phone_number')
     ordering = ('email',)
     filter_horizontal = ()
+    # Spares the changelist a COUNT(*) of the whole table when searching
+    # or filtering, and counts the results with estimate_count().
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+
+    def get_search_results(self, request, queryset, search_term):
+        # Lookups served by the trigram indexes, see apps.accounts.search.
+        return search_users(queryset, search_term.split()), False
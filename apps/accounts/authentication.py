@@ -0,0 +1,117 @@
+import functools
+
+from django.conf import settings
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import (
+    BaseAuthentication,
+    SessionAuthentication,
+    get_authorization_header,
+)
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import CustomUser
+
+
+class ClaimsTokenUser(TokenUser):
+    """
+    A user built from the claims of an access token, without a database
+    row behind it.
+    """
+
+    @cached_property
+    def is_active(self):
+        return self.token.get("is_active", False)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the is_active, is_staff and
+    is_superuser claims of the token while its auth_version claim matches
+    the user's current auth_version, which is read from the cache.
+
+    Requests with a fresh token never query the user table. Tokens issued
+    before a change of those fields, or without the claims, fall back to
+    loading the user like JWTAuthentication does.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        version = validated_token.get("auth_version")
+        if (user_id is None or version is None
+                or version != CustomUser.get_auth_version(user_id)):
+            return super().get_user(validated_token)
+
+        user = ClaimsTokenUser(validated_token)
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive")
+        return user
+
+
+@functools.lru_cache(maxsize=None)
+def _load_schemes(schemes):
+    return {
+        scheme.lower().encode(): (
+            import_string(authenticator)
+            if isinstance(authenticator, str) else authenticator)
+        for scheme, authenticator in schemes
+    }
+
+
+class SchemeAuthentication(BaseAuthentication):
+    """
+    Picks a single authenticator from the scheme of the Authorization
+    header instead of trying a list of them in turn.
+
+    A request with an Authorization header is handed to the authenticator
+    registered for its scheme in schemes, AUTHENTICATION_SCHEMES by
+    default, and is not authenticated if the scheme is unknown. A request
+    without the header is authenticated from the session, so a token
+    request never loads the session and a browser request never parses a
+    token.
+    """
+
+    schemes = None
+    session_class = SessionAuthentication
+
+    def get_schemes(self):
+        schemes = self.schemes or settings.AUTHENTICATION_SCHEMES
+        return _load_schemes(tuple(schemes.items()))
+
+    def get_authenticator(self, request):
+        """
+        Returns an instance of the authenticator the request is routed to,
+        or None if its scheme is unknown.
+        """
+        header = get_authorization_header(request).split()
+        if not header:
+            authenticator_class = self.session_class
+        else:
+            authenticator_class = self.get_schemes().get(header[0].lower())
+        return authenticator_class() if authenticator_class else None
+
+    def authenticate(self, request):
+        authenticator = self.get_authenticator(request)
+        if authenticator is None:
+            return None
+        return authenticator.authenticate(request)
+
+    def authenticate_header(self, request):
+        authenticator = self.get_authenticator(request)
+        if authenticator is None:
+            return None
+        return authenticator.authenticate_header(request)
+
+
+class StatelessSchemeAuthentication(SchemeAuthentication):
+    """
+    SchemeAuthentication routing bearer tokens to
+    StatelessJWTAuthentication.
+    """
+
+    schemes = {"Bearer": StatelessJWTAuthentication}
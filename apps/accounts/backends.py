@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+from .caches import cache_is_shared
+
+
+class CachedPermissionBackend(ModelBackend):
+    """
+    Authentication backend keeping each user's permission set in the
+    Django cache, so checking a permission is a single cache GET instead
+    of joins over the user, group and permission tables.
+
+    Entries are deleted by the signals in apps.accounts.signals whenever
+    the groups or permissions of a user, or the permissions of a group,
+    change. Bumping PERMISSION_CACHE_VERSION discards every entry at once.
+    Without a shared cache, a deletion would only reach the process that
+    made the change, so permissions are then read from the database.
+    """
+
+    key_prefix = "accounts:perms"
+
+    @classmethod
+    def get_cache_key(cls, user_id):
+        return f"{cls.key_prefix}:{user_id}"
+
+    @classmethod
+    def invalidate(cls, user_ids):
+        """
+        Forgets the cached permissions of the given users.
+
+        Args:
+            user_ids (iterable): The ids of the users.
+        """
+        keys = [cls.get_cache_key(user_id) for user_id in user_ids]
+        if keys:
+            cache.delete_many(keys, version=settings.PERMISSION_CACHE_VERSION)
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if (not user_obj.is_active or user_obj.is_anonymous
+                or obj is not None or not cache_is_shared()):
+            return super().get_all_permissions(user_obj, obj)
+        if not hasattr(user_obj, "_perm_cache"):
+            key = self.get_cache_key(user_obj.pk)
+            perms = cache.get(key, version=settings.PERMISSION_CACHE_VERSION)
+            if perms is None:
+                perms = super().get_all_permissions(user_obj)
+                cache.set(
+                    key, perms, settings.PERMISSION_CACHE_TIMEOUT,
+                    version=settings.PERMISSION_CACHE_VERSION)
+            user_obj._perm_cache = perms
+        return user_obj._perm_cache
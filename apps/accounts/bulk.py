@@ -0,0 +1,258 @@
+"""
+Bulk import and export of users as CSV or newline-delimited JSON.
+
+Both directions stream: an import reads its input one batch of rows at a
+time, hashes the passwords of the batch on a PasswordHashingPool and
+inserts the batch with a single bulk_create; an export iterates over the
+users with a server-side cursor and yields one line at a time. Neither
+holds more than a batch of users in memory.
+"""
+import csv
+import io
+import itertools
+import json
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from .models import CustomUser
+from .versions import bump_versions
+
+FORMATS = ("csv", "ndjson")
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+EXPORT_FIELDS = ("id", "email", "phone_number", "is_active", "is_staff",
+                 "is_superuser", "date_joined", "last_login")
+
+_TRUE = {"1", "true", "yes", "y", "t"}
+_FALSE = {"", "0", "false", "no", "n", "f"}
+
+_phone_number_max_length = CustomUser._meta.get_field(
+    "phone_number").max_length
+
+
+def read_rows(stream, file_format):
+    """
+    Reads users from a text stream.
+
+    Args:
+        stream: A text stream, such as an open file.
+        file_format (str): "csv", with a header row naming the columns,
+            or "ndjson", with one JSON object per line.
+
+    Yields:
+        (line, row) tuples, row being a dict, or a str describing why the
+        line could not be read.
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == "ndjson":
+        for line, text in enumerate(stream, start=1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError as e:
+                yield line, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line, "Expected a JSON object."
+                continue
+            yield line, row
+    else:
+        raise ValueError(f"Unknown format {file_format!r}.")
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value if value is not None else "").strip().lower()
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    raise ValidationError(f"{value!r} is not a boolean.")
+
+
+def _clean(row):
+    email = CustomUser.objects.normalize_email(
+        str(row.get("email") or "").strip())
+    if not email:
+        raise ValidationError("The email is required.")
+    validate_email(email)
+    phone_number = str(row.get("phone_number") or "").strip()
+    if len(phone_number) > _phone_number_max_length:
+        raise ValidationError(
+            f"The phone number has more than "
+            f"{_phone_number_max_length} characters.")
+    password = row.get("password")
+    return CustomUser(
+        email=email,
+        phone_number=phone_number,
+        is_active=_to_bool(row.get("is_active")),
+        password=str(password) if password not in (None, "") else None,
+    )
+
+
+def _drop_existing(lines, users, errors):
+    """
+    Reports the users whose email is already taken.
+
+    Returns:
+        The lines and users left.
+    """
+    existing = set(CustomUser.objects.filter(
+        email__in=[user.email for user in users]).values_list(
+            "email", flat=True))
+    if not existing:
+        return lines, users
+    kept = []
+    for line, user in zip(lines, users):
+        if user.email in existing:
+            errors.append({"line": line, "errors": [
+                "A user with this email already exists."]})
+        else:
+            kept.append((line, user))
+    return [line for line, _ in kept], [user for _, user in kept]
+
+
+def _import_batch(batch, pool, seen):
+    """
+    Validates, hashes and inserts one batch of rows.
+
+    Returns:
+        The number of users created and the list of errors.
+    """
+    errors = []
+    users = []
+    lines = []
+    for line, row in batch:
+        if isinstance(row, str):
+            errors.append({"line": line, "errors": [row]})
+            continue
+        try:
+            user = _clean(row)
+        except ValidationError as e:
+            errors.append({"line": line, "errors": e.messages})
+            continue
+        if user.email in seen:
+            errors.append({"line": line, "errors": [
+                "The email appears more than once."]})
+            continue
+        seen.add(user.email)
+        users.append(user)
+        lines.append(line)
+
+    lines, users = _drop_existing(lines, users, errors)
+
+    with_password = [user for user in users if user.password]
+    for user, encoded in zip(with_password, pool.make_passwords(
+            [user.password for user in with_password])):
+        user.password = encoded
+    unusable = make_password(None)
+    for user in users:
+        if not user.password:
+            user.password = unusable
+
+    while users:
+        try:
+            with transaction.atomic():
+                CustomUser.objects.bulk_create(users)
+                # bulk_create sends no signal.
+                bump_versions()
+            break
+        except IntegrityError:
+            # Another import created some of the same users meanwhile:
+            # retry without them.
+            count = len(users)
+            lines, users = _drop_existing(lines, users, errors)
+            if len(users) == count:
+                errors.extend(
+                    {"line": line,
+                     "errors": ["The user could not be created."]}
+                    for line in lines)
+                return 0, errors
+    return len(users), errors
+
+
+def import_users(rows, pool, batch_size):
+    """
+    Creates users from rows, batch_size at a time.
+
+    Users are created inactive unless their is_active column says
+    otherwise; those without a password get an unusable one. Rows with
+    an invalid value, or an email that is already taken or appears
+    earlier in the input, are reported and skipped.
+
+    Args:
+        rows (iterable): (line, row) tuples, as yielded by read_rows().
+        pool (PasswordHashingPool): The pool passwords are hashed on.
+        batch_size (int): The number of rows per bulk_create.
+
+    Returns:
+        A dict with the number of users created and the list of errors,
+        each a dict with the line and the messages.
+    """
+    created = 0
+    errors = []
+    seen = set()
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+        batch_created, batch_errors = _import_batch(batch, pool, seen)
+        created += batch_created
+        errors.extend(batch_errors)
+    errors.sort(key=lambda error: error["line"])
+    return {"created": created, "errors": errors}
+
+
+def _export_value(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def export_users(queryset, file_format, chunk_size=2000):
+    """
+    Serializes users without their password.
+
+    Args:
+        queryset (QuerySet): The users to export.
+        file_format (str): "csv" or "ndjson".
+        chunk_size (int): The number of rows fetched per round trip.
+
+    Yields:
+        The lines of the export, each ending with a line break.
+    """
+    rows = queryset.values_list(*EXPORT_FIELDS).iterator(
+        chunk_size=chunk_size)
+    if file_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def line(values):
+            writer.writerow(values)
+            text = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return text
+
+        yield line(EXPORT_FIELDS)
+        for row in rows:
+            yield line([_export_value(value) for value in row])
+    elif file_format == "ndjson":
+        for row in rows:
+            yield json.dumps(dict(zip(
+                EXPORT_FIELDS,
+                (_export_value(value) for value in row)))) + "\n"
+    else:
+        raise ValueError(f"Unknown format {file_format!r}.")
@@ -0,0 +1,26 @@
+"""
+Whether the Django cache is shared between processes.
+
+The login lockout, the token deny list, buffered last logins, cached
+permissions and the versions of users keep state in the default cache that every web and
+Celery worker has to see. The local memory and dummy backends keep it per
+process, so features that cannot work without a shared cache fall back
+to the database when either is configured.
+"""
+from django.conf import settings
+
+# Backends whose entries are only seen by the process that set them.
+PROCESS_LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def cache_is_shared(alias="default"):
+    """
+    Returns whether the entries of a cache are seen by every process.
+
+    Args:
+        alias (str): The alias of the cache in CACHES.
+    """
+    return settings.CACHES[alias]["BACKEND"] not in PROCESS_LOCAL_BACKENDS
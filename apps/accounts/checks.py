@@ -0,0 +1,23 @@
+from django.core.checks import Error, Tags, register
+
+from .caches import cache_is_shared
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Fails the deployment checks when the default cache is local to each
+    process: token revocations would only be seen by the process that
+    made them.
+    """
+    if cache_is_shared():
+        return []
+    return [
+        Error(
+            "The default cache is not shared between processes.",
+            hint="Revoked tokens, login failures, cached permissions and "
+                 "user versions are shared through the default cache; "
+                 "configure Redis in CACHES, as cookiecutter.settings does.",
+            id="accounts.E001",
+        )
+    ]
@@ -0,0 +1,90 @@
+"""
+IP address to location lookups against a local MaxMind database.
+
+The database is opened memory-mapped, so every worker process shares the
+operating system's page cache instead of loading its own copy. Lookups are
+cached per network prefix, as addresses of the same /24 (IPv4) or /48
+(IPv6) network almost always resolve to the same place.
+"""
+import functools
+import ipaddress
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import maxminddb
+except ImportError:  # pragma: no cover
+    maxminddb = None
+
+IPV4_PREFIX = 24
+IPV6_PREFIX = 48
+
+
+class GeoIPLocator:
+    """
+    Resolves IP addresses to "City, Country" strings.
+
+    Args:
+        reader: An open database, anything with a get(ip_address) method
+            returning a MaxMind City or Country record.
+        cache_size (int): The number of network prefixes to remember.
+    """
+
+    def __init__(self, reader, cache_size):
+        self.reader = reader
+        self._locate_network = functools.lru_cache(maxsize=cache_size)(
+            self._locate_network)
+
+    def locate(self, ip_address):
+        """
+        Resolves an IP address.
+
+        Args:
+            ip_address (str): The IP address.
+
+        Returns:
+            The location, or None if the address is not in the database.
+        """
+        address = ipaddress.ip_address(ip_address)
+        prefix = IPV4_PREFIX if address.version == 4 else IPV6_PREFIX
+        return self._locate_network(
+            ipaddress.ip_network(f"{address}/{prefix}", strict=False))
+
+    def _locate_network(self, network):
+        record = self.reader.get(str(network.network_address))
+        if not record:
+            return None
+        names = [
+            record.get(part, {}).get("names", {}).get("en")
+            for part in ("city", "country")
+        ]
+        location = ", ".join(name for name in names if name)
+        return location[:255] or None
+
+    def cache_info(self):
+        return self._locate_network.cache_info()
+
+
+_locator = None
+
+
+def get_geoip_locator():
+    """
+    Returns the GeoIPLocator of this process, opening GEOIP_DATABASE the
+    first time.
+
+    Returns:
+        The GeoIPLocator, or None if GEOIP_DATABASE is not set.
+    """
+    global _locator
+    if _locator is None and settings.GEOIP_DATABASE:
+        if maxminddb is None:
+            raise ImproperlyConfigured(
+                "GEOIP_DATABASE is set but maxminddb is not installed.")
+        _locator = GeoIPLocator(
+            maxminddb.open_database(
+                settings.GEOIP_DATABASE, maxminddb.MODE_MMAP),
+            settings.GEOIP_CACHE_SIZE,
+        )
+    return _locator
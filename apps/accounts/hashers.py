@@ -0,0 +1,153 @@
+"""
+Password hashers with a cost taken from the settings, and a bounded pool
+to run hashing on.
+
+The hashers keep the algorithm names of the Django hashers they extend,
+so existing hashes stay valid. Raising the cost, or switching
+PASSWORD_HASHING_PROFILE, upgrades each password the next time its user
+logs in: Django rehashes a correct password whenever its hash was made by
+another hasher or with other parameters than the preferred one.
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.exceptions import ImproperlyConfigured
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2 with PASSWORD_PBKDF2_ITERATIONS iterations.
+    """
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2 with the time cost, memory cost in KiB and parallelism of
+    PASSWORD_ARGON2_TIME_COST, PASSWORD_ARGON2_MEMORY_COST and
+    PASSWORD_ARGON2_PARALLELISM. Requires argon2-cffi.
+    """
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+def _check_password(password, encoded):
+    # Module level, so a process pool can pickle it.
+    updates = []
+    is_correct = hashers.check_password(
+        password, encoded, setter=updates.append)
+    return is_correct, bool(updates)
+
+
+class PasswordHashingPool:
+    """
+    Runs password hashing on a bounded pool of workers, so at most that
+    many requests burn CPU on hashing at the same time.
+
+    Args:
+        kind (str): "thread", "process", or None to hash in the calling
+            thread. Threads are enough for hashers releasing the GIL, as
+            PBKDF2 and Argon2 do; processes also bound hashers that don't.
+        workers (int): The number of workers.
+    """
+
+    def __init__(self, kind, workers):
+        self.workers = workers
+        if kind == "thread":
+            self.executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="password-hashing")
+        elif kind == "process":
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers, initializer=django.setup)
+        elif kind is None:
+            self.executor = None
+        else:
+            raise ImproperlyConfigured(
+                f"Unknown PASSWORD_HASHING_POOL {kind!r}.")
+
+    def _run(self, function, *args):
+        if self.executor is None:
+            return function(*args)
+        return self.executor.submit(function, *args).result()
+
+    def make_password(self, password):
+        """
+        Hashes a password with the preferred hasher.
+
+        Args:
+            password (str): The raw password, or None for an unusable one.
+
+        Returns:
+            The encoded password.
+        """
+        return self._run(hashers.make_password, password)
+
+    def make_passwords(self, passwords):
+        """
+        Hashes many passwords, spread over the workers.
+
+        Args:
+            passwords (list): The raw passwords.
+
+        Returns:
+            The list of encoded passwords, in the same order.
+        """
+        if self.executor is None:
+            return [hashers.make_password(password) for password in passwords]
+        return list(self.executor.map(
+            hashers.make_password, passwords,
+            chunksize=max(1, len(passwords) // (self.workers * 4))))
+
+    def check_password(self, password, encoded):
+        """
+        Checks a password against its hash.
+
+        Args:
+            password (str): The raw password.
+            encoded (str): The encoded password.
+
+        Returns:
+            A (is_correct, must_update) tuple; must_update is True when
+            the password is correct but its hash should be upgraded.
+        """
+        return self._run(_check_password, password, encoded)
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_password_hashing_pool():
+    """
+    Returns the PasswordHashingPool of this process, configured from the
+    PASSWORD_HASHING_POOL and PASSWORD_HASHING_WORKERS settings.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PasswordHashingPool(
+                    settings.PASSWORD_HASHING_POOL,
+                    settings.PASSWORD_HASHING_WORKERS,
+                )
+    return _pool
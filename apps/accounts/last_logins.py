@@ -0,0 +1,126 @@
+"""
+Last login times buffered in the Django cache.
+
+Issuing a token does not update CustomUser.last_login. Each login is
+appended to a log of numbered cache entries instead, and the
+flush-last-logins task writes the log to the database with one bulk UPDATE
+per batch of users, keeping only the latest login of each of them.
+Recording a login is two cache round trips and never touches the users
+table.
+
+The log has to be seen by the Celery worker running the flush, so when
+the cache is local to each process, logins are written to the users
+table right away instead.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .caches import cache_is_shared
+from .models import CustomUser
+from .versions import bump_versions
+
+PREFIX = "accounts:last_login"
+SEQUENCE_KEY = f"{PREFIX}:seq"
+CURSOR_KEY = f"{PREFIX}:cursor"
+
+
+def _entry_key(number):
+    return f"{PREFIX}:{number}"
+
+
+def record_last_login(user_id, timestamp=None):
+    """
+    Appends a login to the log. Entries that are not flushed within
+    LAST_LOGIN_BUFFER_TIMEOUT seconds expire. Without a shared cache, the
+    login is written to the user instead.
+
+    Args:
+        user_id (int): The id of the user who logged in.
+        timestamp (datetime): When the user logged in, now by default.
+    """
+    timestamp = timestamp or timezone.now()
+    if not cache_is_shared():
+        CustomUser.objects.filter(pk=user_id).update(last_login=timestamp)
+        # update() sends no signal.
+        bump_versions([user_id])
+        return
+
+    cache.add(SEQUENCE_KEY, 0, None)
+    try:
+        number = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        # The sequence was evicted between add() and incr().
+        cache.add(SEQUENCE_KEY, 0, None)
+        number = cache.incr(SEQUENCE_KEY)
+    cache.set(
+        _entry_key(number), (user_id, timestamp),
+        settings.LAST_LOGIN_BUFFER_TIMEOUT)
+
+
+def _read_log(first, last, batch_size):
+    """
+    Yields the number and entry of each login of the log from first to
+    last, None for missing entries, reading batch_size entries at a time.
+    """
+    for start in range(first, last + 1, batch_size):
+        numbers = range(start, min(start + batch_size, last + 1))
+        entries = cache.get_many([_entry_key(number) for number in numbers])
+        for number in numbers:
+            yield number, entries.get(_entry_key(number))
+
+
+def write_last_logins(batch_size):
+    """
+    Writes the logins appended since the previous flush to
+    CustomUser.last_login and removes them from the log.
+
+    A login is numbered before its entry is set, so an entry missing from
+    the log may still be on its way. Missing entries numbered before the
+    previous flush read the log have had a whole run interval to be set
+    and are skipped as expired; the flush stops at the first more recent
+    one, which the next flush reads again.
+
+    Args:
+        batch_size (int): The number of log entries read per round trip.
+
+    Returns:
+        A dict with the number of log entries read and of users updated.
+    """
+    last = cache.get(SEQUENCE_KEY, 0)
+    # Entries up to settled were numbered before the previous flush.
+    cursor, settled = cache.get(CURSOR_KEY, (0, 0))
+    if cursor > last:
+        # The sequence was evicted and started over.
+        cursor = settled = 0
+
+    latest = {}
+    read = 0
+    flushed = cursor
+    for number, entry in _read_log(cursor + 1, last, batch_size):
+        if entry is None and number > settled:
+            # Numbered since the previous flush, and maybe not set yet.
+            break
+        flushed = number
+        if entry is None:
+            continue
+        user_id, timestamp = entry
+        read += 1
+        if user_id not in latest or timestamp > latest[user_id]:
+            latest[user_id] = timestamp
+
+    CustomUser.objects.bulk_update(
+        [CustomUser(pk=user_id, last_login=timestamp)
+         for user_id, timestamp in latest.items()],
+        ["last_login"],
+        batch_size=batch_size,
+    )
+    if latest:
+        # bulk_update sends no signal.
+        bump_versions(latest)
+    # Only forgotten once written, so a failed run is retried.
+    cache.set(CURSOR_KEY, (flushed, last), None)
+    keys = [_entry_key(number) for number in range(cursor + 1, flushed + 1)]
+    for start in range(0, len(keys), batch_size):
+        cache.delete_many(keys[start:start + batch_size])
+    return {"read": read, "updated": len(latest)}
@@ -0,0 +1,123 @@
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from rest_framework.authentication import (
+    SessionAuthentication,
+    TokenAuthentication,
+)
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from apps.accounts.authentication import (
+    SchemeAuthentication,
+    StatelessSchemeAuthentication,
+)
+from apps.accounts.models import CustomUser
+from apps.accounts.serializers import ClaimsTokenObtainPairSerializer
+from apps.accounts.views import UserVisitHistoryAPIView
+
+AUTHENTICATION_MIDDLEWARE = (
+    "django.contrib.auth.middleware.AuthenticationMiddleware")
+
+# (label, session middleware, authentication classes)
+CONFIGURATIONS = (
+    ("session, token, jwt",
+     "django.contrib.sessions.middleware.SessionMiddleware",
+     (SessionAuthentication, TokenAuthentication, JWTAuthentication)),
+    ("scheme",
+     "apps.accounts.middleware.PathSessionMiddleware",
+     (SchemeAuthentication,)),
+    ("stateless scheme",
+     "apps.accounts.middleware.PathSessionMiddleware",
+     (StatelessSchemeAuthentication,)),
+)
+
+
+class Command(BaseCommand):
+    """
+    Measures the requests per second of the visit history endpoint with
+    the former authentication setup, where sessions are loaded and every
+    authentication class is tried in turn, against SchemeAuthentication
+    with PathSessionMiddleware.
+
+    Requests carry a bearer token and the cookie of an anonymous session,
+    as a browser talking to the API does. They go through the session and
+    authentication middleware and the view, without the rest of the
+    stack; the benchmark user and session are deleted at the end.
+    """
+
+    help = "Benchmark request authentication setups."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests", type=int, default=2000,
+            help="Number of requests made with each setup.",
+        )
+
+    def handle(self, *args, **options):
+        count = options["requests"]
+        path = reverse("visit_history")
+        if not path.startswith(tuple(settings.SESSIONLESS_PATH_PREFIXES)):
+            self.stderr.write(
+                f"{path} is not in SESSIONLESS_PATH_PREFIXES, sessions "
+                f"are loaded with every setup.")
+
+        self.stdout.write(
+            f"{'setup':>20} {'requests/s':>11} {'queries':>8}")
+
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        try:
+            user = CustomUser.objects.create_user(
+                email="auth@benchmark.invalid", password=None)
+            user.is_active = True
+            user.save()
+            token = ClaimsTokenObtainPairSerializer.get_token(user)
+
+            session["benchmark"] = True
+            session.create()
+            factory = RequestFactory(
+                HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+            factory.cookies[settings.SESSION_COOKIE_NAME] = (
+                session.session_key)
+
+            for label, session_middleware, classes in CONFIGURATIONS:
+                handler = self.build_handler(
+                    [session_middleware, AUTHENTICATION_MIDDLEWARE],
+                    UserVisitHistoryAPIView.as_view(
+                        authentication_classes=classes),
+                )
+                response = handler(factory.get(path))
+                if response.status_code != 200:
+                    self.stderr.write(
+                        f"{label}: status {response.status_code}")
+                    continue
+
+                self.queries = 0
+                with connection.execute_wrapper(self.count_query):
+                    start = time.perf_counter()
+                    for _ in range(count):
+                        handler(factory.get(path))
+                    elapsed = time.perf_counter() - start
+
+                self.stdout.write(
+                    f"{label:>20} {count / elapsed:>11.0f} "
+                    f"{self.queries / count:>8.1f}")
+        finally:
+            session.delete()
+            CustomUser.objects.filter(
+                email__endswith="@benchmark.invalid").delete()
+
+    def build_handler(self, middleware, view):
+        handler = view
+        for middleware_path in reversed(middleware):
+            handler = import_string(middleware_path)(handler)
+        return handler
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
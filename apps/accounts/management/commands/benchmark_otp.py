@@ -0,0 +1,85 @@
+import statistics
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from apps.accounts.models import CustomUser, OTP
+
+
+class Command(BaseCommand):
+    """
+    Measures OTP issuance latency while other users hold an increasing
+    number of active codes.
+
+    Every level seeds one active OTP per holder, using a distinct code for
+    each of them, so at 9,999 outstanding codes only one code of the 4-digit
+    space is still globally free. Issuance runs in autocommit mode, as it
+    does in a request; the benchmark users are deleted at the end.
+    """
+
+    help = "Benchmark OTP issuance against the number of outstanding codes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--outstanding", type=int, nargs="+",
+            default=[0, 2500, 5000, 7500, 9999],
+            help="Numbers of outstanding codes to measure at.",
+        )
+        parser.add_argument(
+            "--samples", type=int, default=200,
+            help="Number of OTPs issued at each level.",
+        )
+
+    def handle(self, *args, **options):
+        levels = sorted(options["outstanding"])
+        samples = options["samples"]
+
+        if levels and levels[-1] >= OTP.CODE_SPACE:
+            self.stderr.write(
+                f"At most {OTP.CODE_SPACE - 1} codes can be outstanding.")
+            return
+
+        self.stdout.write(
+            f"{'outstanding':>12} {'median ms':>10} "
+            f"{'p95 ms':>8} {'queries':>8}")
+
+        try:
+            password = make_password(None)
+            holders = CustomUser.objects.bulk_create(
+                CustomUser(email=f"otp-holder-{i}@benchmark.invalid",
+                           password=password)
+                for i in range(levels[-1] if levels else 0)
+            )
+            user = CustomUser.objects.create(
+                email="otp-issuer@benchmark.invalid", password=password)
+
+            seeded = 0
+            for level in levels:
+                OTP.objects.bulk_create(
+                    OTP(user=holder, code=str(i).zfill(4))
+                    for i, holder in enumerate(
+                        holders[seeded:level], start=seeded)
+                )
+                seeded = level
+
+                timings = []
+                with CaptureQueriesContext(connection) as queries:
+                    for _ in range(samples):
+                        start = time.perf_counter()
+                        OTP.create(user)
+                        timings.append(
+                            (time.perf_counter() - start) * 1000)
+
+                timings.sort()
+                self.stdout.write(
+                    f"{level:>12} "
+                    f"{statistics.median(timings):>10.3f} "
+                    f"{timings[int(len(timings) * 0.95) - 1]:>8.3f} "
+                    f"{len(queries) / samples:>8.1f}"
+                )
+        finally:
+            CustomUser.objects.filter(
+                email__endswith="@benchmark.invalid").delete()
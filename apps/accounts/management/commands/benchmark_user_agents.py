@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.accounts.useragents import (
+    classify, parse_user_agent, parse_user_agents)
+
+SAMPLES = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/{v}.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 "
+    "(KHTML, like Gecko) Version/{v}.1 Safari/605.1.15",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_5 like Mac OS X) "
+    "AppleWebKit/605.1.15 (KHTML, like Gecko) Version/{v}.0 Mobile/15E148 "
+    "Safari/604.1",
+    "Mozilla/5.0 (Linux; Android 13; SM-S901B) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/{v}.0.0.0 Mobile Safari/537.36",
+    "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:{v}.0) Gecko/20100101 "
+    "Firefox/{v}.0",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/{v}.0.0.0 Safari/537.36 Edg/{v}.0.0.0",
+    "Mozilla/5.0 (compatible; Googlebot/2.1; "
+    "+http://www.google.com/bot.html) v{v}",
+)
+
+
+class Command(BaseCommand):
+    """
+    Compares user agent parsing throughput with a cold and a warm cache.
+
+    The same stream of user agents is parsed without the cache, starting
+    from an empty cache, once the cache holds every string, as a
+    long-running worker does, and through the batch API.
+    """
+
+    help = "Benchmark cold and warm cache user agent parsing."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--distinct", type=int, default=500,
+            help="Number of distinct user agent strings.",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=100000,
+            help="Number of user agents parsed per pass.",
+        )
+
+    def handle(self, *args, **options):
+        distinct = [
+            SAMPLES[i % len(SAMPLES)].format(v=i // len(SAMPLES) + 50)
+            for i in range(options["distinct"])
+        ]
+        stream = [
+            distinct[i % len(distinct)] for i in range(options["requests"])
+        ]
+
+        self.stdout.write(f"{'pass':>10} {'parses/s':>12} {'hit rate':>9}")
+        self.measure("uncached", lambda: [classify(ua) for ua in stream],
+                     stream)
+        parse_user_agent.cache_clear()
+        self.measure(
+            "cold", lambda: [parse_user_agent(ua) for ua in stream], stream)
+        self.measure(
+            "warm", lambda: [parse_user_agent(ua) for ua in stream], stream)
+        self.measure("batch", lambda: parse_user_agents(stream), stream)
+
+    def measure(self, name, run, stream):
+        before = parse_user_agent.cache_info()
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        after = parse_user_agent.cache_info()
+        hits = after.hits - before.hits
+        calls = hits + after.misses - before.misses
+        hit_rate = f"{hits / calls:.1%}" if calls else "-"
+        self.stdout.write(
+            f"{name:>10} {len(stream) / elapsed:>12,.0f} {hit_rate:>9}")
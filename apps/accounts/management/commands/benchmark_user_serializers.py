@@ -0,0 +1,93 @@
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from apps.accounts.models import CustomUser
+from apps.accounts.serializers import CustomUserSerializer
+from apps.accounts.views import CustomUserViewSet
+
+EMAIL_DOMAIN = "@benchmark.invalid"
+
+
+class Command(BaseCommand):
+    """
+    Measures how long listing users takes with CustomUserSerializer over
+    a plain queryset, as the user list used to, against the querysets and
+    CustomUserReadSerializer of CustomUserViewSet, with all fields and
+    with a sparse fieldset.
+
+    The benchmark users, each a member of one group, are created at the
+    start and deleted at the end.
+    """
+
+    help = "Benchmark the serialization of the user list."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=10000,
+            help="Number of users serialized.",
+        )
+        parser.add_argument(
+            "--fields", default="id,email",
+            help="Fields of the sparse fieldset.",
+        )
+
+    def handle(self, *args, **options):
+        count = options["users"]
+        self.stdout.write(
+            f"{'setup':>24} {'fetch s':>8} {'serialize s':>12} "
+            f"{'queries':>8}")
+        try:
+            self.create_users(count)
+            self.run("model serializer", CustomUser.objects.all(),
+                     lambda users: CustomUserSerializer(users, many=True))
+            self.run_view("read serializer", {})
+            self.run_view(f"fields={options['fields']}",
+                          {"fields": options["fields"]})
+        finally:
+            CustomUser.objects.filter(email__endswith=EMAIL_DOMAIN).delete()
+            Group.objects.filter(name="benchmark").delete()
+
+    def create_users(self, count):
+        password = make_password(None)
+        users = CustomUser.objects.bulk_create(
+            (CustomUser(email=f"user{i}{EMAIL_DOMAIN}", password=password)
+             for i in range(count)),
+            batch_size=2000,
+        )
+        group = Group.objects.create(name="benchmark")
+        Membership = CustomUser.groups.through
+        Membership.objects.bulk_create(
+            (Membership(customuser_id=user.pk, group_id=group.pk)
+             for user in users),
+            batch_size=2000,
+        )
+
+    def run_view(self, label, params):
+        view = CustomUserViewSet(action="list", format_kwarg=None)
+        view.request = Request(RequestFactory().get("/", params))
+        queryset = view.get_queryset()
+        self.run(label, queryset,
+                 lambda users: view.get_serializer(users, many=True))
+
+    def run(self, label, queryset, serializer):
+        queryset = queryset.filter(email__endswith=EMAIL_DOMAIN)
+        self.queries = 0
+        with connection.execute_wrapper(self.count_query):
+            start = time.perf_counter()
+            users = list(queryset)
+            fetched = time.perf_counter()
+            serializer(users).data
+            serialized = time.perf_counter()
+        self.stdout.write(
+            f"{label:>24} {fetched - start:>8.2f} "
+            f"{serialized - fetched:>12.2f} {self.queries:>8}")
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from apps.accounts.models import UserAgent
+from apps.accounts.useragents import parse_user_agents
+
+
+class Command(BaseCommand):
+    """
+    Classifies the user agents recorded before classification existed.
+
+    Visit and login history reference their user agent through the
+    UserAgent table, so classifying its rows classifies every history row.
+    """
+
+    help = "Classify the stored user agents by browser, device and OS."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of user agents classified per query.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        last_pk = 0
+        classified = 0
+
+        while True:
+            rows = list(
+                UserAgent.objects.filter(
+                    pk__gt=last_pk, browser_ref__isnull=True)
+                .order_by("pk")
+                .only("pk", "value")[:batch_size]
+            )
+            if not rows:
+                break
+            parse_user_agents(row.value for row in rows)
+            for row in rows:
+                for field, intern in UserAgent.classify(row.value).items():
+                    setattr(row, field, intern())
+            UserAgent.objects.bulk_update(
+                rows, ["browser_ref", "device_ref", "os_ref"])
+
+            last_pk = rows[-1].pk
+            classified += len(rows)
+            self.stdout.write(f"Classified {classified} user agents.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Done, {classified} user agents classified."))
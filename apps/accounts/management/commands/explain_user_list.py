@@ -0,0 +1,140 @@
+import itertools
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from apps.accounts.models import CustomUser
+from apps.accounts.search import has_trigram_indexes
+from apps.accounts.views import CustomUserViewSet
+
+# One value per filter of CustomUserViewSet, matching a seeded user.
+FILTERS = (
+    {},
+    {"phone_number": "10000002"},
+    {"email": "user2@explain.invalid"},
+    {"email__iexact": "USER2@Explain.Invalid"},
+    {"is_active": "true"},
+    {"is_active": "false"},
+    {"is_staff": "true"},
+    {"is_staff": "false"},
+)
+# Searches, checked only where the trigram indexes exist.
+SEARCHES = (
+    {"search": "ser12345@"},
+    {"search": "0012346"},
+)
+ORDERINGS = (None, "email", "-email", "date_joined", "-date_joined")
+
+SEED_SQL = """
+    INSERT INTO {table} (password, email, phone_number, is_active, is_staff,
+                         is_superuser, date_joined, auth_version)
+    SELECT '!', 'user' || i || '@explain.invalid',
+           CASE WHEN i %% 2 = 0 THEN (10000000 + i)::text ELSE '' END,
+           i %% 10 = 0, i %% 1000 = 0, false,
+           now() - (%s - i) * interval '1 minute', 0
+    FROM generate_series(1, %s) AS i
+"""
+
+
+class Command(BaseCommand):
+    """
+    Checks that every filter and ordering of the user list is served by
+    an index: seeds the user table, then runs EXPLAIN ANALYZE on the query
+    of the first page of the list for each combination. It fails if a
+    plan scans the table sequentially, or walks an index past more than
+    --max-filtered rows it then filters out, as a primary key scan does
+    to find rare rows.
+
+    Seeded users are inactive but for one in ten, and staff one in a
+    thousand; half have a phone number. They are inserted, and the table
+    analyzed, in a transaction rolled back at the end. Requires
+    PostgreSQL.
+    """
+
+    help = "Check the query plans of the user list filters and orderings."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=1000000,
+            help="Number of users seeded.",
+        )
+        parser.add_argument(
+            "--max-filtered", type=int, default=10000,
+            help="Number of rows a plan may read and discard.",
+        )
+        parser.add_argument(
+            "--disable-seqscan", action="store_true",
+            help="Discourage sequential scans, to check an index can "
+                 "serve each query on a table too small for the planner "
+                 "to prefer one.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Query plans are only checked on PostgreSQL.")
+        table = CustomUser._meta.db_table
+        failures = []
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    SEED_SQL.format(table=connection.ops.quote_name(table)),
+                    [options["users"], options["users"]])
+                cursor.execute(f"ANALYZE {connection.ops.quote_name(table)}")
+                if options["disable_seqscan"]:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+
+            self.stdout.write(
+                f"{'plan':>8} {'filtered':>9} {'ms':>9}  query")
+            filters = FILTERS
+            if has_trigram_indexes():
+                filters += SEARCHES
+            else:
+                self.stderr.write(
+                    "The trigram indexes are missing, searches are not "
+                    "checked.")
+            seq_scan = re.compile(rf"Seq Scan on {re.escape(table)}\b")
+            for params, ordering in itertools.product(filters, ORDERINGS):
+                params = dict(params)
+                if ordering:
+                    params["ordering"] = ordering
+                plan = self.first_page(params).explain(analyze=True)
+                label = "&".join(f"{k}={v}" for k, v in params.items())
+                filtered = sum(int(rows) for rows in re.findall(
+                    r"Rows Removed by Filter: (\d+)", plan))
+                elapsed = float(re.search(
+                    r"Execution Time: ([\d.]+)", plan).group(1))
+                if seq_scan.search(plan):
+                    verdict = "SEQ SCAN"
+                elif filtered > options["max_filtered"]:
+                    verdict = "FILTER"
+                else:
+                    verdict = "index"
+                if verdict != "index":
+                    failures.append(label)
+                self.stdout.write(
+                    f"{verdict:>8} {filtered:>9} {elapsed:>9.2f}  "
+                    f"{label or '-'}")
+                if options["verbosity"] > 1:
+                    self.stdout.write(plan)
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(
+                f"{len(failures)} queries are not served by an index.")
+
+    def first_page(self, params):
+        """
+        Returns the query of the first page of the user list requested
+        with the given query parameters.
+        """
+        request = Request(RequestFactory().get("/", params))
+        view = CustomUserViewSet(
+            action="list", request=request, format_kwarg=None)
+        queryset = view.filter_queryset(view.get_queryset())
+        paginator = view.paginator
+        ordering = paginator.get_ordering(request, queryset, view)
+        return queryset.order_by(*ordering)[
+            :paginator.get_page_size(request) + 1]
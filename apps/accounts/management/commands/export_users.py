@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from apps.accounts.bulk import CONTENT_TYPES, export_users
+from apps.accounts.models import CustomUser
+
+
+class Command(BaseCommand):
+    """
+    Writes every user, without their password, as CSV or NDJSON. Users
+    are read with a server-side cursor, so the export runs in constant
+    memory.
+    """
+
+    help = "Bulk export users as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", nargs="?",
+            help="The file to write, standard output by default.")
+        parser.add_argument(
+            "--format", dest="file_format", choices=list(CONTENT_TYPES),
+            default="csv", help="The format of the export.",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=2000,
+            help="Number of users fetched per round trip.",
+        )
+
+    def handle(self, *args, **options):
+        lines = export_users(
+            CustomUser.objects.order_by("pk"), options["file_format"],
+            options["chunk_size"])
+        if options["path"] is None:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+        with open(options["path"], "w", newline="",
+                  encoding="utf-8") as stream:
+            stream.writelines(lines)
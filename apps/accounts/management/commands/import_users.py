@@ -0,0 +1,63 @@
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.bulk import CONTENT_TYPES, import_users, read_rows
+from apps.accounts.hashers import PasswordHashingPool
+
+
+class Command(BaseCommand):
+    """
+    Creates users from a CSV or NDJSON file, reading it one batch at a
+    time and hashing the passwords of each batch on a process pool.
+
+    CSV files need a header row. The email, phone_number, password and
+    is_active columns are read; other columns are ignored.
+    """
+
+    help = "Bulk import users from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path", help="The file to import, - for standard input.")
+        parser.add_argument(
+            "--format", dest="file_format", choices=list(CONTENT_TYPES),
+            help="The format of the file, guessed from its extension by "
+                 "default.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of users inserted per query.",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=os.cpu_count(),
+            help="Number of processes hashing passwords.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["file_format"]
+        if file_format is None:
+            file_format = os.path.splitext(path)[1].lstrip(".").lower()
+            if file_format not in CONTENT_TYPES:
+                raise CommandError(
+                    "Cannot guess the format of the file, use --format.")
+
+        stream = (sys.stdin if path == "-"
+                  else open(path, newline="", encoding="utf-8"))
+        pool = PasswordHashingPool("process", options["workers"])
+        try:
+            report = import_users(
+                read_rows(stream, file_format), pool, options["batch_size"])
+        finally:
+            pool.shutdown()
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in report["errors"]:
+            self.stderr.write(
+                f"Line {error['line']}: {' '.join(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Done, {report['created']} users created, "
+            f"{len(report['errors'])} rows skipped."))
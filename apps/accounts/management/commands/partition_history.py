@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from apps.accounts.partitions import maintain_partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Create upcoming monthly partitions of the history tables and "
+        "detach or drop the expired ones."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--months-ahead", type=int,
+            default=settings.HISTORY_PARTITIONS_AHEAD,
+            help="Number of months to create partitions for in advance.",
+        )
+        parser.add_argument(
+            "--retention-months", type=int,
+            default=settings.HISTORY_RETENTION_MONTHS,
+            help="Number of full months of history to keep.",
+        )
+        parser.add_argument(
+            "--detach-only", action="store_true",
+            help="Detach expired partitions without dropping them.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Partitioning requires PostgreSQL.")
+
+        with transaction.atomic():
+            report = maintain_partitions(
+                connection,
+                options["months_ahead"],
+                options["retention_months"],
+                options["detach_only"],
+            )
+
+        verb = "Detached" if options["detach_only"] else "Dropped"
+        for table, changes in report.items():
+            for name in changes["created"]:
+                self.stdout.write(f"Created {name}")
+            for name in changes["detached"]:
+                self.stdout.write(f"{verb} {name}")
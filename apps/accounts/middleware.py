@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.utils.functional import SimpleLazyObject, empty
+
+from .visits import get_visit_buffer
+
+
+class PathSessionMiddleware(SessionMiddleware):
+    """
+    SessionMiddleware that leaves the session alone on the URL prefixes
+    listed in SESSIONLESS_PATH_PREFIXES.
+
+    Requests to those paths get an empty session that is never loaded
+    from nor saved to the session store, so the session cookie of a
+    browser costs nothing there and request.user stays anonymous unless
+    the view authenticates the request itself.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.sessionless_prefixes = tuple(settings.SESSIONLESS_PATH_PREFIXES)
+
+    def is_sessionless(self, request):
+        return request.path_info.startswith(self.sessionless_prefixes)
+
+    def process_request(self, request):
+        if self.is_sessionless(request):
+            request.session = self.SessionStore()
+        else:
+            super().process_request(request)
+
+    def process_response(self, request, response):
+        if self.is_sessionless(request):
+            return response
+        return super().process_response(request, response)
+
+
+class UserVisitMiddleware:
+    """
+    Records a UserVisitHistory row for every request made by an
+    authenticated user.
+
+    Visits are appended to the process-wide VisitBuffer and written in
+    batches once the response has been sent, so recording a visit never
+    waits for the database. A user that was never loaded during the
+    request is not loaded just to record the visit.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.buffer = get_visit_buffer()
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        user = getattr(request, "user", None)
+        if isinstance(user, SimpleLazyObject) and user._wrapped is empty:
+            return response
+        if user is not None and user.is_authenticated:
+            self.buffer.append(
+                user.pk,
+                request.path[:255],
+                request.META.get("HTTP_REFERER", "")[:255] or None,
+                request.META.get("HTTP_USER_AGENT", ""),
+            )
+        return response
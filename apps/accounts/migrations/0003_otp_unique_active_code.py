@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0002_customuser_groups_customuser_user_permissions"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="otp",
+            name="code",
+            field=models.CharField(max_length=4),
+        ),
+        migrations.AddConstraint(
+            model_name="otp",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("active", True)),
+                fields=("user", "code"),
+                name="accounts_otp_unique_active_code",
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2 on 2026-10-18 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0003_otp_unique_active_code"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="otp",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["user", "-created_at"],
+                name="accounts_otp_active_user_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 04:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0004_otp_active_user_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="otp",
+            index=models.Index(
+                condition=models.Q(("active", True)),
+                fields=["updated_at"],
+                name="accounts_otp_expiry_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="otp",
+            index=models.Index(
+                fields=["created_at"], name="accounts_otp_created_idx"
+            ),
+        ),
+    ]
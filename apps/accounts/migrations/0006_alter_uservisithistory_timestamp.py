@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 05:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0005_otp_sweeper_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="uservisithistory",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
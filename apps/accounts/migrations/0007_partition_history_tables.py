@@ -0,0 +1,29 @@
+# Generated by Django 4.2 on 2026-10-18 05:40
+
+from django.db import migrations
+
+from apps.accounts.partitions import partition_table
+
+TABLES = (
+    "accounts_uservisithistory",
+    "accounts_loginhistorytrail",
+    "accounts_loginattemptshistory",
+)
+
+
+def partition_history_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            partition_table(cursor, table, months_ahead=3)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0006_alter_uservisithistory_timestamp"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_history_tables, elidable=False),
+    ]
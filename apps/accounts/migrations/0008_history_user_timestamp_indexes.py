@@ -0,0 +1,78 @@
+# Generated by Django 4.2 on 2026-10-18 06:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0007_partition_history_tables"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="uservisithistory",
+            index=models.Index(
+                fields=["user", "-timestamp"],
+                name="accounts_visit_user_ts_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loginhistorytrail",
+            index=models.Index(
+                fields=["user", "-timestamp"],
+                name="accounts_trail_user_ts_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loginattemptshistory",
+            index=models.Index(
+                fields=["user", "-timestamp"],
+                name="accounts_attempt_user_ts_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="extradata",
+            index=models.Index(
+                fields=["user", "-timestamp"],
+                name="accounts_extra_user_ts_idx",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="uservisithistory",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="loginhistorytrail",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="loginattemptshistory",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="extradata",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
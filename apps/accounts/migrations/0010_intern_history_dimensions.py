@@ -0,0 +1,69 @@
+# Generated by Django 4.2 on 2026-10-18 06:41
+
+import hashlib
+
+from django.db import migrations
+
+# (model, old column, new foreign key, dimension model)
+COLUMNS = (
+    ("uservisithistory", "user_agent", "user_agent_ref", "useragent"),
+    ("loginhistorytrail", "user_agent", "user_agent_ref", "useragent"),
+    ("loginhistorytrail", "location", "location_ref", "location"),
+    ("loginattemptshistory", "user_agent", "user_agent_ref", "useragent"),
+    ("loginattemptshistory", "location", "location_ref", "location"),
+    ("extradata", "browser", "browser_ref", "browser"),
+    ("extradata", "device", "device_ref", "device"),
+    ("extradata", "os", "os_ref", "operatingsystem"),
+    ("extradata", "location", "location_ref", "location"),
+)
+
+BATCH_SIZE = 1000
+
+
+def intern_columns(apps, schema_editor):
+    """
+    Stores each distinct value of the old columns once in its dimension
+    table and points the new foreign keys at it, BATCH_SIZE rows at a
+    time in primary key order, so that no statement updates more than one
+    range of rows.
+    """
+    for model_name, column, field, dimension_name in COLUMNS:
+        model = apps.get_model("accounts", model_name)
+        dimension = apps.get_model("accounts", dimension_name)
+        rows = model.objects.exclude(**{f"{column}__isnull": True})
+        last_pk = 0
+        while True:
+            batch = list(
+                rows.filter(pk__gt=last_pk)
+                .order_by("pk")
+                .values_list("pk", column)[:BATCH_SIZE]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            digests = {
+                value: hashlib.sha1(value.encode()).hexdigest()
+                for value in {value for _, value in batch}
+            }
+            dimension.objects.bulk_create(
+                [dimension(digest=digest, value=value)
+                 for value, digest in digests.items()],
+                ignore_conflicts=True,
+            )
+            ids = dict(dimension.objects.filter(
+                digest__in=digests.values()).values_list("digest", "pk"))
+            model.objects.bulk_update(
+                [model(pk=pk, **{f"{field}_id": ids[digests[value]]})
+                 for pk, value in batch],
+                [field],
+            )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0009_history_dimension_tables"),
+    ]
+
+    operations = [
+        migrations.RunPython(intern_columns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 4.2 on 2026-10-18 06:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    # Separate from 0010 so that the foreign keys filled there are
+    # checked before the columns are altered.
+    dependencies = [
+        ("accounts", "0010_intern_history_dimensions"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="uservisithistory",
+            name="user_agent_ref",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.useragent",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="loginhistorytrail",
+            name="user_agent_ref",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.useragent",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="loginattemptshistory",
+            name="user_agent_ref",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.useragent",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="extradata",
+            name="browser_ref",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.browser",
+            ),
+        ),
+        migrations.RemoveField(
+            model_name="uservisithistory",
+            name="user_agent",
+        ),
+        migrations.RemoveField(
+            model_name="loginhistorytrail",
+            name="user_agent",
+        ),
+        migrations.RemoveField(
+            model_name="loginhistorytrail",
+            name="location",
+        ),
+        migrations.RemoveField(
+            model_name="loginattemptshistory",
+            name="user_agent",
+        ),
+        migrations.RemoveField(
+            model_name="loginattemptshistory",
+            name="location",
+        ),
+        migrations.RemoveField(
+            model_name="extradata",
+            name="browser",
+        ),
+        migrations.RemoveField(
+            model_name="extradata",
+            name="device",
+        ),
+        migrations.RemoveField(
+            model_name="extradata",
+            name="os",
+        ),
+        migrations.RemoveField(
+            model_name="extradata",
+            name="location",
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 07:21
+
+from django.db import migrations
+
+from apps.accounts.partitions import partition_table
+
+
+def partition_loginevent(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        partition_table(cursor, "accounts_loginevent", months_ahead=3)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0012_loginevent"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_loginevent, elidable=False),
+    ]
@@ -0,0 +1,144 @@
+# Generated by Django 4.2 on 2026-10-18 07:22
+
+import collections
+import datetime
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000
+
+# A trail row this close to an attempt with the same user, outcome, IP
+# address and client recorded the same login.
+DUPLICATE_WINDOW = datetime.timedelta(seconds=1)
+
+FIELDS = (
+    "user_id",
+    "timestamp",
+    "successful",
+    "ip_address",
+    "user_agent_ref_id",
+    "location_ref_id",
+)
+
+
+def _batches(model):
+    """
+    Yields the rows of a table in primary key order, one batch at a time,
+    so no long-running statement holds the table.
+    """
+    last_pk = 0
+    while True:
+        rows = list(
+            model.objects.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values("pk", *FIELDS)[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1]["pk"]
+
+
+def _not_copied(LoginEvent, rows, others=()):
+    """
+    Drops the rows of a batch that an interrupted earlier run already
+    copied. Batches are committed one by one, so a copied row is found by
+    comparing every field; others are the rows of the same users copied
+    from the other table, which do not count.
+    """
+    timestamps = [row["timestamp"] for row in rows]
+    start, end = min(timestamps), max(timestamps)
+    copied = collections.Counter(
+        _copy_key(event) for event in LoginEvent.objects.filter(
+            user_id__in={row["user_id"] for row in rows},
+            timestamp__gte=start,
+            timestamp__lte=end,
+        ).values(*FIELDS)
+    )
+    copied.subtract(_copy_key(row) for row in others
+                    if start <= row["timestamp"] <= end)
+    kept = []
+    for row in rows:
+        key = _copy_key(row)
+        if copied[key] > 0:
+            copied[key] -= 1
+        else:
+            kept.append(row)
+    return kept
+
+
+def _copy_key(row):
+    return tuple(row[field] for field in FIELDS)
+
+
+def _key(row):
+    return (
+        row["user_id"],
+        row["successful"],
+        row["ip_address"],
+        row["user_agent_ref_id"],
+        row["location_ref_id"],
+    )
+
+
+def copy_login_events(apps, schema_editor):
+    """
+    Copies every login attempt into LoginEvent, skipping the trail rows
+    that duplicate an attempt. Running it again after an interruption
+    only copies the rows that are still missing.
+    """
+    LoginEvent = apps.get_model("accounts", "LoginEvent")
+    LoginAttemptsHistory = apps.get_model("accounts", "LoginAttemptsHistory")
+    LoginHistoryTrail = apps.get_model("accounts", "LoginHistoryTrail")
+
+    def copy(rows):
+        with transaction.atomic():
+            LoginEvent.objects.bulk_create(
+                [LoginEvent(**{field: row[field] for field in FIELDS})
+                 for row in rows]
+            )
+
+    for rows in _batches(LoginAttemptsHistory):
+        copy(_not_copied(LoginEvent, rows))
+
+    for rows in _batches(LoginHistoryTrail):
+        timestamps = [row["timestamp"] for row in rows]
+        window = list(LoginAttemptsHistory.objects.filter(
+            user_id__in={row["user_id"] for row in rows},
+            timestamp__gte=min(timestamps) - DUPLICATE_WINDOW,
+            timestamp__lte=max(timestamps) + DUPLICATE_WINDOW,
+        ).values(*FIELDS))
+        attempts = {}
+        for attempt in window:
+            attempts.setdefault(_key(attempt), []).append(
+                attempt["timestamp"])
+        rows = [row for row in rows if not _match(row, attempts)]
+        if rows:
+            copy(_not_copied(LoginEvent, rows, others=window))
+
+
+def _match(row, attempts):
+    """
+    Tells whether a trail row duplicates one of the attempts, removing
+    the matched attempt so that it absorbs at most one trail row.
+    """
+    timestamps = attempts.get(_key(row), [])
+    for timestamp in timestamps:
+        if abs(row["timestamp"] - timestamp) <= DUPLICATE_WINDOW:
+            timestamps.remove(timestamp)
+            return True
+    return False
+
+
+class Migration(migrations.Migration):
+    # Every batch is committed on its own instead of copying both tables
+    # in one long transaction, and a rerun skips the committed batches.
+    atomic = False
+
+    dependencies = [
+        ("accounts", "0013_partition_loginevent"),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_login_events, migrations.RunPython.noop),
+    ]
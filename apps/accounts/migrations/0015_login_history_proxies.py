@@ -0,0 +1,40 @@
+# Generated by Django 4.2 on 2026-10-18 07:23
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0014_copy_login_events"),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name="LoginAttemptsHistory",
+        ),
+        migrations.DeleteModel(
+            name="LoginHistoryTrail",
+        ),
+        migrations.CreateModel(
+            name="LoginAttemptsHistory",
+            fields=[],
+            options={
+                "verbose_name_plural": "Login attempts history",
+                "proxy": True,
+                "indexes": [],
+                "constraints": [],
+            },
+            bases=("accounts.loginevent",),
+        ),
+        migrations.CreateModel(
+            name="LoginHistoryTrail",
+            fields=[],
+            options={
+                "verbose_name_plural": "Login history trail",
+                "proxy": True,
+                "indexes": [],
+                "constraints": [],
+            },
+            bases=("accounts.loginevent",),
+        ),
+    ]
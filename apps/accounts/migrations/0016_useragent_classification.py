@@ -0,0 +1,46 @@
+# Generated by Django 4.2 on 2026-10-18 08:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0015_login_history_proxies"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="useragent",
+            name="browser_ref",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.browser",
+            ),
+        ),
+        migrations.AddField(
+            model_name="useragent",
+            name="device_ref",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.device",
+            ),
+        ),
+        migrations.AddField(
+            model_name="useragent",
+            name="os_ref",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.operatingsystem",
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2 on 2026-10-18 05:40
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# (name, indexed expression) of the trigram indexes of the user table.
+INDEXES = (
+    ("accounts_user_email_trgm_idx", "UPPER(email) gin_trgm_ops"),
+    ("accounts_user_phone_trgm_idx", "phone_number gin_trgm_ops"),
+)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # GIN indexes only exist on PostgreSQL, where TrigramExtension has
+    # failed the migration already if pg_trgm is not installed.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    table = schema_editor.quote_name(
+        apps.get_model("accounts", "CustomUser")._meta.db_table)
+    for name, expression in INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX {name} ON {table} USING gin ({expression})")
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0019_customuser_filter_indexes"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(
+            create_trigram_indexes, drop_trigram_indexes, elidable=False),
+    ]
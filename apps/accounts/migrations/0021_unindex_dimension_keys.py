@@ -0,0 +1,127 @@
+# Generated by Django 4.2 on 2026-10-18 07:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0020_customuser_trigram_indexes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="extradata",
+            name="browser_ref",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.browser",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="extradata",
+            name="device_ref",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.device",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="extradata",
+            name="location_ref",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.location",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="extradata",
+            name="os_ref",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.operatingsystem",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="loginevent",
+            name="location_ref",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.location",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="loginevent",
+            name="user_agent_ref",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.useragent",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="useragent",
+            name="browser_ref",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.browser",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="useragent",
+            name="device_ref",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.device",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="useragent",
+            name="os_ref",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.operatingsystem",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="uservisithistory",
+            name="user_agent_ref",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="accounts.useragent",
+            ),
+        ),
+    ]
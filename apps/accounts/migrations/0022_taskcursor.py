@@ -0,0 +1,24 @@
+# Generated by Django 4.2 on 2026-10-18 07:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0021_unindex_dimension_keys"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskCursor",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=255, primary_key=True, serialize=False
+                    ),
+                ),
+                ("position", models.BigIntegerField(default=0)),
+            ],
+        ),
+    ]
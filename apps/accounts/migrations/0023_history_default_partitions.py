@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 17:10
+
+from django.db import migrations
+
+from apps.accounts.partitions import create_default_partition
+
+TABLES = (
+    "accounts_uservisithistory",
+    "accounts_loginevent",
+)
+
+
+def create_default_partitions(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            create_default_partition(cursor, table)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("accounts", "0022_taskcursor"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_partitions, elidable=False),
+    ]
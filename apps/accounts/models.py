@@ -1,11 +1,21 @@
 from django.contrib.auth.models import BaseUserManager
 from django.contrib.auth.base_user import AbstractBaseUser
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Upper
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import PermissionsMixin
 
-import uuid
+import collections
+import hashlib
+import secrets
+import threading
+
+from .caches import cache_is_shared
+from .hashers import get_password_hashing_pool
+from .useragents import parse_user_agent
 
 
 class CustomUserManager(BaseUserManager):
@@ -48,14 +58,21 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         is_staff: Whether the user is a member of the staff.
         is_superuser: Whether the user has all permissions.
         date_joined: The date and time the user account was created.
+        auth_version: Incremented whenever one of AUTH_STATE_FIELDS
+            changes, so tokens carrying the old values can be told apart.
 
     Attributes:
         USERNAME_FIELD: The field to use for authentication
             (email in this case).
         REQUIRED_FIELDS: A list of required fields for creating a user.
+        AUTH_STATE_FIELDS: The fields embedded as claims in access tokens.
 
     Methods:
         __str__: Returns the user's email address.
+        set_password: Hashes a password on the password hashing pool.
+        check_password: Checks a password on the password hashing pool,
+            upgrading its hash if needed.
+        get_auth_version: Returns the current auth_version of a user.
 
     Managers:
         objects: The manager for this model.
@@ -75,20 +92,369 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
     date_joined = models.DateTimeField(auto_now_add=True)
+    auth_version = models.PositiveIntegerField(default=0, editable=False)
 
     # Fields used for authentication
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
+    AUTH_STATE_FIELDS = ("is_active", "is_staff", "is_superuser")
 
     objects = CustomUserManager()
 
     class Meta:
         verbose_name = "Custom User"
         verbose_name_plural = "Custom Users"
+        indexes = [
+            # Serve the filters and orderings of the user list; the email
+            # is indexed by its unique constraint.
+            models.Index(
+                fields=["phone_number"],
+                name="accounts_user_phone_idx",
+            ),
+            models.Index(
+                fields=["date_joined"],
+                name="accounts_user_joined_idx",
+            ),
+            # Case-insensitive lookups, email__iexact.
+            models.Index(
+                Upper("email"),
+                name="accounts_user_email_upper_idx",
+            ),
+            # Pages of active users, or of staff, in the default order
+            # without walking past the others.
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_active=True),
+                name="accounts_user_active_idx",
+            ),
+            models.Index(
+                fields=["id"],
+                condition=models.Q(is_staff=True),
+                name="accounts_user_staff_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if set(cls.AUTH_STATE_FIELDS) <= set(field_names):
+            instance._loaded_auth_state = instance.get_auth_state()
+        return instance
+
+    def get_auth_state(self):
+        return tuple(getattr(self, field) for field in self.AUTH_STATE_FIELDS)
+
+    def set_password(self, raw_password):
+        self.password = get_password_hashing_pool().make_password(
+            raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """
+        Checks a password, and rehashes it with the preferred hasher and
+        parameters if its hash was made with others.
+        """
+        is_correct, must_update = get_password_hashing_pool().check_password(
+            raw_password, self.password)
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=["password"])
+        return is_correct
+
+    def save(self, *args, **kwargs):
+        """
+        Increments auth_version when the active, staff or superuser status
+        changed since the user was loaded.
+
+        Updates made with QuerySet.update() bypass this and must increment
+        auth_version themselves.
+        """
+        loaded = getattr(self, "_loaded_auth_state", None)
+        changed = loaded is not None and loaded != self.get_auth_state()
+        if changed:
+            self.auth_version += 1
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "auth_version"}
+        super().save(*args, **kwargs)
+        self._loaded_auth_state = self.get_auth_state()
+        if changed:
+            key = self.get_auth_version_key(self.pk)
+            version = self.auth_version
+            transaction.on_commit(lambda: cache.set(
+                key, version, settings.AUTH_VERSION_CACHE_TIMEOUT))
+
+    @staticmethod
+    def get_auth_version_key(user_id):
+        return f"accounts:auth_version:{user_id}"
+
+    @classmethod
+    def get_auth_version(cls, user_id):
+        """
+        Returns the current auth_version of a user, from the cache when
+        possible. Without a shared cache, a change made by another process
+        would not be seen, so the version is always read from the
+        database.
+
+        Args:
+            user_id (int): The id of the user.
+
+        Returns:
+            The version, or None if the user does not exist.
+        """
+        if not cache_is_shared():
+            return cls.objects.filter(pk=user_id).values_list(
+                "auth_version", flat=True).first()
+        key = cls.get_auth_version_key(user_id)
+        version = cache.get(key)
+        if version is None:
+            version = cls.objects.filter(pk=user_id).values_list(
+                "auth_version", flat=True).first()
+            if version is not None:
+                cache.set(key, version, settings.AUTH_VERSION_CACHE_TIMEOUT)
+        return version
+
+
+class _LRUCache:
+    """
+    A small thread-safe mapping that evicts its least recently used
+    entries once it holds more than maxsize of them.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            return self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class InternedValue(models.Model):
+    """
+    Abstract lookup table that stores each distinct string once, so that
+    the tables referencing it only store an integer.
+
+    Fields:
+        value: The string.
+        digest: The SHA-1 of the string, used to look it up.
+
+    Attributes:
+        CACHE_SIZE: The number of value to id mappings kept in memory by
+            each process.
+    """
+
+    CACHE_SIZE = 4096
+
+    digest = models.CharField(max_length=40, unique=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return self.value
+
+    @classmethod
+    def clear_cache(cls):
+        """
+        Forgets the ids cached for this table, or for every table when
+        called on InternedValue itself.
+        """
+        if cls._meta.abstract:
+            _intern_caches.clear()
+        else:
+            _intern_caches.pop(cls, None)
+
+    @classmethod
+    def get_defaults(cls, value):
+        """
+        Returns the fields of a new row holding the given string.
+        """
+        return {"value": value}
+
+    @staticmethod
+    def make_digest(value):
+        return hashlib.sha1(value.encode()).hexdigest()
+
+    @classmethod
+    def intern(cls, value):
+        """
+        Gets the id of the row holding the given string, creating the row
+        if it does not exist yet.
+
+        Ids are remembered in a per-process LRU cache once the row is known
+        to be committed, so most calls do not touch the database. A row
+        created inside a transaction is only cached when that transaction
+        commits, so a rollback can never leave a dangling id behind.
+
+        Args:
+            value (str): The string.
+
+        Returns:
+            The id of the row.
+        """
+        cache = _intern_caches.get(cls)
+        if cache is None:
+            cache = _intern_caches.setdefault(cls, _LRUCache(cls.CACHE_SIZE))
+
+        pk = cache.get(value)
+        if pk is not None:
+            return pk
+
+        row, created = cls.objects.get_or_create(
+            digest=cls.make_digest(value),
+            defaults=cls.get_defaults(value),
+        )
+        if not transaction.get_connection().in_atomic_block:
+            cache.put(value, row.pk)
+            return row.pk
+
+        # Rows created by this thread's open transaction are not cached
+        # until it commits, even when they are read back in the meantime.
+        uncommitted = getattr(_uncommitted, "values", None)
+        if uncommitted is None:
+            uncommitted = _uncommitted.values = _LRUCache(cls.CACHE_SIZE)
+        key = (cls, value)
+        if created:
+            uncommitted.put(key, row.pk)
+
+            def commit():
+                uncommitted.pop(key)
+                cache.put(value, row.pk)
+
+            transaction.on_commit(commit)
+        elif uncommitted.get(key) is None:
+            cache.put(value, row.pk)
+        return row.pk
+
+
+_intern_caches = {}
+_uncommitted = threading.local()
+
+
+def interned_property(field_name):
+    """
+    Exposes the string behind a foreign key to an InternedValue table as a
+    plain attribute, which can also be passed to the model constructor.
+
+    Args:
+        field_name (str): The name of the foreign key.
+
+    Returns:
+        A property reading and writing the string.
+    """
+
+    def getter(self):
+        related = getattr(self, field_name)
+        return None if related is None else related.value
+
+    def setter(self, value):
+        if value is None:
+            setattr(self, field_name, None)
+            return
+        model = self._meta.get_field(field_name).related_model
+        setattr(self, field_name, model(pk=model.intern(value), value=value))
+
+    return property(getter, setter)
+
+
+class UserAgent(InternedValue):
+    """
+    Distinct user agent strings, classified by browser, device and
+    operating system when they are first seen.
+    """
+
+    value = models.TextField()
+    # Not indexed, like the foreign keys of the history tables: nothing
+    # looks user agents up by classification, and dimension rows are
+    # never deleted.
+    browser_ref = models.ForeignKey(
+        "Browser", on_delete=models.PROTECT, related_name="+",
+        null=True, blank=True, db_index=False)
+    device_ref = models.ForeignKey(
+        "Device", on_delete=models.PROTECT, related_name="+",
+        null=True, blank=True, db_index=False)
+    os_ref = models.ForeignKey(
+        "OperatingSystem", on_delete=models.PROTECT, related_name="+",
+        null=True, blank=True, db_index=False)
+
+    @classmethod
+    def get_defaults(cls, value):
+        # Callables, so that they are only interned when the row is new.
+        return dict(super().get_defaults(value), **cls.classify(value))
+
+    @staticmethod
+    def classify(value):
+        """
+        Classifies a user agent string.
+
+        Returns:
+            A dict mapping the foreign key attributes of the browser,
+            device and operating system to callables interning them.
+        """
+        parsed = parse_user_agent(value)
+        return {
+            "browser_ref_id": lambda: Browser.intern(parsed.browser),
+            "device_ref_id": lambda: Device.intern(parsed.device),
+            "os_ref_id": lambda: OperatingSystem.intern(parsed.os),
+        }
+
+
+class Browser(InternedValue):
+    """
+    Distinct browser names.
+    """
+
+    value = models.CharField(max_length=255)
+
+
+class OperatingSystem(InternedValue):
+    """
+    Distinct operating system names.
+    """
+
+    value = models.CharField(max_length=255)
+
+
+class Device(InternedValue):
+    """
+    Distinct device names.
+    """
+
+    value = models.CharField(max_length=255)
+
+
+class Location(InternedValue):
+    """
+    Distinct locations.
+    """
+
+    value = models.CharField(max_length=255)
+
 
 class UserVisitHistory(models.Model):
     """
@@ -108,22 +474,39 @@ class UserVisitHistory(models.Model):
             by timestamp in descending order.
     """
 
+    # Indexed by the composite (user, -timestamp) index below.
     user = models.ForeignKey(
         CustomUser,
-        on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(auto_now_add=True)
+        on_delete=models.CASCADE,
+        db_index=False)
+    # Not auto_now_add: visits are written in batches after the fact and
+    # keep the time they were recorded at.
+    timestamp = models.DateTimeField(default=timezone.now)
     url = models.CharField(max_length=255)
     referer = models.CharField(max_length=255, null=True, blank=True)
-    user_agent = models.TextField()
+    # Dimension keys are only joined from, never filtered on: an index
+    # would only slow down inserts into this append-only table.
+    user_agent_ref = models.ForeignKey(
+        UserAgent, on_delete=models.PROTECT, related_name="+",
+        db_index=False)
+
+    user_agent = interned_property("user_agent_ref")
 
     class Meta:
         verbose_name_plural = "User visit history"
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["user", "-timestamp"],
+                         name="accounts_visit_user_ts_idx"),
+        ]
 
 
-class LoginHistoryTrail(models.Model):
+class LoginEvent(models.Model):
     """
-    Model to store a trail of login attempts made by users.
+    Model to store every login attempt made by users, once.
+
+    LoginHistoryTrail and LoginAttemptsHistory are proxies of this model,
+    so recording an attempt is a single insert whichever API reads it.
 
     Fields:
         user: A foreign key to the user who made the login attempt.
@@ -135,58 +518,91 @@ class LoginHistoryTrail(models.Model):
         location: The location (city, country) of the IP address used
             to make the login attempt, if available.
 
+    Methods:
+        record: Records a login attempt.
+
     Meta:
-        verbose_name_plural: A human-readable name for this model (plural).
         ordering: The default ordering for querysets of this model,
             by timestamp in descending order.
     """
 
+    # Indexed by the composite (user, -timestamp) index below.
     user = models.ForeignKey(
         CustomUser,
-        on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(auto_now_add=True)
+        on_delete=models.CASCADE,
+        related_name="login_events",
+        db_index=False)
+    # Not auto_now_add: attempts may be recorded after the fact and keep
+    # the time they were made at.
+    timestamp = models.DateTimeField(default=timezone.now)
     successful = models.BooleanField(default=False)
     ip_address = models.GenericIPAddressField()
-    user_agent = models.TextField()
-    location = models.CharField(max_length=255, null=True, blank=True)
+    # Dimension keys are joined from, or checked for NULL along the
+    # primary key, never looked up: an index would only slow down inserts
+    # into this append-only table.
+    user_agent_ref = models.ForeignKey(
+        UserAgent, on_delete=models.PROTECT, related_name="+",
+        db_index=False)
+    location_ref = models.ForeignKey(
+        Location, on_delete=models.PROTECT, related_name="+",
+        null=True, blank=True, db_index=False)
+
+    user_agent = interned_property("user_agent_ref")
+    location = interned_property("location_ref")
 
     class Meta:
-        verbose_name_plural = "Login history trail"
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["user", "-timestamp"],
+                         name="accounts_login_user_ts_idx"),
+        ]
 
+    @classmethod
+    def record(cls, user, successful, ip_address, user_agent,
+               location=None, timestamp=None):
+        """
+        Records a login attempt.
 
-class LoginAttemptsHistory(models.Model):
-    """
-    Model to store a history of login attempts made by users.
+        Args:
+            user (CustomUser): The user who made the attempt.
+            successful (bool): Whether the attempt was successful.
+            ip_address (str): The IP address the attempt was made from.
+            user_agent (str): The user agent of the client.
+            location (str): The location of the IP address, if known.
+            timestamp (datetime): When the attempt was made, now if not
+                given.
 
-    Fields:
-        user: A foreign key to the user who made the login attempt.
-        timestamp: The date and time of the login attempt.
-        successful: Whether the login attempt was successful.
-        ip_address: The IP address used to make the login attempt.
-        user_agent: The user agent string for the browser or
-            other client used to make the login attempt.
-        location: The location (city, country) of the IP
-            address used to make the login attempt, if available.
+        Returns:
+            The LoginEvent instance.
+        """
+        return cls.objects.create(
+            user=user,
+            successful=successful,
+            ip_address=ip_address,
+            user_agent=user_agent,
+            location=location,
+            timestamp=timestamp or timezone.now(),
+        )
 
-    Meta:
-        verbose_name_plural: A human-readable name for this model (plural).
-        ordering: The default ordering for querysets of this model,
-            by timestamp in descending order.
+
+class LoginHistoryTrail(LoginEvent):
+    """
+    The trail of login attempts made by users, read from LoginEvent.
     """
 
-    user = models.ForeignKey(
-        CustomUser,
-        on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(auto_now_add=True)
-    successful = models.BooleanField(default=False)
-    ip_address = models.GenericIPAddressField()
-    user_agent = models.TextField()
-    location = models.CharField(max_length=255, null=True, blank=True)
+    class Meta:
+        proxy = True
+        verbose_name_plural = "Login history trail"
+
+
+class LoginAttemptsHistory(LoginEvent):
+    """
+    The history of login attempts made by users, read from LoginEvent.
+    """
 
     class Meta:
+        proxy = True
         verbose_name_plural = "Login attempts history"
-        ordering = ["-timestamp"]
 
 
 class ExtraData(models.Model):
@@ -194,56 +610,159 @@ class ExtraData(models.Model):
     Model for storing extra data related to user activity, such as browser,
     IP address, device, operating system, and location.
     """
+    # Indexed by the composite (user, -timestamp) index below.
     user = models.ForeignKey(
         CustomUser,
-        on_delete=models.CASCADE)
+        on_delete=models.CASCADE,
+        db_index=False)
     timestamp = models.DateTimeField(auto_now_add=True)
-    browser = models.CharField(max_length=255)
+    # Dimension keys are joined from, or checked for NULL along the
+    # primary key, never looked up: an index would only slow down inserts
+    # into this append-only table.
+    browser_ref = models.ForeignKey(
+        Browser, on_delete=models.PROTECT, related_name="+",
+        db_index=False)
     ip_address = models.GenericIPAddressField()
-    device = models.CharField(max_length=255, null=True, blank=True)
-    os = models.CharField(max_length=255, null=True, blank=True)
-    location = models.CharField(max_length=255, null=True, blank=True)
+    device_ref = models.ForeignKey(
+        Device, on_delete=models.PROTECT, related_name="+",
+        null=True, blank=True, db_index=False)
+    os_ref = models.ForeignKey(
+        OperatingSystem, on_delete=models.PROTECT, related_name="+",
+        null=True, blank=True, db_index=False)
+    location_ref = models.ForeignKey(
+        Location, on_delete=models.PROTECT, related_name="+",
+        null=True, blank=True, db_index=False)
+
+    browser = interned_property("browser_ref")
+    device = interned_property("device_ref")
+    os = interned_property("os_ref")
+    location = interned_property("location_ref")
 
     class Meta:
         verbose_name_plural = "Extra data"
         ordering = ["-timestamp"]
+        indexes = [
+            models.Index(fields=["user", "-timestamp"],
+                         name="accounts_extra_user_ts_idx"),
+        ]
+
+    @classmethod
+    def record(cls, user, ip_address, user_agent, location=None):
+        """
+        Records the browser, device and operating system of a client,
+        parsed from its user agent string.
+
+        Args:
+            user (CustomUser): The user.
+            ip_address (str): The IP address of the client.
+            user_agent (str): The user agent string of the client.
+            location (str): The location of the IP address, if known.
+
+        Returns:
+            The ExtraData instance.
+        """
+        parsed = parse_user_agent(user_agent)
+        return cls.objects.create(
+            user=user,
+            ip_address=ip_address,
+            browser=parsed.browser,
+            device=parsed.device,
+            os=parsed.os,
+            location=location,
+        )
 
 
 class OTP(models.Model):
     """
     Model for storing one-time passwords (OTPs) associated with a user.
+
+    Codes are scoped per user: only the active codes of one user have to
+    be distinct, so issuing a code never depends on how many codes other
+    users are holding.
     """
 
+    # Number of distinct 4-digit codes.
+    CODE_SPACE = 10000
+    # How long a code stays valid after it was last updated.
+    EXPIRY = timezone.timedelta(hours=1)
+    # A collision is only possible with the code being replaced, so this
+    # bound is never reached in practice.
+    MAX_ALLOCATION_ATTEMPTS = 10
+
     user = models.ForeignKey(
         CustomUser,
         on_delete=models.CASCADE)
-    code = models.CharField(max_length=4, unique=True)
+    code = models.CharField(max_length=4)
     active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now_add=True, editable=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "code"],
+                condition=models.Q(active=True),
+                name="accounts_otp_unique_active_code",
+            ),
+        ]
+        indexes = [
+            # Serves the rotation UPDATE and get_latest without visiting
+            # the user's inactive codes.
+            models.Index(
+                fields=["user", "-created_at"],
+                condition=models.Q(active=True),
+                name="accounts_otp_active_user_idx",
+            ),
+            # Used by the sweeper to find expired and purgeable codes.
+            models.Index(
+                fields=["updated_at"],
+                condition=models.Q(active=True),
+                name="accounts_otp_expiry_idx",
+            ),
+            models.Index(
+                fields=["created_at"],
+                name="accounts_otp_created_idx",
+            ),
+        ]
+
+    @classmethod
+    def generate_code(cls):
+        """
+        Generates a random 4-digit code.
+
+        Returns:
+            The code as a zero-padded string.
+        """
+        return str(secrets.randbelow(cls.CODE_SPACE)).zfill(4)
+
     @classmethod
     def create(cls, user):
         """
         Creates a new OTP for the given user.
 
+        The new code is inserted while the previous one is still active,
+        so the per-user unique constraint guarantees that it differs from
+        the code it replaces. A collision only costs one more INSERT.
+
         Args:
             user (CustomUser): The user associated with the new OTP.
 
         Returns:
             The newly created OTP.
-        """
-
-        # Mark all existing OTPs for the user as inactive
-        cls.objects.filter(user=user).update(active=False)
-
-        # Generate a unique 4-digit code
-        while True:
-            code = str(uuid.uuid4().int % 10000).zfill(4)
-            if not cls.objects.filter(code=code).exists():
-                break
 
-        return cls.objects.create(user=user, code=code)
+        Raises:
+            IntegrityError: If no free code was found after
+                MAX_ALLOCATION_ATTEMPTS attempts.
+        """
+        for attempt in range(cls.MAX_ALLOCATION_ATTEMPTS):
+            otp = cls(user=user, code=cls.generate_code())
+            try:
+                with transaction.atomic():
+                    otp.save()
+                return otp
+            except IntegrityError:
+                if attempt == cls.MAX_ALLOCATION_ATTEMPTS - 1:
+                    raise
 
     @classmethod
     def get_latest(cls, user):
@@ -260,6 +779,30 @@ class OTP(models.Model):
         return cls.objects.filter(user=user,
                                   active=True).order_by('-created_at').first()
 
+    @classmethod
+    def verify(cls, user, code):
+        """
+        Checks a code against the latest active OTP of the given user,
+        using the backend configured in OTP_VERIFICATION_BACKEND.
+
+        Args:
+            user (CustomUser): The user associated with the OTP.
+            code (str): The code to check.
+
+        Returns:
+            True if the code matches a valid OTP, False otherwise.
+        """
+        from .otp_backends import get_otp_backend
+
+        return get_otp_backend().verify(user, code)
+
+    @property
+    def expires_at(self):
+        """
+        The date and time after which the OTP is no longer valid.
+        """
+        return self.updated_at + self.EXPIRY
+
     def is_valid(self):
         """
         Checks whether or not the OTP is valid (i.e. active and not expired).
@@ -272,10 +815,9 @@ class OTP(models.Model):
             return False
 
         # Check if the OTP has expired
-        expiration_time = self.updated_at + timezone.timedelta(hours=1)
-        if timezone.now() > expiration_time:
+        if timezone.now() > self.expires_at:
             self.active = False
-            self.save()
+            self.save(update_fields=["active"])
             return False
 
         return True
@@ -284,6 +826,10 @@ class OTP(models.Model):
         """
         Saves the OTP to the database.
 
+        Inserting an active OTP rotates the user's codes: the INSERT and a
+        single UPDATE of the user's other active OTPs run in one
+        transaction. Updates of existing OTPs never touch other rows.
+
         Args:
             *args
             **kwargs
@@ -292,11 +838,72 @@ class OTP(models.Model):
             ValidationError: If the code is not a 4-digit number.
         """
 
-        # Mark any existing OTPs for this user as inactive
-        OTP.objects.filter(user=self.user).update(active=False)
-
         # Validate that the code is a 4-digit number
         if not self.code.isdigit() or len(self.code) != 4:
             raise ValidationError('Invalid OTP code')
 
-        super().save(*args, **kwargs)
+        if not (self._state.adding and self.active):
+            super().save(*args, **kwargs)
+            return
+
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+            # Mark any other active OTPs for this user as inactive
+            OTP.objects.filter(user_id=self.user_id, active=True).exclude(
+                pk=self.pk).update(active=False)
+
+            from .otp_backends import get_otp_backend
+
+            transaction.on_commit(
+                lambda: get_otp_backend().issued(self))
+
+
+class RevokedToken(models.Model):
+    """
+    A JSON web token that was revoked before it expired.
+
+    This table is the authoritative deny list; requests check the Bloom
+    filter of apps.accounts.revocation first and only query it when the
+    filter reports a possible match. Rows are purged once the token has
+    expired.
+
+    Fields:
+        jti: The unique identifier claim of the token.
+        expires_at: When the token expires, after which the row can go.
+        revoked_at: When the token was revoked.
+    """
+
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(default=timezone.now)
+
+
+class TaskCursor(models.Model):
+    """
+    Where a periodic task that walks a table in primary key order stopped,
+    so that the next run, on any worker, resumes from there.
+
+    Fields:
+        name: The name of the cursor, one per task and table.
+        position: The last primary key processed.
+    """
+
+    name = models.CharField(max_length=255, primary_key=True)
+    position = models.BigIntegerField(default=0)
+
+    @classmethod
+    def get(cls, name):
+        """
+        Returns the position of a cursor, 0 if it never moved.
+        """
+        return cls.objects.filter(name=name).values_list(
+            "position", flat=True).first() or 0
+
+    @classmethod
+    def move(cls, name, position):
+        """
+        Stores the position of a cursor.
+        """
+        cls.objects.update_or_create(
+            name=name, defaults={"position": position})
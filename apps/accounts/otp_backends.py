@@ -0,0 +1,112 @@
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OTP
+
+
+class DatabaseOTPBackend:
+    """
+    Verifies OTPs against the database on every attempt.
+    """
+
+    def verify(self, user, code):
+        """
+        Checks a code against the latest active OTP of the given user.
+
+        Args:
+            user (CustomUser): The user associated with the OTP.
+            code (str): The code to check.
+
+        Returns:
+            True if the code matches a valid OTP, False otherwise.
+        """
+        otp = OTP.get_latest(user)
+        if otp is None or not otp.is_valid():
+            return False
+        return hmac.compare_digest(otp.code, str(code))
+
+    def issued(self, otp):
+        """
+        Called once a new OTP has been committed to the database.
+
+        Args:
+            otp (OTP): The newly issued OTP.
+        """
+
+
+class CacheOTPBackend(DatabaseOTPBackend):
+    """
+    Verifies OTPs against a hash of the active code kept in the Django
+    cache, so repeated attempts never reach the database.
+
+    The entry is written when a code is issued and expires together with
+    the code. The database is only read on a cache miss, after which the
+    outcome, including "no valid code", is cached as well, unless a code
+    issued meanwhile was cached first.
+    """
+
+    key_prefix = "accounts:otp"
+
+    def verify(self, user, code):
+        key = self.get_cache_key(user.pk)
+        digest = cache.get(key)
+        if digest is None:
+            otp = OTP.get_latest(user)
+            if otp is not None and otp.is_valid():
+                digest = self.make_digest(otp.user_id, otp.code)
+                timeout = self.get_timeout(otp)
+            else:
+                digest = ""
+                timeout = OTP.EXPIRY.total_seconds()
+            # Added, not set: a code issued since the database was read
+            # has stored its own digest, which must win.
+            if not cache.add(key, digest, timeout):
+                digest = cache.get(key, digest)
+        if not digest:
+            return False
+        return hmac.compare_digest(digest, self.make_digest(user.pk, code))
+
+    def issued(self, otp):
+        self.remember(otp)
+
+    def remember(self, otp):
+        """
+        Caches the digest of the given OTP until the OTP expires,
+        replacing the entry of any previous code.
+
+        Args:
+            otp (OTP): An active OTP.
+
+        Returns:
+            The cached digest.
+        """
+        digest = self.make_digest(otp.user_id, otp.code)
+        cache.set(self.get_cache_key(otp.user_id), digest,
+                  self.get_timeout(otp))
+        return digest
+
+    def get_timeout(self, otp):
+        return max((otp.expires_at - timezone.now()).total_seconds(), 0)
+
+    def get_cache_key(self, user_id):
+        return f"{self.key_prefix}:{user_id}"
+
+    def make_digest(self, user_id, code):
+        return hmac.new(
+            settings.SECRET_KEY.encode(),
+            f"{user_id}:{code}".encode(),
+            hashlib.sha256,
+        ).hexdigest()
+
+
+def get_otp_backend():
+    """
+    Returns an instance of the backend configured in
+    OTP_VERIFICATION_BACKEND.
+    """
+    return import_string(settings.OTP_VERIFICATION_BACKEND)()
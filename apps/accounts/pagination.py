@@ -0,0 +1,121 @@
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+def _table_estimate(model, using):
+    """
+    Returns the number of rows of a table, partitions included, as last
+    estimated by VACUUM or ANALYZE, or None if a part of it was never
+    analyzed.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT reltuples FROM pg_class
+            WHERE relkind = 'r' AND (
+                oid = %s::regclass
+                OR oid IN (SELECT inhrelid FROM pg_inherits
+                           WHERE inhparent = %s::regclass))
+            """,
+            [model._meta.db_table] * 2,
+        )
+        estimates = [row[0] for row in cursor.fetchall()]
+    if not estimates or min(estimates) < 0:
+        return None
+    return int(sum(estimates))
+
+
+def estimate_count(queryset, limit=None):
+    """
+    Counts a queryset without reading more than limit rows.
+
+    An unfiltered queryset over a PostgreSQL table of at least limit rows
+    is counted from the planner's estimate of the size of the table. Any
+    other queryset is counted exactly, up to limit: the count of a larger
+    one is limit.
+
+    Args:
+        queryset (QuerySet): The rows to count.
+        limit (int): Defaults to the ESTIMATED_COUNT_LIMIT setting.
+
+    Returns:
+        The count.
+    """
+    if limit is None:
+        limit = settings.ESTIMATED_COUNT_LIMIT
+    query = queryset.query
+    if (connections[queryset.db].vendor == "postgresql"
+            and not query.where and not query.is_sliced
+            and not query.distinct and not query.combinator):
+        estimate = _table_estimate(queryset.model, queryset.db)
+        if estimate is not None and estimate >= limit:
+            return estimate
+    return queryset[:limit].count()
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator counting querysets with estimate_count(), so listing a
+    large table does not read all of it to count its rows. The last
+    pages of a filtered list larger than ESTIMATED_COUNT_LIMIT are not
+    reachable by page number.
+    """
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            return estimate_count(self.object_list)
+        return super().count
+
+
+class HistoryCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the (user, -timestamp) index of the history
+    models: every page is a range scan starting at the cursor, however
+    deep it is.
+    """
+
+    ordering = "-timestamp"
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class UserCursorPagination(CursorPagination):
+    """
+    Keyset pagination of the users, in the order of the OrderingFilter of
+    the view, newest first by primary key by default. Pages also give the
+    number of users listed, as counted by estimate_count().
+    """
+
+    ordering = "-id"
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = estimate_count(queryset)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("count", self.count),
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema["properties"] = {
+            "count": {"type": "integer", "example": 123},
+            **response_schema["properties"],
+        }
+        return response_schema
@@ -0,0 +1,269 @@
+"""
+Monthly range partitioning of the append-only history tables.
+
+On PostgreSQL the history tables are partitioned by month on their
+timestamp column. Partitions are named ``<table>_pYYYYMM``; the rows that
+existed before partitioning live in ``<table>_legacy``, and rows of a
+month that has no partition yet land in ``<table>_default``. Retention
+drops whole partitions instead of deleting rows.
+"""
+import collections
+import re
+
+from django.apps import apps
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+PARTITIONED_MODELS = (
+    "accounts.UserVisitHistory",
+    "accounts.LoginEvent",
+)
+
+Partition = collections.namedtuple("Partition", "name lower upper")
+
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def partitioned_tables():
+    """
+    Returns the names of the partitioned history tables.
+    """
+    return [apps.get_model(label)._meta.db_table
+            for label in PARTITIONED_MODELS]
+
+
+def month_start(value):
+    """
+    Returns midnight UTC on the first day of the month of value.
+    """
+    value = value.astimezone(timezone.utc)
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(value, months):
+    """
+    Moves the first day of a month by a number of months.
+    """
+    month = value.month - 1 + months
+    return value.replace(year=value.year + month // 12, month=month % 12 + 1)
+
+
+def _parse_bound(value):
+    if value == "MINVALUE":
+        return None
+    return parse_datetime(value.strip("'"))
+
+
+def get_partitions(cursor, table):
+    """
+    Lists the partitions of a table.
+
+    Args:
+        cursor: A cursor of a PostgreSQL connection using the UTC time zone.
+        table (str): The name of the partitioned table.
+
+    Returns:
+        A list of Partition tuples ordered by upper bound. The lower bound
+        is None for a partition starting at MINVALUE. The default
+        partition is not listed.
+    """
+    cursor.execute(
+        """
+        SELECT child.relname, pg_get_expr(child.relpartbound, child.oid)
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s
+        """,
+        [table],
+    )
+    partitions = []
+    for name, bound in cursor.fetchall():
+        if bound == "DEFAULT":
+            continue
+        lower, upper = _BOUND_RE.search(bound).groups()
+        partitions.append(
+            Partition(name, _parse_bound(lower), _parse_bound(upper)))
+    return sorted(partitions, key=lambda partition: partition.upper)
+
+
+def create_default_partition(cursor, table):
+    """
+    Creates the ``<table>_default`` partition of a table if it does not
+    exist yet. It receives the rows of months that have no partition, so
+    inserts keep working when partitions were not created in time.
+    """
+    cursor.execute(
+        f'CREATE TABLE IF NOT EXISTS "{table}_default" '
+        f'PARTITION OF "{table}" DEFAULT')
+
+
+def create_partitions(cursor, table, months_ahead, now=None):
+    """
+    Creates the monthly partitions of a table up to and including the
+    month that is months_ahead months after the current one.
+
+    Rows of a new partition's month that are held by the default
+    partition are moved into the new partition before it is attached.
+
+    Returns:
+        The names of the partitions that were created.
+    """
+    current = month_start(now or timezone.now())
+    partitions = get_partitions(cursor, table)
+    lower = partitions[-1].upper if partitions else current
+    target = add_months(current, months_ahead + 1)
+    cursor.execute("SELECT to_regclass(%s)", [f'"{table}_default"'])
+    default = f"{table}_default" if cursor.fetchone()[0] else None
+
+    created = []
+    while lower < target:
+        upper = add_months(lower, 1)
+        name = f"{table}_p{lower:%Y%m}"
+        bounds = [lower.isoformat(), upper.isoformat()]
+        if default is None:
+            cursor.execute(
+                f'CREATE TABLE "{name}" PARTITION OF "{table}" '
+                f"FOR VALUES FROM (%s) TO (%s)",
+                bounds,
+            )
+        else:
+            # Attaching scans the default partition for rows of the new
+            # month, which only exist if maintenance fell behind.
+            cursor.execute(
+                f'CREATE TABLE "{name}" '
+                f'(LIKE "{table}" INCLUDING DEFAULTS)')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM "{default}" '
+                f'WHERE "timestamp" >= %s AND "timestamp" < %s '
+                f"RETURNING *) "
+                f'INSERT INTO "{name}" SELECT * FROM moved',
+                bounds,
+            )
+            cursor.execute(
+                f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" '
+                f"FOR VALUES FROM (%s) TO (%s)",
+                bounds,
+            )
+        created.append(name)
+        lower = upper
+    return created
+
+
+def drop_partitions(cursor, table, retention_months, detach_only=False,
+                    now=None):
+    """
+    Detaches the partitions of a table that only hold rows older than
+    retention_months full months, and drops them unless detach_only is
+    set.
+
+    Returns:
+        The names of the partitions that were detached.
+    """
+    cutoff = add_months(month_start(now or timezone.now()),
+                        -retention_months)
+    detached = []
+    for partition in get_partitions(cursor, table):
+        if partition.upper > cutoff:
+            continue
+        cursor.execute(
+            f'ALTER TABLE "{table}" DETACH PARTITION "{partition.name}"')
+        if not detach_only:
+            cursor.execute(f'DROP TABLE "{partition.name}"')
+        detached.append(partition.name)
+    return detached
+
+
+def partition_table(cursor, table, months_ahead, now=None):
+    """
+    Converts a regular table into a table partitioned by month on its
+    "timestamp" column.
+
+    The existing table becomes the ``<table>_legacy`` partition, holding
+    every row up to the end of the current month, so no rows are copied.
+    Its primary key is widened to (id, timestamp), as PostgreSQL requires
+    the partition key to be part of it, and its indexes and foreign keys
+    are recreated on the new parent table.
+    """
+    legacy = f"{table}_legacy"
+    bound = add_months(month_start(now or timezone.now()), 1)
+
+    cursor.execute(
+        """
+        SELECT indexname, indexdef FROM pg_indexes
+        WHERE tablename = %s AND indexname NOT IN (
+            SELECT conname FROM pg_constraint
+            WHERE conrelid = %s::regclass AND contype = 'p'
+        )
+        """,
+        [table, table],
+    )
+    indexes = cursor.fetchall()
+    cursor.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+        WHERE conrelid = %s::regclass AND contype IN ('p', 'f')
+        ORDER BY contype DESC
+        """,
+        [table],
+    )
+    primary_key, *foreign_keys = cursor.fetchall()
+    cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM "{table}"')
+    next_id = cursor.fetchone()[0]
+
+    cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{legacy}"')
+    for name, _ in indexes:
+        cursor.execute(
+            f'ALTER INDEX "{name}" RENAME TO "{name[:56]}_legacy"')
+    cursor.execute(
+        f'ALTER TABLE "{legacy}" ALTER COLUMN id DROP IDENTITY IF EXISTS')
+    cursor.execute(f'ALTER TABLE "{legacy}" ALTER COLUMN id DROP DEFAULT')
+    cursor.execute(
+        f'ALTER TABLE "{legacy}" DROP CONSTRAINT "{primary_key[0]}"')
+    cursor.execute(
+        f'ALTER TABLE "{legacy}" ADD PRIMARY KEY (id, "timestamp")')
+
+    cursor.execute(
+        f'CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS) '
+        f'PARTITION BY RANGE ("timestamp")')
+    cursor.execute(
+        f'ALTER TABLE "{table}" ALTER COLUMN id '
+        f"ADD GENERATED BY DEFAULT AS IDENTITY (START WITH {int(next_id)})")
+    cursor.execute(
+        f'ALTER TABLE "{table}" ADD CONSTRAINT "{primary_key[0]}" '
+        f'PRIMARY KEY (id, "timestamp")')
+    for name, definition in foreign_keys:
+        cursor.execute(
+            f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+    for _, definition in indexes:
+        cursor.execute(definition)
+
+    cursor.execute(
+        f'ALTER TABLE "{table}" ATTACH PARTITION "{legacy}" '
+        f"FOR VALUES FROM (MINVALUE) TO (%s)",
+        [bound.isoformat()],
+    )
+    create_partitions(cursor, table, months_ahead, now=now)
+
+
+def maintain_partitions(connection, months_ahead, retention_months=None,
+                        detach_only=False):
+    """
+    Creates the default and upcoming partitions of every history table
+    and, if retention_months is set, detaches or drops the expired ones.
+
+    Returns:
+        A dict mapping each table to the names of the partitions that were
+        created and detached.
+    """
+    report = {}
+    with connection.cursor() as cursor:
+        for table in partitioned_tables():
+            create_default_partition(cursor, table)
+            created = create_partitions(cursor, table, months_ahead)
+            detached = []
+            if retention_months is not None:
+                detached = drop_partitions(
+                    cursor, table, retention_months, detach_only)
+            report[table] = {"created": created, "detached": detached}
+    return report
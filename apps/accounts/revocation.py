@@ -0,0 +1,255 @@
+"""
+Revocation of JSON web tokens.
+
+Revoked tokens are stored in the RevokedToken table. Every process keeps
+a Bloom filter of the revoked identifiers, shared through the Django
+cache, and checks a token against it first: a token that is not in the
+filter is certainly not revoked, so the normal path costs no query. Only
+a possible match, revoked or a false positive, is looked up in the table.
+
+The filter stored in the cache is tagged with a version that changes on
+every revocation and purge. Processes compare it with their own copy at
+most every REVOCATION_SYNC_INTERVAL seconds and rebuild the filter from
+the table when the cached one is missing or out of date. A cache local to
+each process would never tell them, so without a shared cache every token
+is looked up in the table instead.
+"""
+import datetime
+import hashlib
+import math
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .caches import cache_is_shared
+from .models import CustomUser, RevokedToken
+
+VERSION_KEY = "accounts:revoked:version"
+FILTER_KEY = "accounts:revoked:filter"
+
+
+class BloomFilter:
+    """
+    A fixed-size set of strings that answers membership with no false
+    negatives and a bounded rate of false positives.
+
+    Args:
+        capacity (int): The number of values the filter is sized for.
+        error_rate (float): The false positive rate at capacity.
+        bits (bytes): The content of a filter of the same size, if any.
+    """
+
+    def __init__(self, capacity, error_rate, bits=None):
+        self.size = max(8, math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        if bits is not None:
+            if len(bits) != len(self.bits):
+                raise ValueError("The bits do not match the filter size.")
+            self.bits[:] = bits
+
+    def _positions(self, value):
+        # Double hashing: k positions out of one 128-bit digest.
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
+
+
+class TokenDenylist:
+    """
+    The Bloom filter of revoked tokens of this process.
+
+    Args:
+        capacity (int): The number of revoked tokens the filter is sized
+            for; more only raise the rate of false positives.
+        error_rate (float): The false positive rate at capacity.
+        sync_interval (float): How many seconds the filter is used before
+            checking the cache for revocations made by other processes.
+    """
+
+    def __init__(self, capacity, error_rate, sync_interval):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self._filter = None
+        self._version = None
+        self._synced_at = 0
+        self._lock = threading.Lock()
+
+    def _build(self):
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        for jti in RevokedToken.objects.filter(
+                expires_at__gt=timezone.now()).values_list(
+                    "jti", flat=True).iterator():
+            bloom.add(jti)
+        return bloom
+
+    def sync(self):
+        """
+        Replaces the filter of this process with the current one, from the
+        cache or rebuilt from the database, once the sync interval has
+        passed.
+        """
+        now = time.monotonic()
+        if self._filter is not None and (
+                now - self._synced_at < self.sync_interval):
+            return
+        with self._lock:
+            version = cache.get(VERSION_KEY)
+            if version is None:
+                cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+                version = cache.get(VERSION_KEY)
+            if version != self._version or self._filter is None:
+                bloom = None
+                cached = cache.get(FILTER_KEY)
+                if cached is not None and cached[0] == version:
+                    try:
+                        bloom = BloomFilter(
+                            self.capacity, self.error_rate, cached[1])
+                    except ValueError:
+                        pass
+                if bloom is None:
+                    # Read after the version, so a revocation committed
+                    # meanwhile either is in the rows or changes the
+                    # version again.
+                    bloom = self._build()
+                    cache.set(FILTER_KEY, (version, bytes(bloom.bits)), None)
+                self._filter, self._version = bloom, version
+            self._synced_at = now
+
+    def invalidate(self, jtis=()):
+        """
+        Adds tokens to the filter of this process right away, and makes
+        every process rebuild its filter at its next sync.
+
+        Args:
+            jtis (iterable): The identifiers of newly revoked tokens.
+        """
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+        with self._lock:
+            if self._filter is not None:
+                for jti in jtis:
+                    self._filter.add(jti)
+
+    def is_revoked(self, jti):
+        """
+        Checks whether a token was revoked, querying the database only
+        if the filter reports a possible match, or always when the cache
+        is not shared.
+
+        Args:
+            jti (str): The identifier of the token.
+
+        Returns:
+            True if the token was revoked.
+        """
+        if cache_is_shared():
+            self.sync()
+            if jti not in self._filter:
+                return False
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+
+_denylist = None
+_denylist_lock = threading.Lock()
+
+
+def get_token_denylist():
+    """
+    Returns the TokenDenylist of this process, configured from the
+    REVOCATION_FILTER_CAPACITY, REVOCATION_FILTER_ERROR_RATE and
+    REVOCATION_SYNC_INTERVAL settings.
+    """
+    global _denylist
+    if _denylist is None:
+        with _denylist_lock:
+            if _denylist is None:
+                _denylist = TokenDenylist(
+                    capacity=settings.REVOCATION_FILTER_CAPACITY,
+                    error_rate=settings.REVOCATION_FILTER_ERROR_RATE,
+                    sync_interval=settings.REVOCATION_SYNC_INTERVAL,
+                )
+    return _denylist
+
+
+def revoke_token(token):
+    """
+    Revokes a token until it expires.
+
+    Args:
+        token (Token): The validated token.
+
+    Returns:
+        The RevokedToken.
+    """
+    jti = token[api_settings.JTI_CLAIM]
+    revoked, created = RevokedToken.objects.get_or_create(
+        jti=jti,
+        defaults={"expires_at": datetime.datetime.fromtimestamp(
+            token["exp"], tz=datetime.timezone.utc)},
+    )
+    transaction.on_commit(lambda: get_token_denylist().invalidate([jti]))
+    return revoked
+
+
+def check_token(token):
+    """
+    Checks that a token was not revoked and that its user is still
+    active. The user is only loaded when the auth_version claim of the
+    token is missing or out of date, or when the cache is not shared.
+
+    Args:
+        token (Token): The validated token.
+
+    Raises:
+        TokenError: If the token was revoked or its user is inactive.
+    """
+    if get_token_denylist().is_revoked(token[api_settings.JTI_CLAIM]):
+        raise TokenError(_("Token is revoked"))
+
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    version = token.get("auth_version")
+    if (cache_is_shared() and version is not None
+            and version == CustomUser.get_auth_version(user_id)):
+        if token.get("is_active", False):
+            return
+    elif CustomUser.objects.filter(pk=user_id, is_active=True).exists():
+        return
+    raise TokenError(_("User is inactive"))
+
+
+class RevocableRefreshToken(RefreshToken):
+    """
+    A refresh token that fails verification once it was revoked or its
+    user was deactivated.
+    """
+
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        check_token(self)
+
+    def blacklist(self):
+        # Called by TokenRefreshSerializer on rotation when
+        # BLACKLIST_AFTER_ROTATION is set.
+        return revoke_token(self)
@@ -0,0 +1,70 @@
+"""
+Search of users by email or phone number.
+
+On PostgreSQL, migration 0020 installs the pg_trgm extension and indexes
+the trigrams of the upper-cased emails and of the phone numbers with GIN
+indexes, which serve substring lookups in milliseconds whatever the size
+of the user table. Terms too short to hold a trigram cannot be narrowed
+down by these indexes and only match the start of the values. On other
+databases, the same lookups scan the table.
+"""
+from django.db import connection
+from django.db.models import Q
+from rest_framework import filters
+
+# Trigram indexes created by migration 0020 on PostgreSQL.
+TRIGRAM_INDEXES = (
+    ("accounts_user_email_trgm_idx", "UPPER(email) gin_trgm_ops"),
+    ("accounts_user_phone_trgm_idx", "phone_number gin_trgm_ops"),
+)
+
+MIN_SUBSTRING_LENGTH = 3
+
+
+def search_users(queryset, terms):
+    """
+    Filters users by email and phone number.
+
+    Args:
+        queryset (QuerySet): The users to search.
+        terms (iterable): The words searched; every word must be found in
+            the email, case-insensitively, or the phone number. Words
+            shorter than MIN_SUBSTRING_LENGTH match their start only.
+
+    Returns:
+        The filtered queryset.
+    """
+    for term in terms:
+        if len(term) < MIN_SUBSTRING_LENGTH:
+            match = (Q(email__istartswith=term)
+                     | Q(phone_number__startswith=term))
+        else:
+            match = Q(email__icontains=term) | Q(phone_number__contains=term)
+        queryset = queryset.filter(match)
+    return queryset
+
+
+def has_trigram_indexes():
+    """
+    Returns whether the trigram indexes of the user table exist.
+    """
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM pg_indexes WHERE indexname = ANY(%s)",
+            [[name for name, _ in TRIGRAM_INDEXES]])
+        return cursor.fetchone()[0] == len(TRIGRAM_INDEXES)
+
+
+class UserSearchFilter(filters.SearchFilter):
+    """
+    Filters users with search_users() by the words of the search query
+    parameter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search_users(queryset, terms)
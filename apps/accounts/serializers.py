@@ -1,7 +1,27 @@
+import collections
+import functools
+import operator
+
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+    TokenVerifySerializer,
+)
+from rest_framework_simplejwt.tokens import RefreshToken, UntypedToken
 from django.contrib.auth.password_validation import validate_password
+from django.db.models import Manager
+from django.utils.functional import cached_property
 
-from .models import CustomUser
+from .last_logins import record_last_login
+from .revocation import RevocableRefreshToken, check_token, revoke_token
+from .models import (
+    CustomUser,
+    UserVisitHistory,
+    LoginHistoryTrail,
+    LoginAttemptsHistory,
+    ExtraData,
+)
 
 
 class RegistrationSerializer(serializers.ModelSerializer):
@@ -84,4 +104,179 @@ class ChangeEmailSerializer(serializers.Serializer):
 class CustomUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
-        exclude = ('password',)
+        exclude = ('password', 'auth_version')
+
+
+def _field_reader(name, field):
+    if isinstance(field, serializers.DateTimeField):
+        get = operator.attrgetter(name)
+        convert = field.to_representation
+
+        def read(instance):
+            value = get(instance)
+            return None if value is None else convert(value)
+
+        return read
+    # The model already holds the representation of strings, numbers and
+    # booleans.
+    return operator.attrgetter(name)
+
+
+@functools.lru_cache(maxsize=None)
+def _user_field_readers(fields=None):
+    readers = []
+    related = []
+    for name, field in CustomUserSerializer().fields.items():
+        if fields is not None and name not in fields:
+            continue
+        if isinstance(field, serializers.ManyRelatedField):
+            related.append(name)
+        else:
+            readers.append((name, _field_reader(name, field)))
+    return tuple(readers), tuple(related)
+
+
+def _related_ids(users, fields):
+    """
+    Returns the primary keys related to each user through the
+    many-to-many fields, read from their through tables with one query
+    per field.
+    """
+    user_ids = [user.pk for user in users]
+    related = {}
+    for name in fields:
+        field = CustomUser._meta.get_field(name)
+        source = field.m2m_field_name()
+        target = field.m2m_reverse_field_name()
+        ids = collections.defaultdict(list)
+        rows = field.remote_field.through.objects.filter(
+            **{f"{source}__in": user_ids}).values_list(
+                f"{source}_id", f"{target}_id").order_by(f"{target}_id")
+        for user_id, related_id in rows:
+            ids[user_id].append(related_id)
+        related[name] = ids
+    return related
+
+
+class CustomUserReadListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        users = list(data.all() if isinstance(data, Manager) else data)
+        self.child.load_related(users)
+        return super().to_representation(users)
+
+
+class CustomUserReadSerializer(serializers.BaseSerializer):
+    """
+    Read-only serializer representing users as CustomUserSerializer does,
+    at a fraction of the cost: how each field is read and converted is
+    worked out once per set of fields, not for every user, values are
+    copied straight into a dict, and the groups and permissions of a list
+    of users are read in one query each, without building related
+    objects.
+
+    The fields are those of CustomUserSerializer, or the subset given as
+    a tuple by the "fields" entry of the context.
+    """
+
+    class Meta:
+        list_serializer_class = CustomUserReadListSerializer
+
+    @classmethod
+    def get_field_names(cls):
+        readers, related = _user_field_readers()
+        return tuple(name for name, _ in readers) + related
+
+    @cached_property
+    def readers(self):
+        fields = self.context.get("fields")
+        return _user_field_readers(tuple(fields) if fields else None)
+
+    def load_related(self, users):
+        self.related = _related_ids(users, self.readers[1])
+
+    def to_representation(self, instance):
+        if self.parent is None:
+            self.load_related([instance])
+        readers, related = self.readers
+        data = {name: read(instance) for name, read in readers}
+        for name in related:
+            data[name] = self.related[name].get(instance.pk, [])
+        return data
+
+
+class UserVisitHistorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UserVisitHistory
+        fields = ("id", "timestamp", "url", "referer", "user_agent")
+
+
+class LoginHistoryTrailSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LoginHistoryTrail
+        fields = ("id", "timestamp", "successful", "ip_address",
+                  "user_agent", "location")
+
+
+class LoginAttemptsHistorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = LoginAttemptsHistory
+        fields = ("id", "timestamp", "successful", "ip_address",
+                  "user_agent", "location")
+
+
+class ExtraDataSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExtraData
+        fields = ("id", "timestamp", "browser", "ip_address", "device",
+                  "os", "location")
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Issues tokens carrying the claims read by StatelessJWTAuthentication,
+    and buffers the last login time of the user instead of updating it.
+    """
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        record_last_login(self.user.pk)
+        return data
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for field in user.AUTH_STATE_FIELDS:
+            token[field] = getattr(user, field)
+        token["auth_version"] = user.auth_version
+        return token
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refuses refresh tokens that were revoked or whose user was
+    deactivated.
+    """
+
+    token_class = RevocableRefreshToken
+
+
+class RevocableTokenVerifySerializer(TokenVerifySerializer):
+    """
+    Reports revoked tokens and tokens of deactivated users as invalid.
+    """
+
+    def validate(self, attrs):
+        check_token(UntypedToken(attrs["token"]))
+        return {}
+
+
+class TokenRevokeSerializer(serializers.Serializer):
+    """
+    Serializer for revoking a refresh token.
+    """
+
+    refresh = serializers.CharField(write_only=True)
+
+    def validate(self, attrs):
+        revoke_token(RefreshToken(attrs["refresh"]))
+        return {}
@@ -0,0 +1,123 @@
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from .backends import CachedPermissionBackend
+from .models import CustomUser
+from .versions import bump_versions
+from .visits import get_visit_buffer
+
+
+@receiver(request_finished)
+def flush_user_visits(sender, **kwargs):
+    """
+    Writes buffered user visits once a response has been sent, if a full
+    batch is waiting or the flush interval has passed.
+    """
+    buffer = get_visit_buffer()
+    if buffer.flush_due():
+        buffer.flush()
+
+
+def invalidate_permissions(user_ids):
+    """
+    Forgets the cached permissions of the given users once the current
+    transaction commits, so they are not cached again from data that is
+    about to change.
+    """
+    user_ids = list(user_ids)
+    transaction.on_commit(
+        lambda: CachedPermissionBackend.invalidate(user_ids))
+
+
+def _group_members(group_ids):
+    return CustomUser.objects.filter(
+        groups__in=group_ids).values_list("pk", flat=True).distinct()
+
+
+@receiver(m2m_changed, sender=CustomUser.groups.through)
+@receiver(m2m_changed, sender=CustomUser.user_permissions.through)
+def user_permissions_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """
+    Invalidates the users whose groups or own permissions changed, from
+    either side of the relation, and gives them new versions.
+    """
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif action == "pre_clear":
+        # The users are only known before the rows are deleted.
+        user_ids = list(instance.user_set.values_list("pk", flat=True))
+    else:
+        user_ids = pk_set
+    invalidate_permissions(user_ids)
+    bump_versions(user_ids)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def group_permissions_changed(sender, instance, action, reverse, pk_set,
+                              **kwargs):
+    """
+    Invalidates the members of the groups whose permissions changed.
+    """
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        group_ids = [instance.pk]
+    elif action == "pre_clear":
+        group_ids = list(instance.group_set.values_list("pk", flat=True))
+    else:
+        group_ids = pk_set
+    invalidate_permissions(_group_members(group_ids))
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    """
+    Invalidates the members of a deleted group and gives them new
+    versions, their groups changing.
+    """
+    members = list(_group_members([instance.pk]))
+    invalidate_permissions(members)
+    bump_versions(members)
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    """
+    Invalidates a user whose superuser or active status may have changed.
+    """
+    if created:
+        return
+    if update_fields is None or {"is_active", "is_superuser"} & set(
+            update_fields):
+        invalidate_permissions([instance.pk])
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, **kwargs):
+    """
+    Gives a saved or deleted user, and the user table, new versions.
+    """
+    bump_versions([instance.pk])
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    """
+    Forgets the cached auth_version of a deleted user once the deletion
+    commits, so the claims of its tokens are no longer trusted.
+    """
+    key = CustomUser.get_auth_version_key(instance.pk)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,275 @@
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from cookiecutter.celery import app
+
+from .geoip import get_geoip_locator
+from .last_logins import write_last_logins
+from .models import (
+    OTP,
+    CustomUser,
+    ExtraData,
+    Location,
+    LoginEvent,
+    RevokedToken,
+    TaskCursor,
+)
+from .partitions import maintain_partitions
+from .revocation import get_token_denylist
+
+db_logger = logging.getLogger("db")
+
+
+def _process_in_batches(queryset, action, batch_size, max_batches):
+    """
+    Applies an action to the rows of a queryset, at most batch_size rows
+    at a time, so that no statement locks more than one batch.
+
+    Args:
+        queryset (QuerySet): The rows to process.
+        action (callable): Called with a queryset of one batch, returns
+            the number of rows it handled.
+        batch_size (int): The number of rows per batch.
+        max_batches (int): The maximum number of batches per call.
+
+    Returns:
+        The total number of rows handled.
+    """
+    handled = 0
+    for _ in range(max_batches):
+        pks = list(queryset.order_by().values_list("pk", flat=True)[
+            :batch_size])
+        if not pks:
+            break
+        handled += action(queryset.model.objects.filter(pk__in=pks))
+        if len(pks) < batch_size:
+            break
+    return handled
+
+
+@app.task
+def sweep_expired_otps():
+    """
+    Deactivates expired OTPs and deletes inactive OTPs older than
+    OTP_RETENTION, in batches of OTP_SWEEP_BATCH_SIZE.
+
+    Returns:
+        A dict with the number of expired and purged OTPs and the
+        duration of the run in milliseconds.
+    """
+    started = time.monotonic()
+    now = timezone.now()
+    batch_size = settings.OTP_SWEEP_BATCH_SIZE
+    max_batches = settings.OTP_SWEEP_MAX_BATCHES
+
+    expired = _process_in_batches(
+        OTP.objects.filter(active=True, updated_at__lt=now - OTP.EXPIRY),
+        lambda batch: batch.update(active=False),
+        batch_size, max_batches,
+    )
+    purged = _process_in_batches(
+        OTP.objects.filter(
+            active=False, created_at__lt=now - settings.OTP_RETENTION),
+        lambda batch: batch.delete()[0],
+        batch_size, max_batches,
+    )
+
+    metrics = {
+        "expired": expired,
+        "purged": purged,
+        "duration_ms": round((time.monotonic() - started) * 1000),
+    }
+    db_logger.info(
+        "OTP sweep: %(expired)d expired, %(purged)d purged "
+        "in %(duration_ms)d ms", metrics)
+    return metrics
+
+
+@app.task
+def purge_revoked_tokens():
+    """
+    Deletes the revoked tokens that have expired, and has every process
+    rebuild its filter of revoked tokens without them.
+
+    Returns:
+        The number of rows deleted.
+    """
+    purged, _ = RevokedToken.objects.filter(
+        expires_at__lte=timezone.now()).delete()
+    if purged:
+        get_token_denylist().invalidate()
+    db_logger.info("Revoked token purge: %d purged", purged)
+    return purged
+
+
+@app.task
+def maintain_history_partitions():
+    """
+    Creates the upcoming monthly partitions of the history tables and drops
+    the partitions older than HISTORY_RETENTION_MONTHS.
+
+    Returns:
+        A dict mapping each table to the partitions created and dropped,
+        or None when the database is not PostgreSQL.
+    """
+    if connection.vendor != "postgresql":
+        return None
+
+    with transaction.atomic():
+        report = maintain_partitions(
+            connection,
+            settings.HISTORY_PARTITIONS_AHEAD,
+            settings.HISTORY_RETENTION_MONTHS,
+        )
+    for table, changes in report.items():
+        db_logger.info(
+            "Partitions of %s: %d created, %d dropped", table,
+            len(changes["created"]), len(changes["detached"]))
+    return report
+
+
+@app.task(ignore_result=True)
+def record_login_attempt(email, successful, ip_address, user_agent,
+                         timestamp):
+    """
+    Records a login attempt made through the token endpoint, and the
+    client of a successful one as ExtraData. Attempts for an email that
+    has no account are not recorded.
+
+    Args:
+        email (str): The email the attempt was made with.
+        successful (bool): Whether the attempt was successful.
+        ip_address (str): The IP address the attempt was made from.
+        user_agent (str): The user agent of the client.
+        timestamp (str): When the attempt was made, in ISO 8601 format.
+    """
+    user = CustomUser.objects.filter(email=email).first()
+    if user is None:
+        return
+    with transaction.atomic():
+        LoginEvent.record(
+            user, successful, ip_address, user_agent,
+            timestamp=parse_datetime(timestamp),
+        )
+        if successful:
+            ExtraData.record(user, ip_address, user_agent)
+
+
+@app.task
+def flush_last_logins():
+    """
+    Writes the last login times buffered by token logins to
+    CustomUser.last_login, LAST_LOGIN_FLUSH_BATCH_SIZE users per UPDATE.
+
+    Returns:
+        A dict with the number of logins read, users updated and the
+        duration of the run in milliseconds.
+    """
+    started = time.monotonic()
+    metrics = write_last_logins(settings.LAST_LOGIN_FLUSH_BATCH_SIZE)
+    metrics["duration_ms"] = round((time.monotonic() - started) * 1000)
+    db_logger.info(
+        "Last login flush: %(read)d logins, %(updated)d users "
+        "in %(duration_ms)d ms", metrics)
+    return metrics
+
+
+def _enrich_locations(task, model, locator, batch_size, max_batches):
+    """
+    Fills in the location of the rows of a model that have none, in
+    primary key order from where the previous run stopped. The position
+    is kept in a TaskCursor, so it survives restarts and is shared by
+    every worker. It moves past rows that could not be located as well.
+
+    Returns:
+        A dict with the number of rows looked at and located, and whether
+        the run reached the last row without a location.
+    """
+    cursor_name = f"enrich_locations:{model._meta.label_lower}"
+    last_pk = TaskCursor.get(cursor_name)
+    pending = model.objects.filter(location_ref__isnull=True)
+    scanned = located = 0
+    finished = False
+
+    for _ in range(max_batches):
+        rows = list(
+            pending.filter(pk__gt=last_pk)
+            .order_by("pk")
+            .values_list("pk", "ip_address")[:batch_size]
+        )
+        if not rows:
+            finished = True
+            break
+        updates = []
+        for pk, ip_address in rows:
+            location = locator.locate(ip_address)
+            if location is not None:
+                updates.append(
+                    model(pk=pk, location_ref_id=Location.intern(location)))
+        last_pk = rows[-1][0]
+        with transaction.atomic():
+            model.objects.bulk_update(updates, ["location_ref"])
+            TaskCursor.move(cursor_name, last_pk)
+
+        scanned += len(rows)
+        located += len(updates)
+        if task.request.id:
+            task.update_state(state="PROGRESS", meta={
+                "model": model._meta.label,
+                "scanned": scanned,
+                "position": last_pk,
+            })
+        if len(rows) < batch_size:
+            finished = True
+            break
+
+    return {
+        "scanned": scanned,
+        "located": located,
+        "finished": finished,
+    }
+
+
+@app.task(bind=True)
+def enrich_locations(self):
+    """
+    Resolves the IP addresses of login events and extra data without a
+    location against GEOIP_DATABASE, at most GEOIP_MAX_BATCHES batches of
+    GEOIP_BATCH_SIZE rows per model and run. Progress is reported as the
+    PROGRESS state of the task.
+
+    Each row is only looked up once: rows whose address is missing from
+    the database stay without a location until the enrich_locations
+    TaskCursor of their model is reset, e.g. after GEOIP_DATABASE was
+    updated.
+
+    Returns:
+        A dict mapping each model to the number of rows scanned and
+        located and whether all were, or None when GEOIP_DATABASE is not
+        set.
+    """
+    locator = get_geoip_locator()
+    if locator is None:
+        return None
+
+    report = {}
+    for model in (LoginEvent, ExtraData):
+        started = time.monotonic()
+        metrics = _enrich_locations(
+            self, model, locator,
+            settings.GEOIP_BATCH_SIZE, settings.GEOIP_MAX_BATCHES,
+        )
+        metrics["duration_ms"] = round((time.monotonic() - started) * 1000)
+        db_logger.info(
+            "Location enrichment of %s: %d scanned, %d located%s "
+            "in %d ms", model._meta.label, metrics["scanned"],
+            metrics["located"],
+            "" if metrics["finished"] else ", more to scan",
+            metrics["duration_ms"])
+        report[model._meta.label] = metrics
+    return report
@@ -0,0 +1,183 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.accounts.models import CustomUser
+from apps.accounts.serializers import ClaimsTokenObtainPairSerializer
+
+
+class StatelessJWTAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = CustomUser.objects.create_superuser(
+            email="admin@example.com", password="password")
+        self.admin.is_active = True
+        self.admin.save()
+        self.admin = CustomUser.objects.get(pk=self.admin.pk)
+        patcher = mock.patch("apps.accounts.models.cache_is_shared",
+                             return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def authenticate(self, token):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+
+    def test_token_claims(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.admin)
+
+        self.assertTrue(token["is_active"])
+        self.assertTrue(token["is_staff"])
+        self.assertTrue(token["is_superuser"])
+        self.assertEqual(token["auth_version"], self.admin.auth_version)
+
+    def test_fresh_token_skips_user_query(self):
+        self.authenticate(
+            ClaimsTokenObtainPairSerializer.get_token(self.admin))
+        self.client.get(reverse("visit_history"))
+
+        # One query for the page, none for the user.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("visit_history"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(reverse("user-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_stale_token_loads_user(self):
+        self.authenticate(
+            ClaimsTokenObtainPairSerializer.get_token(self.admin))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.is_staff = False
+            self.admin.save()
+
+        response = self.client.get(reverse("user-list"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_deleted_user(self):
+        self.authenticate(
+            ClaimsTokenObtainPairSerializer.get_token(self.admin))
+        self.client.get(reverse("user-list"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.delete()
+
+        response = self.client.get(reverse("user-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_without_shared_cache(self):
+        self.authenticate(
+            ClaimsTokenObtainPairSerializer.get_token(self.admin))
+
+        with mock.patch("apps.accounts.models.cache_is_shared",
+                        return_value=False):
+            self.client.get(reverse("user-list"))
+            # Deleted by another process, which cannot reach this cache.
+            CustomUser.objects.filter(pk=self.admin.pk).delete()
+
+            response = self.client.get(reverse("user-list"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_writes_load_user(self):
+        user = CustomUser.objects.create(email="user@example.com")
+        self.authenticate(
+            ClaimsTokenObtainPairSerializer.get_token(self.admin))
+        self.client.get(reverse("user-list"))
+        # An update that does not change the version.
+        CustomUser.objects.filter(pk=self.admin.pk).update(is_staff=False)
+
+        response = self.client.get(reverse("user-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.delete(
+            reverse("user-detail", args=[user.pk]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(CustomUser.objects.filter(pk=user.pk).exists())
+
+    def test_token_without_claims_loads_user(self):
+        self.authenticate(RefreshToken.for_user(self.admin))
+
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("visit_history"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_auth_version(self):
+        version = self.admin.auth_version
+
+        self.admin.phone_number = "1234567890"
+        self.admin.save()
+        self.assertEqual(self.admin.auth_version, version)
+
+        self.admin.is_active = False
+        self.admin.save(update_fields=["is_active"])
+        self.assertEqual(
+            CustomUser.objects.get(pk=self.admin.pk).auth_version,
+            version + 1)
+
+
+class SchemeAuthenticationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            email="test@example.com", password="password")
+        self.user.is_active = True
+        self.user.save()
+        self.client = APIClient()
+        patcher = mock.patch("apps.accounts.models.cache_is_shared",
+                             return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_bearer_token(self):
+        token = RefreshToken.for_user(self.user)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {token.access_token}")
+
+        response = self.client.patch(
+            reverse("change_profile"), {}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalid_bearer_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer invalid")
+
+        response = self.client.get(reverse("visit_history"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("Bearer", response["WWW-Authenticate"])
+
+    def test_unknown_scheme(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token abc")
+
+        response = self.client.get(reverse("visit_history"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_sessionless_prefix_ignores_session(self):
+        self.client.login(email="test@example.com", password="password")
+
+        response = self.client.get(reverse("visit_history"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(SESSIONLESS_PATH_PREFIXES=[])
+    def test_session(self):
+        self.client.login(email="test@example.com", password="password")
+
+        response = self.client.get(reverse("visit_history"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bearer_token_with_session_cookie(self):
+        self.client.login(email="test@example.com", password="password")
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer {}".format(
+            ClaimsTokenObtainPairSerializer.get_token(
+                self.user).access_token))
+        self.client.get(reverse("visit_history"))
+
+        # Neither the session nor the user is loaded.
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("visit_history"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
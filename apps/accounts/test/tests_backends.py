@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.test import TestCase
+
+from apps.accounts.models import CustomUser
+
+
+class CachedPermissionBackendTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch("apps.accounts.backends.cache_is_shared",
+                             return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = CustomUser.objects.create_user(
+            email="test@example.com", password="password")
+        self.user.is_active = True
+        self.user.save()
+        self.group = Group.objects.create(name="editors")
+        self.view = Permission.objects.get(codename="view_customuser")
+        self.change = Permission.objects.get(codename="change_customuser")
+
+    def fresh_user(self):
+        return CustomUser.objects.get(pk=self.user.pk)
+
+    def assert_perms(self, expected):
+        self.assertEqual(self.fresh_user().get_all_permissions(), expected)
+
+    def test_single_cache_get(self):
+        self.user.user_permissions.add(self.view)
+        self.assertTrue(self.fresh_user().has_perm("accounts.view_customuser"))
+
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.assertTrue(user.has_perm("accounts.view_customuser"))
+            self.assertFalse(user.has_perm("accounts.change_customuser"))
+
+    def test_database_without_shared_cache(self):
+        self.user.user_permissions.add(self.view)
+        self.assertTrue(self.fresh_user().has_perm("accounts.view_customuser"))
+
+        user = self.fresh_user()
+        with mock.patch("apps.accounts.backends.cache_is_shared",
+                        return_value=False):
+            # Changed in another process, which cannot reach this cache.
+            self.user.user_permissions.remove(self.view)
+            self.assertFalse(user.has_perm("accounts.view_customuser"))
+
+    def test_invalidated_by_user_permissions(self):
+        self.assert_perms(set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.user_permissions.add(self.view)
+        self.assert_perms({"accounts.view_customuser"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.view.user_set.clear()
+        self.assert_perms(set())
+
+    def test_invalidated_by_groups(self):
+        self.group.permissions.add(self.change)
+        self.assert_perms(set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.user_set.add(self.user)
+        self.assert_perms({"accounts.change_customuser"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.remove(self.group)
+        self.assert_perms(set())
+
+    def test_invalidated_by_group_permissions(self):
+        self.user.groups.add(self.group)
+        self.assert_perms(set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.add(self.view)
+        self.assert_perms({"accounts.view_customuser"})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.delete()
+        self.assert_perms(set())
+
+    def test_invalidated_by_superuser_status(self):
+        self.assert_perms(set())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_superuser = True
+            self.user.save()
+        self.assertIn("accounts.change_customuser",
+                      self.fresh_user().get_all_permissions())
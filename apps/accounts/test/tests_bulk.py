@@ -0,0 +1,169 @@
+import io
+import json
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.accounts import bulk
+from apps.accounts.bulk import export_users, import_users, read_rows
+from apps.accounts.hashers import PasswordHashingPool
+from apps.accounts.models import CustomUser
+
+CSV = """email,phone_number,password,is_active,ignored
+one@example.com,123,secret-1,true,x
+two@Example.COM,,,no,
+not-an-email,,,,
+one@example.com,,,,
+three@example.com,,,maybe,
+"""
+
+
+@override_settings(
+    PASSWORD_HASHERS=["apps.accounts.hashers.PBKDF2PasswordHasher"],
+    PASSWORD_PBKDF2_ITERATIONS=1000)
+class BulkImportTest(TestCase):
+    def setUp(self):
+        self.pool = PasswordHashingPool("thread", 2)
+        self.addCleanup(self.pool.shutdown)
+
+    def test_import_csv(self):
+        report = import_users(
+            read_rows(io.StringIO(CSV), "csv"), self.pool, batch_size=2)
+
+        self.assertEqual(report["created"], 2)
+        self.assertEqual(
+            [error["line"] for error in report["errors"]], [4, 5, 6])
+        one = CustomUser.objects.get(email="one@example.com")
+        self.assertTrue(one.is_active)
+        self.assertEqual(one.phone_number, "123")
+        self.assertTrue(one.check_password("secret-1"))
+        two = CustomUser.objects.get(email="two@example.com")
+        self.assertFalse(two.is_active)
+        self.assertFalse(two.has_usable_password())
+
+    def test_import_ndjson(self):
+        CustomUser.objects.create_user(email="taken@example.com")
+        lines = "\n".join([
+            json.dumps({"email": "new@example.com", "password": 1234}),
+            "{not json",
+            json.dumps(["new@example.com"]),
+            json.dumps({"email": "taken@example.com"}),
+        ])
+
+        # One SELECT of the taken emails and one INSERT, in a savepoint.
+        with self.assertNumQueries(4):
+            report = import_users(
+                read_rows(io.StringIO(lines), "ndjson"), self.pool,
+                batch_size=10)
+
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(
+            [error["line"] for error in report["errors"]], [2, 3, 4])
+        self.assertTrue(CustomUser.objects.get(
+            email="new@example.com").check_password("1234"))
+
+    def test_conflict_retried_without_conflicting_rows(self):
+        CustomUser.objects.create_user(email="two@example.com")
+        drop_existing = bulk._drop_existing
+        checks = []
+
+        def check_before_concurrent_import(lines, users, errors):
+            # The first check runs before another import creates a user.
+            checks.append(lines)
+            if len(checks) == 1:
+                return lines, users
+            return drop_existing(lines, users, errors)
+
+        with mock.patch("apps.accounts.bulk._drop_existing",
+                        side_effect=check_before_concurrent_import):
+            report = import_users(
+                read_rows(io.StringIO(CSV), "csv"), self.pool,
+                batch_size=10)
+
+        self.assertEqual(len(checks), 2)
+        self.assertEqual(report["created"], 1)
+        self.assertEqual(report["errors"][0], {
+            "line": 3,
+            "errors": ["A user with this email already exists."]})
+        self.assertTrue(
+            CustomUser.objects.filter(email="one@example.com").exists())
+
+    def test_export(self):
+        CustomUser.objects.create_user(
+            email="one@example.com", password="secret", phone_number="1")
+        CustomUser.objects.create_user(email="two@example.com")
+        users = CustomUser.objects.order_by("pk")
+
+        lines = list(export_users(users, "csv"))
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith("id,email,phone_number,"))
+        self.assertNotIn("secret", "".join(lines))
+
+        rows = [json.loads(line)
+                for line in export_users(users, "ndjson")]
+        self.assertEqual(rows[0]["email"], "one@example.com")
+        self.assertNotIn("password", rows[0])
+
+        report = import_users(
+            read_rows(io.StringIO("".join(lines)), "csv"), self.pool, 10)
+        self.assertEqual(report["created"], 0)
+        self.assertEqual(len(report["errors"]), 2)
+
+
+@override_settings(
+    PASSWORD_HASHERS=["apps.accounts.hashers.PBKDF2PasswordHasher"],
+    PASSWORD_PBKDF2_ITERATIONS=1000)
+class BulkUserAPITest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        admin = CustomUser.objects.create_superuser(
+            email="admin@example.com", password="password")
+        admin.is_active = True
+        admin.save()
+        self.client.credentials(HTTP_AUTHORIZATION="Bearer {}".format(
+            RefreshToken.for_user(admin).access_token))
+
+    def test_import(self):
+        response = self.client.generic(
+            "POST", reverse("user-import-users"), CSV,
+            content_type="text/csv")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["created"], 2)
+        self.assertEqual(len(response.data["errors"]), 3)
+
+    @override_settings(USER_IMPORT_MAX_SIZE=10)
+    def test_import_too_large(self):
+        response = self.client.generic(
+            "POST", reverse("user-import-users"), CSV,
+            content_type="text/csv")
+
+        self.assertEqual(response.status_code,
+                         status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(CustomUser.objects.count(), 1)
+
+    def test_export(self):
+        response = self.client.get(
+            reverse("user-export-users"),
+            {"file_format": "ndjson", "is_active": "true"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in
+                b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["email"] for row in rows],
+                         ["admin@example.com"])
+
+    def test_unknown_format(self):
+        response = self.client.get(
+            reverse("user-export-users"), {"file_format": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_only(self):
+        self.client.credentials()
+        response = self.client.get(reverse("user-export-users"))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,102 @@
+import unittest
+from unittest import mock
+
+from django.contrib.auth.hashers import check_password, make_password
+from django.test import TestCase, override_settings
+
+from apps.accounts.hashers import PasswordHashingPool
+from apps.accounts.models import CustomUser
+
+try:
+    import argon2
+except ImportError:
+    argon2 = None
+
+PBKDF2 = "apps.accounts.hashers.PBKDF2PasswordHasher"
+ARGON2 = "apps.accounts.hashers.Argon2PasswordHasher"
+
+
+@override_settings(PASSWORD_HASHERS=[PBKDF2, ARGON2],
+                   PASSWORD_PBKDF2_ITERATIONS=1000)
+class PasswordHashersTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="test@example.com", password="password")
+
+    def test_iterations_from_settings(self):
+        self.assertTrue(
+            self.user.password.startswith("pbkdf2_sha256$1000$"))
+        self.assertTrue(check_password("password", self.user.password))
+
+    def test_rehash_on_login(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertTrue(self.user.check_password("password"))
+
+        self.user.refresh_from_db()
+        self.assertTrue(
+            self.user.password.startswith("pbkdf2_sha256$2000$"))
+
+    def test_no_rehash_on_wrong_password(self):
+        encoded = self.user.password
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertFalse(self.user.check_password("wrong"))
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, encoded)
+
+    def test_no_rehash_when_current(self):
+        with mock.patch.object(CustomUser, "save") as save:
+            self.assertTrue(self.user.check_password("password"))
+        save.assert_not_called()
+
+    @unittest.skipIf(argon2 is None, "argon2-cffi is not installed")
+    @override_settings(PASSWORD_ARGON2_TIME_COST=1,
+                       PASSWORD_ARGON2_MEMORY_COST=1024,
+                       PASSWORD_ARGON2_PARALLELISM=1)
+    def test_switch_profile(self):
+        with override_settings(PASSWORD_HASHERS=[ARGON2, PBKDF2]):
+            self.assertTrue(self.user.check_password("password"))
+
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith("argon2$"))
+            self.assertIn("m=1024,t=1,p=1", self.user.password)
+
+
+@override_settings(PASSWORD_HASHERS=[PBKDF2],
+                   PASSWORD_PBKDF2_ITERATIONS=1000)
+class PasswordHashingPoolTest(TestCase):
+    def assert_pool_works(self, pool):
+        self.addCleanup(pool.shutdown)
+        encoded = pool.make_password("password")
+
+        self.assertTrue(encoded.startswith("pbkdf2_sha256$1000$"))
+        self.assertEqual(pool.check_password("password", encoded),
+                         (True, False))
+        self.assertEqual(pool.check_password("wrong", encoded),
+                         (False, False))
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(pool.check_password("password", encoded),
+                             (True, True))
+
+    def test_inline(self):
+        self.assert_pool_works(PasswordHashingPool(None, 1))
+
+    def test_threads(self):
+        self.assert_pool_works(PasswordHashingPool("thread", 2))
+
+    def test_processes(self):
+        pool = PasswordHashingPool("process", 1)
+        self.addCleanup(pool.shutdown)
+        encoded = pool.make_password("password")
+
+        self.assertTrue(check_password("password", encoded))
+        self.assertEqual(pool.check_password("password", encoded),
+                         (True, False))
+
+    def test_unusable_password(self):
+        pool = PasswordHashingPool("thread", 1)
+        self.addCleanup(pool.shutdown)
+
+        self.assertEqual(
+            pool.check_password("password", make_password(None)),
+            (False, False))
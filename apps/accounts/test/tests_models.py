@@ -1,3 +1,5 @@
+from unittest import mock
+
 from django.test import TestCase
 from django.utils import timezone
 from django.core.exceptions import ValidationError
@@ -6,8 +8,12 @@ from apps.accounts.models import CustomUser
 from apps.accounts.models import UserVisitHistory
 from apps.accounts.models import LoginHistoryTrail
 from apps.accounts.models import LoginAttemptsHistory
+from apps.accounts.models import LoginEvent
 from apps.accounts.models import ExtraData
 from apps.accounts.models import OTP
+from apps.accounts.models import InternedValue
+from apps.accounts.models import Location
+from apps.accounts.models import UserAgent
 
 
 class CustomUserTests(TestCase):
@@ -164,6 +170,29 @@ class LoginAttemptsHistoryTest(TestCase):
         self.assertEqual(login_attempt.user_agent, user_agent)
 
 
+class LoginEventTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="test@example.com")
+
+    def test_record_single_insert(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            LoginEvent.record(self.user, True, "127.0.0.1", "Mozilla/5.0")
+        self.addCleanup(InternedValue.clear_cache)
+
+        with self.assertNumQueries(1):
+            event = LoginEvent.record(
+                self.user, False, "127.0.0.1", "Mozilla/5.0")
+
+        self.assertFalse(event.successful)
+        self.assertEqual(self.user.login_events.count(), 2)
+
+    def test_history_models_share_events(self):
+        event = LoginEvent.record(self.user, True, "127.0.0.1", "Mozilla/5.0")
+
+        self.assertEqual(LoginHistoryTrail.objects.get().pk, event.pk)
+        self.assertEqual(LoginAttemptsHistory.objects.get().pk, event.pk)
+
+
 class ExtraDataTest(TestCase):
     def setUp(self):
         self.user = CustomUser.objects.create(email="test@example.com")
@@ -188,6 +217,71 @@ class ExtraDataTest(TestCase):
         self.assertEqual(extra_data.location, location)
 
 
+IPHONE = (
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 16_5 like Mac OS X) "
+    "AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.5 Mobile/15E148 "
+    "Safari/604.1"
+)
+
+
+class InternedValueTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="test@example.com")
+        self.addCleanup(InternedValue.clear_cache)
+
+    def test_values_are_stored_once(self):
+        for i in range(3):
+            UserVisitHistory.objects.create(
+                user=self.user, url=f"/page{i}", user_agent="Mozilla/5.0")
+
+        self.assertEqual(UserAgent.objects.count(), 1)
+        self.assertEqual(
+            UserVisitHistory.objects.filter(
+                user_agent_ref__value="Mozilla/5.0").count(), 3)
+
+    def test_cached_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            pk = UserAgent.intern("Mozilla/5.0")
+
+        with self.assertNumQueries(0):
+            self.assertEqual(UserAgent.intern("Mozilla/5.0"), pk)
+
+    def test_not_cached_before_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            Location.intern("New York")
+            with self.assertNumQueries(1):
+                Location.intern("New York")
+
+        self.assertEqual(len(callbacks), 1)
+
+    def test_null_values(self):
+        extra_data = ExtraData.objects.create(
+            user=self.user, browser="Firefox", ip_address="127.0.0.1")
+
+        extra_data.refresh_from_db()
+        self.assertIsNone(extra_data.device)
+        self.assertIsNone(extra_data.location)
+
+    def test_user_agent_classified(self):
+        visit = UserVisitHistory.objects.create(
+            user=self.user, url="/", user_agent=IPHONE)
+
+        user_agent = UserAgent.objects.select_related(
+            "browser_ref", "device_ref", "os_ref").get(
+                pk=visit.user_agent_ref_id)
+        self.assertEqual(user_agent.browser_ref.value, "Safari 16")
+        self.assertEqual(user_agent.device_ref.value, "iPhone")
+        self.assertEqual(user_agent.os_ref.value, "iOS 16")
+
+    def test_record_extra_data(self):
+        extra_data = ExtraData.record(self.user, "127.0.0.1", IPHONE)
+
+        extra_data.refresh_from_db()
+        self.assertEqual(extra_data.browser, "Safari 16")
+        self.assertEqual(extra_data.device, "iPhone")
+        self.assertEqual(extra_data.os, "iOS 16")
+
+
 class OTPModelTest(TestCase):
     def setUp(self):
         self.user = CustomUser.objects.create_user(
@@ -280,6 +374,54 @@ class OTPModelTest(TestCase):
             otp.code = '123'
             otp.save()
 
+    def test_codes_are_scoped_per_user(self):
+        other_user = CustomUser.objects.create_user(
+            password="password",
+            email="janedoe@example.com",
+        )
+        with mock.patch.object(OTP, "generate_code", return_value="1234"):
+            otp = OTP.create(self.user)
+            other_otp = OTP.create(other_user)
+
+        # the same code may be active for two different users
+        self.assertEqual(otp.code, other_otp.code)
+        self.assertTrue(otp.is_valid())
+        self.assertTrue(other_otp.is_valid())
+
+    def test_create_retries_on_collision_with_previous_code(self):
+        with mock.patch.object(OTP, "generate_code",
+                               side_effect=["1234", "1234", "5678"]):
+            otp1 = OTP.create(self.user)
+            otp2 = OTP.create(self.user)
+
+        self.assertEqual(otp1.code, "1234")
+        self.assertEqual(otp2.code, "5678")
+        self.assertEqual(OTP.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(OTP.get_latest(self.user), otp2)
+
+    def test_create_query_count(self):
+        OTP.create(self.user)
+
+        # SAVEPOINT, INSERT, UPDATE of the previous code, RELEASE SAVEPOINT
+        with self.assertNumQueries(4):
+            otp = OTP.create(self.user)
+
+        self.assertEqual(
+            list(OTP.objects.filter(user=self.user, active=True)), [otp])
+
+    def test_expiry_does_not_rotate_other_codes(self):
+        otp = OTP.create(self.user)
+        OTP.objects.filter(pk=otp.pk).update(
+            updated_at=timezone.now() - timezone.timedelta(hours=2))
+        otp.refresh_from_db()
+
+        # a single UPDATE of the expired row
+        with self.assertNumQueries(1):
+            self.assertFalse(otp.is_valid())
+
+        otp.refresh_from_db()
+        self.assertFalse(otp.active)
+
     def test_get_latest(self):
         OTP.create(self.user)
         OTP.create(self.user)
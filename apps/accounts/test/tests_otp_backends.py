@@ -0,0 +1,102 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from apps.accounts.models import CustomUser
+from apps.accounts.models import OTP
+from apps.accounts.otp_backends import CacheOTPBackend
+
+
+class DatabaseOTPBackendTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            password="password",
+            email="johndoe@example.com",
+        )
+
+    def test_verify(self):
+        otp = OTP.create(self.user)
+
+        self.assertTrue(OTP.verify(self.user, otp.code))
+        self.assertFalse(OTP.verify(
+            self.user, str((int(otp.code) + 1) % 10000).zfill(4)))
+
+    def test_verify_expired(self):
+        otp = OTP.create(self.user)
+        OTP.objects.filter(pk=otp.pk).update(
+            updated_at=timezone.now() - timezone.timedelta(hours=2))
+
+        self.assertFalse(OTP.verify(self.user, otp.code))
+        self.assertFalse(OTP.objects.get(pk=otp.pk).active)
+
+    def test_verify_without_otp(self):
+        self.assertFalse(OTP.verify(self.user, "1234"))
+
+
+@override_settings(
+    OTP_VERIFICATION_BACKEND="apps.accounts.otp_backends.CacheOTPBackend")
+class CacheOTPBackendTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(
+            password="password",
+            email="johndoe@example.com",
+        )
+
+    def test_verify_from_cache_after_issuance(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            otp = OTP.create(self.user)
+
+        with self.assertNumQueries(0):
+            self.assertTrue(OTP.verify(self.user, otp.code))
+            self.assertFalse(OTP.verify(self.user, "abcd"))
+
+    def test_verify_falls_back_to_database_once(self):
+        otp = OTP.create(self.user)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(OTP.verify(self.user, otp.code))
+        with self.assertNumQueries(0):
+            self.assertTrue(OTP.verify(self.user, otp.code))
+
+    def test_missing_otp_is_cached(self):
+        with self.assertNumQueries(1):
+            self.assertFalse(OTP.verify(self.user, "1234"))
+        with self.assertNumQueries(0):
+            self.assertFalse(OTP.verify(self.user, "1234"))
+
+    def test_new_code_replaces_cached_code(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            otp1 = OTP.create(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            otp2 = OTP.create(self.user)
+
+        self.assertFalse(OTP.verify(self.user, otp1.code))
+        self.assertTrue(OTP.verify(self.user, otp2.code))
+
+    def test_code_issued_during_miss_is_kept(self):
+        for issue_first in (False, True):
+            with self.subTest(issue_first=issue_first):
+                cache.clear()
+                OTP.objects.all().delete()
+                old = OTP.create(self.user) if issue_first else None
+                code = "1111" if old and old.code == "9876" else "9876"
+                new = OTP(user=self.user, code=code,
+                          updated_at=timezone.now())
+                get_latest = OTP.get_latest
+
+                def read_then_issue(user):
+                    # Another request issues a code right after the read.
+                    latest = get_latest(user)
+                    new.save()
+                    CacheOTPBackend().issued(new)
+                    return latest
+
+                with mock.patch.object(OTP, "get_latest",
+                                       side_effect=read_then_issue):
+                    self.assertFalse(OTP.verify(
+                        self.user, old.code if old else "1234"))
+
+                self.assertTrue(OTP.verify(self.user, new.code))
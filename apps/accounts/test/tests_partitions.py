@@ -0,0 +1,107 @@
+import datetime
+import unittest
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from apps.accounts.models import CustomUser
+from apps.accounts.models import UserVisitHistory
+from apps.accounts.partitions import add_months
+from apps.accounts.partitions import create_partitions
+from apps.accounts.partitions import drop_partitions
+from apps.accounts.partitions import get_partitions
+from apps.accounts.partitions import month_start
+
+requires_postgresql = unittest.skipUnless(
+    connection.vendor == "postgresql", "Partitioning requires PostgreSQL")
+
+
+class MonthHelpersTest(SimpleTestCase):
+    def test_month_start(self):
+        self.assertEqual(
+            month_start(datetime.datetime(
+                2026, 10, 18, 13, 5, tzinfo=datetime.timezone.utc)),
+            datetime.datetime(2026, 10, 1, tzinfo=datetime.timezone.utc),
+        )
+
+    def test_add_months(self):
+        start = datetime.datetime(2026, 11, 1, tzinfo=datetime.timezone.utc)
+        self.assertEqual(add_months(start, 2).date(),
+                         datetime.date(2027, 1, 1))
+        self.assertEqual(add_months(start, -11).date(),
+                         datetime.date(2025, 12, 1))
+
+
+@requires_postgresql
+class HistoryPartitionsTest(TestCase):
+    table = "accounts_uservisithistory"
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="test@example.com")
+
+    def partition_of(self, visit):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT tableoid::regclass::text FROM {self.table} "
+                f"WHERE id = %s", [visit.pk])
+            return cursor.fetchone()[0]
+
+    def test_rows_are_routed_by_month(self):
+        next_month = add_months(month_start(timezone.now()), 1)
+        old = UserVisitHistory.objects.create(
+            user=self.user, url="/old", user_agent="Mozilla/5.0",
+            timestamp=timezone.now() - timezone.timedelta(days=400))
+        upcoming = UserVisitHistory.objects.create(
+            user=self.user, url="/upcoming", user_agent="Mozilla/5.0",
+            timestamp=next_month)
+
+        self.assertEqual(self.partition_of(old), f"{self.table}_legacy")
+        self.assertEqual(self.partition_of(upcoming),
+                         f"{self.table}_p{next_month:%Y%m}")
+
+    def test_rows_without_partition_are_moved_from_default(self):
+        later = add_months(month_start(timezone.now()), 6)
+        visit = UserVisitHistory.objects.create(
+            user=self.user, url="/later", user_agent="Mozilla/5.0",
+            timestamp=later)
+        self.assertEqual(self.partition_of(visit), f"{self.table}_default")
+
+        with connection.cursor() as cursor:
+            create_partitions(cursor, self.table, 0, now=later)
+
+        self.assertEqual(self.partition_of(visit),
+                         f"{self.table}_p{later:%Y%m}")
+        self.assertEqual(UserVisitHistory.objects.get().url, "/later")
+
+    def test_create_and_drop_partitions(self):
+        later = add_months(month_start(timezone.now()), 6)
+        with connection.cursor() as cursor:
+            created = create_partitions(cursor, self.table, 3, now=later)
+            self.assertEqual(created[-1], f"{self.table}_p"
+                             f"{add_months(later, 3):%Y%m}")
+
+            dropped = drop_partitions(cursor, self.table, 2, now=later)
+            partitions = get_partitions(cursor, self.table)
+
+        self.assertIn(f"{self.table}_legacy", dropped)
+        self.assertEqual(partitions[0].lower, add_months(later, -2))
+        self.assertEqual(partitions[-1].upper, add_months(later, 4))
+
+    def test_command(self):
+        out = StringIO()
+        call_command("partition_history", "--months-ahead", "4",
+                     "--retention-months", "1000", stdout=out)
+
+        month = add_months(month_start(timezone.now()), 4)
+        self.assertIn(f"Created {self.table}_p{month:%Y%m}", out.getvalue())
+
+
+@unittest.skipIf(connection.vendor == "postgresql", "PostgreSQL supported")
+class HistoryPartitionsCommandTest(SimpleTestCase):
+    def test_requires_postgresql(self):
+        with self.assertRaises(CommandError):
+            call_command("partition_history")
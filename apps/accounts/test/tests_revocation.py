@@ -0,0 +1,181 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.accounts.checks import check_shared_cache
+from apps.accounts.models import CustomUser, RevokedToken
+from apps.accounts.revocation import (
+    BloomFilter,
+    TokenDenylist,
+    get_token_denylist,
+)
+from apps.accounts.serializers import ClaimsTokenObtainPairSerializer
+from apps.accounts.tasks import purge_revoked_tokens
+
+
+class BloomFilterTest(TestCase):
+    def test_membership(self):
+        bloom = BloomFilter(1000, 0.01)
+        values = [f"token-{i}" for i in range(1000)]
+        for value in values:
+            bloom.add(value)
+
+        for value in values:
+            self.assertIn(value, bloom)
+        false_positives = sum(
+            f"other-{i}" in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+    def test_bits(self):
+        bloom = BloomFilter(100, 0.01)
+        bloom.add("token")
+
+        copy = BloomFilter(100, 0.01, bytes(bloom.bits))
+        self.assertIn("token", copy)
+        with self.assertRaises(ValueError):
+            BloomFilter(1000, 0.01, bytes(bloom.bits))
+
+
+class TokenRevocationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            email="test@example.com", password="password")
+        self.user.is_active = True
+        self.user.save()
+        self.refresh = ClaimsTokenObtainPairSerializer.get_token(self.user)
+        # The filter and the cached versions are only used with a cache
+        # shared between processes.
+        for target in ("apps.accounts.revocation.cache_is_shared",
+                       "apps.accounts.models.cache_is_shared"):
+            patcher = mock.patch(target, return_value=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        # Query counts below assume the filter of this process is loaded.
+        get_token_denylist().sync()
+
+    def post(self, name, data):
+        return self.client.post(reverse(name), data, format="json")
+
+    def revoke(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post("token_revoke", {"refresh": str(token)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_refresh_without_queries(self):
+        self.post("token_refresh", {"refresh": str(self.refresh)})
+
+        with self.assertNumQueries(0):
+            response = self.post(
+                "token_refresh", {"refresh": str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("access", response.data)
+
+    def test_revoked_refresh_token(self):
+        self.revoke(self.refresh)
+
+        response = self.post("token_refresh", {"refresh": str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.post("token_verify", {"token": str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        other = ClaimsTokenObtainPairSerializer.get_token(self.user)
+        response = self.post("token_refresh", {"refresh": str(other)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_revocation_reaches_other_processes(self):
+        other = TokenDenylist(1000, 0.01, sync_interval=0)
+        jti = self.refresh["jti"]
+        self.assertFalse(other.is_revoked(jti))
+
+        self.revoke(self.refresh)
+
+        self.assertTrue(other.is_revoked(jti))
+
+    def test_deactivated_user(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        response = self.post("token_refresh", {"refresh": str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.post(
+            "token_verify", {"token": str(self.refresh.access_token)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user(self):
+        self.post("token_refresh", {"refresh": str(self.refresh)})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        response = self.post("token_refresh", {"refresh": str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_without_claims(self):
+        refresh = RefreshToken.for_user(self.user)
+
+        with self.assertNumQueries(1):
+            response = self.post("token_refresh", {"refresh": str(refresh)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_purge(self):
+        other = TokenDenylist(1000, 0.01, sync_interval=0)
+        jti = self.refresh["jti"]
+        self.revoke(self.refresh)
+        self.assertTrue(other.is_revoked(jti))
+        RevokedToken.objects.update(expires_at=timezone.now())
+
+        self.assertEqual(purge_revoked_tokens(), 1)
+
+        # Rebuilding the filter is the only query, the token no longer
+        # matches it.
+        with self.assertNumQueries(1):
+            self.assertFalse(other.is_revoked(jti))
+
+
+class UnsharedCacheRevocationTest(TestCase):
+    def test_revocation_reaches_other_processes_at_once(self):
+        user = CustomUser.objects.create(email="test@example.com")
+        refresh = ClaimsTokenObtainPairSerializer.get_token(user)
+        jti = refresh["jti"]
+        other = TokenDenylist(1000, 0.01, sync_interval=3600)
+        self.assertFalse(other.is_revoked(jti))
+
+        RevokedToken.objects.create(jti=jti, expires_at=timezone.now())
+
+        # No filter to sync: the table is queried.
+        with self.assertNumQueries(1):
+            self.assertTrue(other.is_revoked(jti))
+
+    def test_user_is_loaded(self):
+        user = CustomUser.objects.create(
+            email="test@example.com", is_active=True)
+        data = {"refresh": str(
+            ClaimsTokenObtainPairSerializer.get_token(user))}
+        client = APIClient()
+        url = reverse("token_refresh")
+        response = client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Deleted by another process, which cannot reach this cache.
+        CustomUser.objects.filter(pk=user.pk).delete()
+
+        response = client.post(url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deploy_check(self):
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)],
+            ["accounts.E001"])
+        with override_settings(CACHES={"default": {
+                "BACKEND": "django.core.cache.backends.redis.RedisCache",
+                "LOCATION": "redis://127.0.0.1:6379"}}):
+            self.assertEqual(check_shared_cache(None), [])
@@ -0,0 +1,272 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.accounts.geoip import GeoIPLocator
+from apps.accounts.models import CustomUser
+from apps.accounts.models import ExtraData
+from apps.accounts.models import LoginEvent
+from apps.accounts.models import OTP
+from apps.accounts.models import TaskCursor
+from apps.accounts.last_logins import (
+    SEQUENCE_KEY,
+    _entry_key,
+    record_last_login,
+)
+from apps.accounts.tasks import enrich_locations
+from apps.accounts.tasks import flush_last_logins
+from apps.accounts.tasks import sweep_expired_otps
+
+
+class SweepExpiredOTPsTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            password="password",
+            email="johndoe@example.com",
+        )
+
+    def create_otp(self, user, age):
+        otp = OTP.create(user)
+        OTP.objects.filter(pk=otp.pk).update(
+            created_at=timezone.now() - age,
+            updated_at=timezone.now() - age,
+        )
+        return otp
+
+    def test_sweep(self):
+        other_user = CustomUser.objects.create_user(
+            password="password",
+            email="janedoe@example.com",
+        )
+        old = self.create_otp(self.user, timezone.timedelta(days=2))
+        expired = self.create_otp(self.user, timezone.timedelta(hours=2))
+        valid = self.create_otp(other_user, timezone.timedelta(minutes=5))
+
+        metrics = sweep_expired_otps()
+
+        self.assertEqual(metrics["expired"], 1)
+        self.assertEqual(metrics["purged"], 1)
+        self.assertFalse(OTP.objects.filter(pk=old.pk).exists())
+        self.assertFalse(OTP.objects.get(pk=expired.pk).active)
+        self.assertTrue(OTP.objects.get(pk=valid.pk).active)
+
+    @override_settings(OTP_SWEEP_BATCH_SIZE=2, OTP_SWEEP_MAX_BATCHES=2)
+    def test_sweep_is_bounded(self):
+        for i in range(5):
+            user = CustomUser.objects.create_user(
+                password="password",
+                email=f"user{i}@example.com",
+            )
+            self.create_otp(user, timezone.timedelta(hours=2))
+
+        self.assertEqual(sweep_expired_otps()["expired"], 4)
+        self.assertEqual(sweep_expired_otps()["expired"], 1)
+        self.assertFalse(OTP.objects.filter(active=True).exists())
+
+
+class FakeReader:
+    def __init__(self, records):
+        self.records = records
+        self.lookups = []
+
+    def get(self, ip_address):
+        self.lookups.append(ip_address)
+        return self.records.get(ip_address)
+
+
+def city(name, country):
+    return {"city": {"names": {"en": name}},
+            "country": {"names": {"en": country}}}
+
+
+class GeoIPLocatorTest(TestCase):
+    def test_locate_caches_by_prefix(self):
+        reader = FakeReader({"81.2.69.0": city("London", "United Kingdom")})
+        locator = GeoIPLocator(reader, cache_size=10)
+
+        self.assertEqual(locator.locate("81.2.69.142"),
+                         "London, United Kingdom")
+        self.assertEqual(locator.locate("81.2.69.160"),
+                         "London, United Kingdom")
+        self.assertIsNone(locator.locate("2001:db8::1"))
+        self.assertEqual(reader.lookups, ["81.2.69.0", "2001:db8::"])
+
+    def test_country_only(self):
+        reader = FakeReader({"81.2.69.0": {
+            "country": {"names": {"en": "United Kingdom"}}}})
+        locator = GeoIPLocator(reader, cache_size=10)
+
+        self.assertEqual(locator.locate("81.2.69.1"), "United Kingdom")
+
+
+@override_settings(GEOIP_BATCH_SIZE=2, GEOIP_MAX_BATCHES=2)
+class EnrichLocationsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(email="test@example.com")
+        self.locator = GeoIPLocator(
+            FakeReader({"81.2.69.0": city("London", "United Kingdom")}),
+            cache_size=10)
+        patcher = mock.patch("apps.accounts.tasks.get_geoip_locator",
+                             return_value=self.locator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_enrich(self):
+        for i in range(5):
+            LoginEvent.record(self.user, True, f"81.2.69.{i}", "Mozilla/5.0")
+        unknown = LoginEvent.record(
+            self.user, True, "10.0.0.1", "Mozilla/5.0")
+        ExtraData.objects.create(
+            user=self.user, browser="Firefox", ip_address="81.2.69.10")
+
+        report = enrich_locations()
+
+        self.assertEqual(report["accounts.LoginEvent"], {
+            "scanned": 4, "located": 4, "finished": False,
+            "duration_ms": mock.ANY})
+        self.assertEqual(report["accounts.ExtraData"]["located"], 1)
+
+        # The cursor is kept in the database, not in the cache.
+        cache.clear()
+        report = enrich_locations()
+
+        self.assertEqual(report["accounts.LoginEvent"]["scanned"], 2)
+        self.assertTrue(report["accounts.LoginEvent"]["finished"])
+        self.assertEqual(
+            LoginEvent.objects.filter(
+                location_ref__value="London, United Kingdom").count(), 5)
+        unknown.refresh_from_db()
+        self.assertIsNone(unknown.location)
+
+        # Rows left without a location are not scanned again.
+        report = enrich_locations()
+
+        self.assertEqual(report["accounts.LoginEvent"]["scanned"], 0)
+
+    def test_reset_cursor_retries_unlocated_rows(self):
+        event = LoginEvent.record(self.user, True, "10.0.0.1", "Mozilla/5.0")
+        enrich_locations()
+
+        # An updated database does not reach rows already scanned.
+        updated = GeoIPLocator(
+            FakeReader({"10.0.0.0": city("Paris", "France")}),
+            cache_size=10)
+        with mock.patch("apps.accounts.tasks.get_geoip_locator",
+                        return_value=updated):
+            enrich_locations()
+            event.refresh_from_db()
+            self.assertIsNone(event.location)
+
+            TaskCursor.objects.filter(
+                name__startswith="enrich_locations:").delete()
+            report = enrich_locations()
+
+        self.assertEqual(report["accounts.LoginEvent"]["located"], 1)
+        event.refresh_from_db()
+        self.assertEqual(event.location, "Paris, France")
+
+    def test_without_database(self):
+        with mock.patch("apps.accounts.tasks.get_geoip_locator",
+                        return_value=None):
+            self.assertIsNone(enrich_locations())
+
+
+@override_settings(LAST_LOGIN_FLUSH_BATCH_SIZE=2)
+class FlushLastLoginsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            CustomUser.objects.create(email=f"user{i}@example.com")
+            for i in range(3)
+        ]
+        # The log is only kept in a cache shared with the Celery worker.
+        patcher = mock.patch("apps.accounts.last_logins.cache_is_shared",
+                             return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flush(self):
+        now = timezone.now()
+        for i, user in enumerate(self.users):
+            record_last_login(user.pk, now - timezone.timedelta(minutes=i))
+        record_last_login(
+            self.users[0].pk, now - timezone.timedelta(minutes=5))
+
+        # One UPDATE per batch of users, and the log entry.
+        with self.assertNumQueries(3):
+            report = flush_last_logins()
+
+        self.assertEqual(report, {
+            "read": 4, "updated": 3, "duration_ms": mock.ANY})
+        for i, user in enumerate(self.users):
+            user.refresh_from_db()
+            self.assertEqual(
+                user.last_login, now - timezone.timedelta(minutes=i))
+
+        report = flush_last_logins()
+        self.assertEqual(report["read"], 0)
+
+    def test_entry_not_set_yet_is_waited_for(self):
+        now = timezone.now()
+        record_last_login(self.users[0].pk, now)
+        # A login numbered by another process that has not set it yet.
+        cache.incr(SEQUENCE_KEY)
+        record_last_login(self.users[1].pk, now)
+
+        report = flush_last_logins()
+
+        self.assertEqual(report["read"], 1)
+        cache.set(_entry_key(2), (self.users[2].pk, now))
+        report = flush_last_logins()
+
+        self.assertEqual(report["read"], 2)
+        for user in self.users:
+            user.refresh_from_db()
+            self.assertEqual(user.last_login, now)
+
+    def test_expired_entry_is_skipped(self):
+        now = timezone.now()
+        # A login numbered, but never set, before the first flush.
+        cache.set(SEQUENCE_KEY, 1, None)
+        record_last_login(self.users[0].pk, now)
+
+        self.assertEqual(flush_last_logins()["read"], 0)
+        # Numbered before the previous flush: expired, not on its way.
+        self.assertEqual(flush_last_logins()["read"], 1)
+        self.users[0].refresh_from_db()
+        self.assertEqual(self.users[0].last_login, now)
+
+    def test_token_login_is_buffered(self):
+        user = self.users[0]
+        user.set_password("password")
+        user.is_active = True
+        user.save()
+
+        response = self.client.post(
+            reverse("token_obtain_pair"),
+            {"email": user.email, "password": "password"},
+            content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertIsNone(user.last_login)
+
+        flush_last_logins()
+        user.refresh_from_db()
+        self.assertIsNotNone(user.last_login)
+
+
+class RecordLastLoginTest(TestCase):
+    def test_written_without_shared_cache(self):
+        user = CustomUser.objects.create(email="test@example.com")
+        now = timezone.now()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            record_last_login(user.pk, now)
+
+        user.refresh_from_db()
+        self.assertEqual(user.last_login, now)
+        self.assertEqual(flush_last_logins()["read"], 0)
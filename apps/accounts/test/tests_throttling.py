@@ -0,0 +1,171 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from kombu.exceptions import OperationalError
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.accounts.models import CustomUser
+from apps.accounts.models import ExtraData, LoginEvent
+from apps.accounts.tasks import record_login_attempt
+from apps.accounts.throttling import SlidingWindowCounter
+
+FIREFOX = ("Mozilla/5.0 (X11; Linux x86_64; rv:115.0) Gecko/20100101 "
+           "Firefox/115.0")
+
+
+class SlidingWindowCounterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.counter = SlidingWindowCounter("test", 60)
+
+    def test_count(self):
+        for _ in range(3):
+            self.counter.hit("ident", now=6000)
+
+        self.assertEqual(self.counter.count("ident", now=6030), 3)
+        self.assertEqual(self.counter.count("other", now=6030), 0)
+
+    def test_previous_bucket_fades_out(self):
+        for _ in range(4):
+            self.counter.hit("ident", now=6000)
+
+        self.assertEqual(self.counter.count("ident", now=6075), 3)
+        self.assertEqual(self.counter.count("ident", now=6120), 0)
+
+    def test_retry_after(self):
+        for _ in range(4):
+            self.counter.hit("ident", now=6000)
+
+        self.assertEqual(self.counter.retry_after("ident", 5, now=6010), 0)
+        self.assertEqual(self.counter.retry_after("ident", 4, now=6010), 51)
+        # 4 * (1 - 15 / 60) = 3 events are left at 6075, fewer after.
+        self.assertEqual(self.counter.retry_after("ident", 3, now=6070), 6)
+
+    def test_reset(self):
+        self.counter.hit("ident", now=6000)
+        self.counter.reset("ident", now=6000)
+
+        self.assertEqual(self.counter.count("ident", now=6000), 0)
+
+
+@override_settings(
+    LOGIN_FAILURE_WINDOW=60,
+    LOGIN_MAX_FAILURES_PER_USER=3,
+    LOGIN_MAX_FAILURES_PER_IP=5,
+)
+class LoginTokenObtainPairViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(
+            email="test@example.com", password="password")
+        self.user.is_active = True
+        self.user.save()
+        self.url = reverse("token_obtain_pair")
+        # A window sliding during a test would forget failures.
+        patcher = mock.patch("apps.accounts.throttling.time")
+        patcher.start().time.return_value = 6000.0
+        self.addCleanup(patcher.stop)
+
+    def login(self, password, email="test@example.com"):
+        return self.client.post(
+            self.url, {"email": email, "password": password}, format="json",
+            HTTP_USER_AGENT="Mozilla/5.0")
+
+    def test_lockout_after_failures(self):
+        for _ in range(3):
+            response = self.login("wrong")
+            self.assertEqual(response.status_code,
+                             status.HTTP_401_UNAUTHORIZED)
+
+        with self.assertNumQueries(0):
+            response = self.login("password")
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response)
+
+    def test_lockout_per_ip(self):
+        for i in range(5):
+            self.login("wrong", email=f"user{i}@example.com")
+
+        response = self.login("password")
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_lockout_per_forwarded_ip(self):
+        # Behind one proxy, the client is the last forwarded address; the
+        # addresses before it are made up by the client.
+        for i in range(5):
+            self.client.post(
+                self.url, {"email": f"user{i}@example.com",
+                           "password": "wrong"}, format="json",
+                HTTP_X_FORWARDED_FOR=f"10.0.0.{i}, 203.0.113.1")
+
+        response = self.client.post(
+            self.url, {"email": "test@example.com", "password": "password"},
+            format="json", HTTP_X_FORWARDED_FOR="203.0.113.2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(
+            self.url, {"email": "test@example.com", "password": "password"},
+            format="json", HTTP_X_FORWARDED_FOR="203.0.113.1")
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_success_clears_failures(self):
+        for _ in range(2):
+            self.login("wrong")
+
+        response = self.login("password")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for _ in range(2):
+            self.login("wrong")
+        response = self.login("password")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @mock.patch("apps.accounts.tasks.record_login_attempt.delay")
+    def test_attempts_recorded_after_commit(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.login("wrong")
+            self.login("password", email="unknown@example.com")
+            delay.assert_not_called()
+
+        self.assertEqual(delay.call_count, 2)
+        for call in delay.call_args_list:
+            record_login_attempt(*call.args)
+
+        event = LoginEvent.objects.get()
+        self.assertEqual(event.user, self.user)
+        self.assertFalse(event.successful)
+        self.assertEqual(event.ip_address, "127.0.0.1")
+        self.assertEqual(event.user_agent, "Mozilla/5.0")
+        self.assertFalse(ExtraData.objects.exists())
+
+    @mock.patch("apps.accounts.tasks.record_login_attempt.delay")
+    def test_successful_login_records_extra_data(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                self.url, {"email": "test@example.com",
+                           "password": "password"}, format="json",
+                HTTP_USER_AGENT=FIREFOX)
+
+        record_login_attempt(*delay.call_args.args)
+
+        extra_data = ExtraData.objects.get()
+        self.assertEqual(extra_data.user, self.user)
+        self.assertEqual(extra_data.ip_address, "127.0.0.1")
+        self.assertEqual(extra_data.browser, "Firefox 115")
+        self.assertEqual(extra_data.os, "Linux")
+
+    @mock.patch("apps.accounts.tasks.record_login_attempt.delay",
+                side_effect=OperationalError("broker down"))
+    def test_broker_outage_does_not_fail_login(self, delay):
+        with self.assertLogs("db", "ERROR"):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.login("password")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        delay.assert_called_once()
@@ -0,0 +1,68 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.accounts.models import UserAgent
+from apps.accounts.useragents import classify
+from apps.accounts.useragents import parse_user_agent
+from apps.accounts.useragents import parse_user_agents
+
+
+class ClassifyTest(TestCase):
+    def test_classify(self):
+        cases = {
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36":
+                ("Chrome 114", "Desktop", "Windows 10"),
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36 "
+            "Edg/114.0.1823.51":
+                ("Edge 114", "Desktop", "Windows 10"),
+            "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+            "AppleWebKit/605.1.15 (KHTML, like Gecko) Version/16.5 "
+            "Safari/605.1.15":
+                ("Safari 16", "Desktop", "macOS 10.15"),
+            "Mozilla/5.0 (Linux; Android 13; SM-S901B) AppleWebKit/537.36 "
+            "(KHTML, like Gecko) Chrome/112.0.0.0 Mobile Safari/537.36":
+                ("Chrome 112", "Mobile", "Android 13"),
+            "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:109.0) "
+            "Gecko/20100101 Firefox/115.0":
+                ("Firefox 115", "Desktop", "Linux"),
+            "Mozilla/5.0 (compatible; Googlebot/2.1; "
+            "+http://www.google.com/bot.html)":
+                ("Bot", "Bot", "Other"),
+            "": ("Other", "Other", "Other"),
+        }
+        for user_agent, expected in cases.items():
+            with self.subTest(user_agent=user_agent):
+                self.assertEqual(tuple(classify(user_agent)), expected)
+
+    def test_parse_is_cached(self):
+        parse_user_agent.cache_clear()
+
+        parsed = parse_user_agents(["curl/8.0", "curl/8.0", "Wget/1.21"])
+
+        self.assertEqual(parsed["curl/8.0"].browser, "Script")
+        self.assertEqual(len(parsed), 2)
+        info = parse_user_agent.cache_info()
+        self.assertEqual((info.hits, info.misses), (0, 2))
+
+        parse_user_agent("curl/8.0")
+        self.assertEqual(parse_user_agent.cache_info().hits, 1)
+
+
+class ClassifyUserAgentsCommandTest(TestCase):
+    def test_backfill(self):
+        for i in range(3):
+            UserAgent.objects.create(
+                value=f"Firefox/{100 + i}.0",
+                digest=UserAgent.make_digest(f"Firefox/{100 + i}.0"))
+
+        call_command("classify_user_agents", batch_size=2, stdout=StringIO())
+
+        self.assertFalse(
+            UserAgent.objects.filter(browser_ref__isnull=True).exists())
+        self.assertEqual(
+            UserAgent.objects.get(value="Firefox/101.0").browser_ref.value,
+            "Firefox 101")
@@ -1,12 +1,33 @@
+import io
+import json
+import unittest
+from unittest import mock
+
 from rest_framework.test import APITestCase, APIClient, APIRequestFactory
 from django.urls import reverse
-from django.test import TestCase
+from django.contrib import admin
+from django.test import RequestFactory, TestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from apps.accounts.serializers import (
+    ClaimsTokenObtainPairSerializer,
+    CustomUserReadSerializer,
+    CustomUserSerializer,
+)
 from apps.accounts.views import RegistrationAPIView
+from apps.accounts.admin import CustomUserAdmin
 from apps.accounts.models import CustomUser
+from apps.accounts.pagination import estimate_count
+from apps.accounts.models import UserVisitHistory
+from apps.accounts.models import LoginHistoryTrail
+from apps.accounts.models import LoginAttemptsHistory
 
 
 class RegistrationAPIViewTestCase(TestCase):
@@ -314,6 +335,7 @@ class ChangeEmailAPIViewTest(APITestCase):
 class CustomUserViewSetTests(APITestCase):
 
     def setUp(self):
+        cache.clear()
         self.factory = APIRequestFactory()
         self.client = APIClient()
 
@@ -348,7 +370,259 @@ class CustomUserViewSetTests(APITestCase):
             HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['count'], 2)
+
+        with self.settings(ESTIMATED_COUNT_LIMIT=1):
+            response = self.client.get(url, {'is_active': 'true'})
+        self.assertEqual(response.data['count'], 1)
+
+    def test_list_accounts_pages(self):
+        """
+        Test that the list is cursor paginated, newest first
+        """
+        url = reverse('user-list')
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        response = self.client.get(url, {'page_size': 1})
+        self.assertEqual(
+            [user['email'] for user in response.data['results']],
+            [self.user.email])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(
+            [user['email'] for user in response.data['results']],
+            [self.superuser.email])
+        self.assertIsNone(response.data['next'])
+
+    def test_stream_accounts(self):
+        """
+        Test that the whole list can be streamed as NDJSON or JSON
+        """
+        url = reverse('user-list')
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        response = self.client.get(
+            url, {'stream': 'ndjson', 'ordering': 'email'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        users = [json.loads(line) for line in
+                 b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([user['email'] for user in users],
+                         [self.superuser.email, self.user.email])
+        self.assertNotIn('password', users[0])
+
+        response = self.client.get(
+            url, {'stream': 'json', 'is_staff': 'false'})
+        users = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([user['email'] for user in users],
+                         [self.user.email])
+
+        response = self.client.get(url, {'stream': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_accounts_fields(self):
+        """
+        Test that the fields parameter narrows the users listed
+        """
+        url = reverse('user-list')
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        response = self.client.get(url)
+        self.assertNotIn('password', response.data['results'][0])
+
+        # The user of the token, the count and the page, no groups or
+        # permissions.
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                url, {'fields': 'email,id', 'is_active': 'true'})
+        self.assertEqual(response.data['results'], [
+            {'id': self.user.pk, 'email': self.user.email},
+            {'id': self.superuser.pk, 'email': self.superuser.email},
+        ])
+
+        response = self.client.get(url, {'fields': 'email,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_email_case_insensitive(self):
+        """
+        Test that users can be filtered by email whatever its case
+        """
+        url = reverse('user-list')
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        response = self.client.get(url, {'email__iexact': 'USER@Test.com'})
+        self.assertEqual(
+            [user['id'] for user in response.data['results']],
+            [self.user.pk])
+
+    def test_search_accounts(self):
+        """
+        Test that users can be searched by email and phone number
+        """
+        url = reverse('user-list')
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+
+        def search(terms):
+            response = self.client.get(url, {'search': terms})
+            return [user['id'] for user in response.data['results']]
+
+        self.assertEqual(search('PERUSER'), [self.superuser.pk])
+        self.assertEqual(search('test.com user'),
+                         [self.user.pk, self.superuser.pk])
+        # Short terms only match the start.
+        self.assertEqual(search('us'), [self.user.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.phone_number = '5551234'
+            self.user.save()
+        self.assertEqual(search('1234'), [self.user.pk])
+
+    def claims_credentials(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(
+            CustomUser.objects.get(pk=self.superuser.pk))
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+
+    @mock.patch('apps.accounts.models.cache_is_shared',
+                return_value=True)
+    @mock.patch('apps.accounts.versions.cache_is_shared',
+                return_value=True)
+    def test_list_not_modified(self, cache_is_shared, models_cache_is_shared):
+        """
+        Test that an unchanged list answers 304 without any query, and
+        that changing any user changes its ETag
+        """
+        url = reverse('user-list')
+        self.claims_credentials()
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        other = self.client.get(url, {'fields': 'id'})['ETag']
+        self.assertNotEqual(other, etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.phone_number = '123'
+            self.user.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @mock.patch('apps.accounts.models.cache_is_shared',
+                return_value=True)
+    @mock.patch('apps.accounts.versions.cache_is_shared',
+                return_value=True)
+    def test_list_pages_cached(self, cache_is_shared, models_cache_is_shared):
+        """
+        Test that pages are cached until a user changes
+        """
+        url = reverse('user-list')
+        self.claims_credentials()
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.create_user(email='new@test.com')
+
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 3)
+
+    @mock.patch('apps.accounts.models.cache_is_shared',
+                return_value=True)
+    @mock.patch('apps.accounts.versions.cache_is_shared',
+                return_value=True)
+    def test_retrieve_not_modified(self, cache_is_shared, models_cache_is_shared):
+        """
+        Test that the ETag of a user only changes with the user
+        """
+        url = reverse('user-detail', kwargs={'pk': self.user.pk})
+        self.claims_credentials()
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.superuser.phone_number = '123'
+            self.superuser.save()
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.groups.add(Group.objects.create(name='group'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['groups']), 1)
+
+    @mock.patch('apps.accounts.models.cache_is_shared',
+                return_value=True)
+    @mock.patch('apps.accounts.versions.cache_is_shared',
+                return_value=True)
+    def test_no_etag_on_errors(self, cache_is_shared,
+                               models_cache_is_shared):
+        """
+        Test that only successful responses are labelled with an ETag
+        """
+        url = reverse('user-list')
+        self.claims_credentials()
+        response = self.client.get(url, {'stream': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('ETag', response)
+
+        response = self.client.get(url, {'stream': 'json'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', response)
+
+    def test_no_etag_without_shared_cache(self):
+        """
+        Test that responses are neither labelled nor cached when other
+        processes could not bump the versions
+        """
+        url = reverse('user-list')
+        self.claims_credentials()
+        response = self.client.get(url)
+        self.assertNotIn('ETag', response)
+
+        CustomUser.objects.create_user(email='new@test.com')
+        response = self.client.get(url)
+        self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get(
+            reverse('user-detail', kwargs={'pk': self.user.pk}))
+        self.assertNotIn('ETag', response)
+
+    def test_read_serializer(self):
+        """
+        Test that the read serializer represents users as
+        CustomUserSerializer does
+        """
+        group = Group.objects.create(name='group')
+        self.user.groups.add(group)
+        self.user.user_permissions.add(*Permission.objects.all()[:2])
+        self.user.last_login = timezone.now()
+        self.user.save()
+
+        url = reverse('user-detail', kwargs={'pk': self.user.pk})
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+        response = self.client.get(url)
+        expected = CustomUserSerializer(
+            CustomUser.objects.get(pk=self.user.pk)).data
+        expected['user_permissions'].sort()
+        self.assertEqual(response.data, expected)
+        self.assertEqual(response.data['groups'], [group.pk])
+        self.assertEqual(len(response.data['user_permissions']), 2)
+
+        # One query for the users, one for each many-to-many field.
+        with self.assertNumQueries(3):
+            data = CustomUserReadSerializer(
+                CustomUser.objects.order_by('-pk'), many=True).data
+        self.assertEqual(data[0], expected)
+        self.assertEqual(data[1]['groups'], [])
 
     def test_list_accounts_non_superuser(self):
         """
@@ -400,3 +674,135 @@ class CustomUserViewSetTests(APITestCase):
             HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CustomUserAdminTests(TestCase):
+
+    def setUp(self):
+        self.admin = CustomUserAdmin(CustomUser, admin.site)
+        self.user = CustomUser.objects.create_user(
+            email='user@test.com', phone_number='5551234')
+        CustomUser.objects.create_user(email='other@test.com')
+
+    def test_search(self):
+        """
+        Test that the admin searches users by email and phone number
+        """
+        request = RequestFactory().get('/')
+        queryset, may_have_duplicates = self.admin.get_search_results(
+            request, CustomUser.objects.all(), 'ser@TEST 555')
+
+        self.assertEqual(list(queryset), [self.user])
+        self.assertFalse(may_have_duplicates)
+
+    def test_changelist_count(self):
+        """
+        Test that the changelist counts users up to ESTIMATED_COUNT_LIMIT
+        """
+        request = RequestFactory().get('/')
+        request.user = CustomUser.objects.create_superuser(
+            email='admin@test.com')
+
+        changelist = self.admin.get_changelist_instance(request)
+        self.assertEqual(changelist.result_count, 3)
+        self.assertIsNone(changelist.full_result_count)
+
+        with self.settings(ESTIMATED_COUNT_LIMIT=2):
+            changelist = self.admin.get_changelist_instance(request)
+        self.assertEqual(changelist.result_count, 2)
+
+
+@unittest.skipUnless(
+    connection.vendor == "postgresql", "Statistics require PostgreSQL")
+class CustomUserPostgreSQLTests(TestCase):
+
+    def test_filters_use_indexes(self):
+        """
+        Test that an index serves every filter and ordering of the user
+        list, on a table too small for the planner to prefer one
+        """
+        call_command('explain_user_list', users=2000, disable_seqscan=True,
+                     stdout=io.StringIO())
+
+    def test_estimated_count(self):
+        """
+        Test that unfiltered tables are counted from their statistics
+        """
+        for i in range(3):
+            CustomUser.objects.create_user(email=f'user{i}@test.com')
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE accounts_customuser')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                estimate_count(CustomUser.objects.all(), limit=2), 3)
+        self.assertEqual(estimate_count(
+            CustomUser.objects.filter(email__startswith='user'), limit=2), 2)
+        self.assertEqual(
+            estimate_count(CustomUser.objects.all(), limit=10), 3)
+
+
+class HistoryAPIViewTests(APITestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+
+        self.user = CustomUser.objects.create_user(
+            email='user@test.com',
+            password='testpass123',
+        )
+        activate_user = CustomUser.objects.get(email="user@test.com")
+        activate_user.is_active = True
+        activate_user.save()
+        self.other_user = CustomUser.objects.create_user(
+            email='other@test.com',
+            password='testpass123',
+        )
+
+        now = timezone.now()
+        for i in range(5):
+            UserVisitHistory.objects.create(
+                user=self.user, url=f'/page{i}', user_agent='Mozilla/5.0',
+                timestamp=now - timezone.timedelta(minutes=i))
+        UserVisitHistory.objects.create(
+            user=self.other_user, url='/other', user_agent='Mozilla/5.0')
+
+        self.refresh = RefreshToken.for_user(self.user)
+        self.access_token = str(self.refresh.access_token)
+
+    def test_visit_history_pages(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+
+        response = self.client.get(
+            reverse('visit_history'), {'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        urls = [visit['url'] for visit in response.data['results']]
+
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            urls += [visit['url'] for visit in response.data['results']]
+
+        self.assertEqual(urls, [f'/page{i}' for i in range(5)])
+
+    def test_login_history(self):
+        LoginHistoryTrail.objects.create(
+            user=self.user, successful=True, ip_address='127.0.0.1',
+            user_agent='Mozilla/5.0')
+        LoginAttemptsHistory.objects.create(
+            user=self.other_user, ip_address='127.0.0.1',
+            user_agent='Mozilla/5.0')
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {self.access_token}')
+
+        response = self.client.get(reverse('login_history'))
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertTrue(response.data['results'][0]['successful'])
+
+        # Both views read the same login events.
+        response = self.client.get(reverse('login_attempts'))
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_history_unauthorized(self):
+        response = self.client.get(reverse('extra_data'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
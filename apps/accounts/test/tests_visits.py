@@ -0,0 +1,221 @@
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.db import DatabaseError
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.accounts.middleware import UserVisitMiddleware
+from apps.accounts.models import CustomUser
+from apps.accounts.models import InternedValue
+from apps.accounts.models import UserAgent
+from apps.accounts.models import UserVisitHistory
+from apps.accounts import visits
+from apps.accounts.visits import VisitBuffer
+
+
+class VisitBufferTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="test@example.com")
+        self.buffer = VisitBuffer(
+            capacity=10, batch_size=3, flush_interval=60)
+        patcher = mock.patch("apps.accounts.visits.threading.Timer")
+        self.timer = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_flush_in_batches(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            UserAgent.intern("Mozilla/5.0")
+        self.addCleanup(InternedValue.clear_cache)
+        for i in range(7):
+            self.buffer.append(self.user.pk, f"/page{i}", None, "Mozilla/5.0")
+
+        with self.assertNumQueries(3):
+            self.assertEqual(self.buffer.flush(), 7)
+
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(UserVisitHistory.objects.count(), 7)
+        self.assertEqual(self.buffer.stats()["written"], 7)
+
+    def test_flush_keeps_recording_time(self):
+        recorded_at = timezone.now() - timezone.timedelta(minutes=5)
+        with mock.patch("django.utils.timezone.now",
+                        return_value=recorded_at):
+            self.buffer.append(self.user.pk, "/test", None, "Mozilla/5.0")
+
+        self.buffer.flush()
+
+        self.assertEqual(UserVisitHistory.objects.get().timestamp,
+                         recorded_at)
+
+    def test_full_buffer_drops_visits(self):
+        for i in range(12):
+            self.buffer.append(self.user.pk, "/test", None, "Mozilla/5.0")
+
+        self.assertEqual(len(self.buffer), 10)
+        self.assertEqual(self.buffer.stats()["dropped"], 2)
+
+    def test_flush_due(self):
+        self.assertFalse(self.buffer.flush_due())
+
+        self.buffer.append(self.user.pk, "/test", None, "Mozilla/5.0")
+        self.assertFalse(self.buffer.flush_due())
+
+        self.buffer.flush_interval = 0
+        self.assertTrue(self.buffer.flush_due())
+
+        self.buffer.flush_interval = 60
+        self.buffer.append(self.user.pk, "/test", None, "Mozilla/5.0")
+        self.buffer.append(self.user.pk, "/test", None, "Mozilla/5.0")
+        self.assertTrue(self.buffer.flush_due())
+
+    def test_timer_flushes_waiting_visits(self):
+        self.buffer.append(self.user.pk, "/page1", None, "Mozilla/5.0")
+        self.buffer.append(self.user.pk, "/page2", None, "Mozilla/5.0")
+
+        self.timer.assert_called_once_with(60, self.buffer._flush_from_timer)
+        self.timer.return_value.start.assert_called_once_with()
+
+        with mock.patch("apps.accounts.visits.connection") as connection:
+            self.buffer._flush_from_timer()
+
+        connection.close.assert_called_once_with()
+        self.assertEqual(UserVisitHistory.objects.count(), 2)
+
+        self.buffer.append(self.user.pk, "/page3", None, "Mozilla/5.0")
+        self.assertEqual(self.timer.call_count, 2)
+
+    def test_failed_interning_loses_only_the_batch(self):
+        for i in range(4):
+            self.buffer.append(self.user.pk, f"/page{i}", None, "Mozilla/5.0")
+
+        pk = UserAgent.intern("Mozilla/5.0")
+        self.addCleanup(InternedValue.clear_cache)
+        with mock.patch.object(UserAgent, "intern",
+                               side_effect=[DatabaseError, pk]):
+            self.assertEqual(self.buffer.flush(), 1)
+
+        self.assertEqual(len(self.buffer), 0)
+        self.assertEqual(self.buffer.stats()["failed"], 3)
+
+
+class VisitBufferDeletedUserTest(TransactionTestCase):
+    def setUp(self):
+        self.buffer = VisitBuffer(
+            capacity=10, batch_size=10, flush_interval=60)
+        patcher = mock.patch("apps.accounts.visits.threading.Timer")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(InternedValue.clear_cache)
+
+    def test_visits_of_deleted_users_are_discarded(self):
+        kept = CustomUser.objects.create(email="kept@example.com")
+        deleted = CustomUser.objects.create(email="deleted@example.com")
+        for user in (kept, deleted, kept):
+            self.buffer.append(user.pk, "/test", None, "Mozilla/5.0")
+        deleted.delete()
+
+        self.assertEqual(self.buffer.flush(), 2)
+
+        self.assertEqual(
+            UserVisitHistory.objects.filter(user=kept).count(), 2)
+        self.assertEqual(self.buffer.stats()["failed"], 1)
+
+
+class GetVisitBufferTest(TestCase):
+    def test_flushed_at_exit(self):
+        with mock.patch("apps.accounts.visits._visit_buffer", None), \
+                mock.patch("apps.accounts.visits.atexit") as atexit:
+            buffer = visits.get_visit_buffer()
+
+        atexit.register.assert_called_once_with(buffer.flush)
+
+
+class UserVisitMiddlewareTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="test@example.com")
+        self.factory = RequestFactory()
+        self.buffer = VisitBuffer(
+            capacity=10, batch_size=3, flush_interval=60)
+        self.middleware = UserVisitMiddleware(lambda request: HttpResponse())
+        self.middleware.buffer = self.buffer
+        patcher = mock.patch("apps.accounts.visits.threading.Timer")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_records_authenticated_user(self):
+        request = self.factory.get(
+            "/test", HTTP_REFERER="http://example.com/",
+            HTTP_USER_AGENT="Mozilla/5.0")
+        request.user = self.user
+
+        self.middleware(request)
+
+        self.buffer.flush()
+        visit = UserVisitHistory.objects.get()
+        self.assertEqual(visit.user, self.user)
+        self.assertEqual(visit.url, "/test")
+        self.assertEqual(visit.referer, "http://example.com/")
+        self.assertEqual(visit.user_agent, "Mozilla/5.0")
+
+    def test_skips_anonymous_user(self):
+        request = self.factory.get("/test")
+        request.user = AnonymousUser()
+
+        self.middleware(request)
+
+        self.assertEqual(len(self.buffer), 0)
+
+    def test_does_not_load_unused_user(self):
+        loader = mock.Mock(return_value=self.user)
+        request = self.factory.get("/test")
+        request.user = SimpleLazyObject(loader)
+
+        self.middleware(request)
+
+        loader.assert_not_called()
+        self.assertEqual(len(self.buffer), 0)
+
+
+@override_settings(MIDDLEWARE=[
+    "django.middleware.common.CommonMiddleware",
+    "apps.accounts.middleware.UserVisitMiddleware",
+])
+class UserVisitTrackingTest(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="user@test.com",
+            password="testpass123",
+        )
+        self.user.is_active = True
+        self.user.save()
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=(
+                f"Bearer {RefreshToken.for_user(self.user).access_token}"),
+            HTTP_USER_AGENT="Mozilla/5.0",
+        )
+
+    def test_visits_are_written_after_response(self):
+        buffer = VisitBuffer(capacity=10, batch_size=2, flush_interval=60)
+        url = reverse("change_profile")
+        with mock.patch("apps.accounts.visits._visit_buffer", buffer), \
+                mock.patch("apps.accounts.visits.threading.Timer"):
+            self.client.patch(url, {}, format="json")
+            self.assertEqual(UserVisitHistory.objects.count(), 0)
+
+            self.client.patch(url, {}, format="json")
+
+        self.assertEqual(
+            list(UserVisitHistory.objects.values_list("url", flat=True)),
+            [url, url])
@@ -0,0 +1,140 @@
+"""
+Failed login counters kept in the Django cache.
+
+Each counter approximates a sliding window with two fixed buckets: the
+count of the previous bucket is weighted by how much of it still overlaps
+the window. Reading or bumping a counter is one cache round trip whatever
+the number of attempts, and never touches the database.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+
+class SlidingWindowCounter:
+    """
+    Counts events per identifier over the last window seconds.
+
+    Args:
+        prefix (str): The prefix of the cache keys.
+        window (int): The length of the window in seconds.
+    """
+
+    def __init__(self, prefix, window):
+        self.prefix = prefix
+        self.window = window
+
+    def _keys(self, ident, now):
+        bucket = int(now // self.window)
+        return (f"{self.prefix}:{ident}:{bucket}",
+                f"{self.prefix}:{ident}:{bucket - 1}")
+
+    def hit(self, ident, now=None):
+        """
+        Records an event.
+
+        Returns:
+            The number of events in the current bucket.
+        """
+        current, _ = self._keys(ident, now or time.time())
+        # Buckets are read for one more window after they are closed.
+        cache.add(current, 0, timeout=self.window * 2)
+        try:
+            return cache.incr(current)
+        except ValueError:
+            # The key expired between add() and incr().
+            cache.set(current, 1, timeout=self.window * 2)
+            return 1
+
+    def count(self, ident, now=None):
+        """
+        Returns the approximate number of events in the last window.
+        """
+        now = now or time.time()
+        current, previous = self._keys(ident, now)
+        counts = cache.get_many([current, previous])
+        overlap = 1 - (now % self.window) / self.window
+        return counts.get(current, 0) + counts.get(previous, 0) * overlap
+
+    def retry_after(self, ident, limit, now=None):
+        """
+        Returns how many seconds to wait until fewer than limit events
+        are left in the window, 0 if there already are.
+        """
+        now = now or time.time()
+        current, previous = self._keys(ident, now)
+        counts = cache.get_many([current, previous])
+        current_count = counts.get(current, 0)
+        previous_count = counts.get(previous, 0)
+        if current_count >= limit:
+            # Only the next bucket starts from zero.
+            return int(self.window - now % self.window) + 1
+        if current_count + previous_count * (
+                1 - (now % self.window) / self.window) < limit:
+            return 0
+        # The previous bucket fades out until it is below the limit.
+        fraction = 1 - (limit - current_count) / previous_count
+        return int(fraction * self.window - now % self.window) + 1
+
+    def reset(self, ident, now=None):
+        """
+        Forgets the events of an identifier.
+        """
+        cache.delete_many(self._keys(ident, now or time.time()))
+
+
+def get_client_ip(request):
+    """
+    Returns the IP address of the client of a request, as seen by the
+    outermost of the REST_FRAMEWORK["NUM_PROXIES"] trusted proxies in
+    front of the application: addresses they were handed in
+    X-Forwarded-For by the client itself are ignored.
+    """
+    return BaseThrottle().get_ident(request)
+
+
+class LoginThrottle:
+    """
+    Locks out logins after too many failures for the same account or
+    from the same IP address within LOGIN_FAILURE_WINDOW seconds.
+    """
+
+    def __init__(self):
+        window = settings.LOGIN_FAILURE_WINDOW
+        self.user_limit = settings.LOGIN_MAX_FAILURES_PER_USER
+        self.ip_limit = settings.LOGIN_MAX_FAILURES_PER_IP
+        self.users = SlidingWindowCounter("accounts:login:user", window)
+        self.ips = SlidingWindowCounter("accounts:login:ip", window)
+
+    @staticmethod
+    def _user_ident(username):
+        # Hashed so any submitted value is a valid cache key.
+        return hashlib.sha256(
+            username.strip().lower().encode()).hexdigest()
+
+    def locked_for(self, username, ip_address):
+        """
+        Returns the number of seconds the login is locked out for, 0 if it
+        is allowed.
+        """
+        return max(
+            self.users.retry_after(
+                self._user_ident(username), self.user_limit),
+            self.ips.retry_after(ip_address, self.ip_limit),
+        )
+
+    def failed(self, username, ip_address):
+        """
+        Counts a failed login.
+        """
+        self.users.hit(self._user_ident(username))
+        self.ips.hit(ip_address)
+
+    def succeeded(self, username):
+        """
+        Clears the failures of an account after a successful login.
+        """
+        self.users.reset(self._user_ident(username))
@@ -5,7 +5,11 @@ from .views import (
     ChangePasswordAPIView,
     ChangeProfileAPIView,
     ChangeEmailAPIView,
-    CustomUserViewSet
+    CustomUserViewSet,
+    UserVisitHistoryAPIView,
+    LoginHistoryTrailAPIView,
+    LoginAttemptsHistoryAPIView,
+    ExtraDataAPIView,
 )
 
 router = routers.SimpleRouter()
@@ -20,5 +24,13 @@ urlpatterns = [
     path("change_profile/",
          ChangeProfileAPIView.as_view(), name="change_profile"),
     path("change_email/", ChangeEmailAPIView.as_view(), name="change_email"),
+    path("history/visits/",
+         UserVisitHistoryAPIView.as_view(), name="visit_history"),
+    path("history/logins/",
+         LoginHistoryTrailAPIView.as_view(), name="login_history"),
+    path("history/login_attempts/",
+         LoginAttemptsHistoryAPIView.as_view(), name="login_attempts"),
+    path("history/extra_data/",
+         ExtraDataAPIView.as_view(), name="extra_data"),
     path("", include(router.urls)),  # include the router URLs
 ]
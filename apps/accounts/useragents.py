@@ -0,0 +1,131 @@
+"""
+User agent classification.
+
+User agent strings are matched against ordered tables of precompiled
+rules; the first rule of each table that matches wins. Results are
+memoized per raw string, as a site sees the same few hundred user agents
+over and over.
+"""
+import collections
+import functools
+import re
+
+CACHE_SIZE = 10000
+
+UNKNOWN = "Other"
+
+ParsedUserAgent = collections.namedtuple(
+    "ParsedUserAgent", "browser device os")
+
+_WINDOWS_VERSIONS = {
+    "10.0": "10",
+    "6.3": "8.1",
+    "6.2": "8",
+    "6.1": "7",
+    "6.0": "Vista",
+    "5.1": "XP",
+}
+
+# (pattern, format) pairs; the format is applied to the groups of the
+# match, either with str.format or by calling it.
+BROWSER_RULES = (
+    (r"bot|crawl|spider|slurp", "Bot"),
+    (r"Edg(?:e|A|iOS)?/(\d+)", "Edge {0}"),
+    (r"(?:OPR|Opera)/(\d+)", "Opera {0}"),
+    (r"SamsungBrowser/(\d+)", "Samsung Internet {0}"),
+    (r"(?:Chrome|CriOS)/(\d+)", "Chrome {0}"),
+    (r"(?:Firefox|FxiOS)/(\d+)", "Firefox {0}"),
+    (r"MSIE (\d+)|Trident/.*rv:(\d+)",
+     lambda *groups: f"Internet Explorer {groups[0] or groups[1]}"),
+    (r"Version/(\d+).*Safari/", "Safari {0}"),
+    (r"^(?:curl|Wget|python-requests)/", "Script"),
+)
+
+OS_RULES = (
+    (r"Windows NT (\d+\.\d+)",
+     lambda version: f"Windows {_WINDOWS_VERSIONS.get(version, version)}"),
+    (r"(?:iPhone|CPU) OS (\d+)", "iOS {0}"),
+    (r"Android (\d+)", "Android {0}"),
+    (r"Mac OS X (\d+)[_.](\d+)", "macOS {0}.{1}"),
+    (r"CrOS", "Chrome OS"),
+    (r"Linux", "Linux"),
+)
+
+DEVICE_RULES = (
+    (r"bot|crawl|spider|slurp", "Bot"),
+    (r"iPad", "iPad"),
+    (r"iPhone", "iPhone"),
+    (r"Android.*Mobile|Mobile.*Android", "Mobile"),
+    (r"Android|Tablet", "Tablet"),
+    (r"Windows NT|Macintosh|X11|CrOS", "Desktop"),
+)
+
+
+def _compile(rules):
+    return tuple(
+        (re.compile(pattern, re.IGNORECASE),
+         fmt if callable(fmt) else fmt.format)
+        for pattern, fmt in rules
+    )
+
+
+_BROWSERS = _compile(BROWSER_RULES)
+_OSES = _compile(OS_RULES)
+_DEVICES = _compile(DEVICE_RULES)
+
+
+def _match(rules, user_agent):
+    for pattern, fmt in rules:
+        match = pattern.search(user_agent)
+        if match:
+            return fmt(*match.groups())
+    return UNKNOWN
+
+
+def classify(user_agent):
+    """
+    Classifies a user agent string without caching.
+
+    Args:
+        user_agent (str): The raw user agent string.
+
+    Returns:
+        A ParsedUserAgent with the browser, device and operating system,
+        each "Other" when no rule matches.
+    """
+    return ParsedUserAgent(
+        browser=_match(_BROWSERS, user_agent),
+        device=_match(_DEVICES, user_agent),
+        os=_match(_OSES, user_agent),
+    )
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def parse_user_agent(user_agent):
+    """
+    Classifies a user agent string, remembering the last CACHE_SIZE
+    strings.
+
+    Args:
+        user_agent (str): The raw user agent string.
+
+    Returns:
+        A ParsedUserAgent.
+    """
+    return classify(user_agent)
+
+
+def parse_user_agents(user_agents):
+    """
+    Classifies many user agent strings, each distinct string once.
+
+    Args:
+        user_agents (iterable): Raw user agent strings.
+
+    Returns:
+        A dict mapping each distinct string to its ParsedUserAgent.
+    """
+    return {
+        user_agent: parse_user_agent(user_agent)
+        for user_agent in set(user_agents)
+    }
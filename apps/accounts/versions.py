@@ -0,0 +1,69 @@
+"""
+Versions of the users, for conditional requests and response caching.
+
+Each user, and the user table as a whole, has a version kept in the
+Django cache: a random token replaced whenever the user changes, through
+the signals in apps.accounts.signals or explicitly after bulk writes
+that send none. A version missing from the cache, never set or evicted,
+is simply given a new one, which only costs clients a full response.
+
+Versions change once the transaction making the change commits. A
+request reading a version before querying the database therefore never
+labels data older than that version with it.
+
+A version is only trustworthy if every process, including the Celery
+workers and management commands writing users, bumps the same one. With a
+cache local to each process, there are no versions: responses get no ETag
+and are not cached.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .caches import cache_is_shared
+
+TABLE_VERSION_KEY = "accounts:users:version"
+
+
+def _version_key(user_id):
+    return f"{TABLE_VERSION_KEY}:{user_id}"
+
+
+def _new_version():
+    return uuid.uuid4().hex
+
+
+def get_version(user_id=None):
+    """
+    Returns the current version of a user.
+
+    Args:
+        user_id (int): The id of the user, or None for the version of
+            the user table, which changes with every user.
+
+    Returns:
+        The version, a str, or None when the cache is not shared.
+    """
+    if not cache_is_shared():
+        return None
+    key = TABLE_VERSION_KEY if user_id is None else _version_key(user_id)
+    return cache.get_or_set(
+        key, _new_version, settings.USER_VERSION_CACHE_TIMEOUT)
+
+
+def bump_versions(user_ids=()):
+    """
+    Gives the users, and the user table, new versions once the current
+    transaction commits.
+
+    Args:
+        user_ids (iterable): The ids of the users that changed; leave it
+            empty when only users unknown so far, such as new ones, did.
+    """
+    keys = [_version_key(user_id) for user_id in user_ids]
+    keys.append(TABLE_VERSION_KEY)
+    transaction.on_commit(lambda: cache.set_many(
+        {key: _new_version() for key in keys},
+        settings.USER_VERSION_CACHE_TIMEOUT))
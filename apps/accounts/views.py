@@ -1,21 +1,79 @@
-from rest_framework import generics, permissions, status, viewsets, filters
+import codecs
+import hashlib
+import io
+import itertools
+import json
+import logging
+
+from rest_framework import (
+    generics, permissions, serializers, status, viewsets, filters)
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 from django_filters.rest_framework import DjangoFilterBackend
+from kombu.exceptions import OperationalError
+from drf_spectacular.utils import (
+    OpenApiParameter,
+    extend_schema,
+    extend_schema_view,
+)
+from rest_framework.exceptions import AuthenticationFailed, Throttled
 from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenViewBase
 from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from rest_framework.decorators import action
 
-from .models import CustomUser
+from .models import (
+    CustomUser,
+    UserVisitHistory,
+    LoginHistoryTrail,
+    LoginAttemptsHistory,
+    ExtraData,
+)
+from .authentication import StatelessSchemeAuthentication
+from .bulk import CONTENT_TYPES, export_users, import_users, read_rows
+from .hashers import get_password_hashing_pool
+from .pagination import HistoryCursorPagination, UserCursorPagination
+from .search import UserSearchFilter
+from .tasks import record_login_attempt
+from .throttling import LoginThrottle, get_client_ip
+from .versions import get_version
 from .serializers import (
     RegistrationSerializer,
     ChangePasswordSerializer,
     ChangeProfileSerializer,
     ChangeEmailSerializer,
-    CustomUserSerializer
+    CustomUserSerializer,
+    CustomUserReadSerializer,
+    UserVisitHistorySerializer,
+    LoginHistoryTrailSerializer,
+    LoginAttemptsHistorySerializer,
+    ExtraDataSerializer,
+    ClaimsTokenObtainPairSerializer,
+    TokenRevokeSerializer,
 )
 
+db_logger = logging.getLogger("db")
+
+# For read-heavy views that only need the id and status of the user,
+# which a fresh access token carries, so no user row is loaded.
+STATELESS_AUTHENTICATION_CLASSES = (StatelessSchemeAuthentication,)
+
+# The formats a list can be streamed in, with their content type.
+STREAM_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
 
 class RegistrationAPIView(generics.CreateAPIView):
     """
@@ -126,6 +184,51 @@ class ChangeEmailAPIView(APIView):
         )
 
 
+def _representation_key(request, version):
+    # The version of the data, the URL with its filters and fields, and
+    # the media type the response is rendered in.
+    return hashlib.md5(":".join((
+        version, request.build_absolute_uri(), request.accepted_media_type,
+    )).encode()).hexdigest()
+
+
+def user_list_etag(request, *args, **kwargs):
+    """
+    Returns the ETag of a list of users, which changes with any user, or
+    None without versions.
+    """
+    version = get_version()
+    if version is None:
+        return None
+    return _representation_key(request, version)
+
+
+def user_etag(request, pk, *args, **kwargs):
+    """
+    Returns the ETag of a user, which changes with the user, or None
+    without versions.
+    """
+    version = get_version(pk)
+    if version is None:
+        return None
+    return _representation_key(request, version)
+
+
+FIELDS_PARAMETER = OpenApiParameter(
+    "fields", str,
+    description="Comma separated names of the fields to return.")
+
+
+@extend_schema_view(
+    list=extend_schema(
+        responses=CustomUserSerializer(many=True),
+        parameters=[FIELDS_PARAMETER, OpenApiParameter(
+            "stream", str, enum=list(STREAM_CONTENT_TYPES),
+            description="Stream all the users instead of a page.")],
+    ),
+    retrieve=extend_schema(
+        responses=CustomUserSerializer, parameters=[FIELDS_PARAMETER]),
+)
 class CustomUserViewSet(viewsets.ModelViewSet):
     """
     API endpoint that allows viewing, updating, and creating CustomUsers
@@ -133,7 +236,340 @@ class CustomUserViewSet(viewsets.ModelViewSet):
 
     queryset = CustomUser.objects.all()
     serializer_class = CustomUserSerializer
+    authentication_classes = STATELESS_AUTHENTICATION_CLASSES
+    # Writes load the requesting admin instead of trusting token claims.
+    write_authentication_classes = (
+        api_settings.DEFAULT_AUTHENTICATION_CLASSES)
     permission_classes = (IsAdminUser,)
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['phone_number', 'email', 'is_active', 'is_staff']
+    filter_backends = [
+        DjangoFilterBackend, UserSearchFilter, filters.OrderingFilter]
+    # Each filter and ordering is served by an index of CustomUser; check
+    # the query plans with the explain_user_list command.
+    filterset_fields = {
+        'phone_number': ['exact'],
+        'email': ['exact', 'iexact'],
+        'is_active': ['exact'],
+        'is_staff': ['exact'],
+    }
     ordering_fields = ['email', 'date_joined']
+    ordering = ['-id']
+    pagination_class = UserCursorPagination
+    import_batch_size = 1000
+    # The number of users fetched and serialized per round trip when
+    # streaming the list.
+    stream_chunk_size = 2000
+
+    # The actions answered with CustomUserReadSerializer, whose fields can
+    # be narrowed with the fields query parameter.
+    read_actions = ("list", "retrieve")
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        # condition() labels every response it lets through, but only a
+        # successful one represents the users the ETag was computed for.
+        if response.status_code not in (
+                status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response.headers.pop("ETag", None)
+        return response
+
+    def get_authenticators(self):
+        if self.request.method in permissions.SAFE_METHODS:
+            return super().get_authenticators()
+        return [auth() for auth in self.write_authentication_classes]
+
+    def get_fields(self):
+        """
+        Returns the fields named by the comma separated fields query
+        parameter, in their usual order, or None for all of them.
+        """
+        names = self.request.query_params.get("fields", "")
+        names = {name.strip() for name in names.split(",") if name.strip()}
+        if not names:
+            return None
+        available = CustomUserReadSerializer.get_field_names()
+        unknown = names.difference(available)
+        if unknown:
+            raise serializers.ValidationError(
+                {"fields": [f"Unknown fields: {', '.join(sorted(unknown))}."]})
+        return tuple(name for name in available if name in names)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in self.read_actions:
+            return queryset
+        fields = (self.get_fields()
+                  or CustomUserReadSerializer.get_field_names())
+        # Groups and permissions are read by the serializer.
+        columns = [name for name in fields
+                   if not CustomUser._meta.get_field(name).many_to_many]
+        # Pagination reads the ordering fields of the first and last user.
+        ordering = filters.OrderingFilter().get_ordering(
+            self.request, queryset, self) or ()
+        columns.extend(name.lstrip("-") for name in ordering)
+        return queryset.only(*columns)
+
+    def get_serializer_class(self):
+        if self.action in self.read_actions:
+            return CustomUserReadSerializer
+        return super().get_serializer_class()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in self.read_actions:
+            context["fields"] = self.get_fields()
+        return context
+
+    @method_decorator(condition(etag_func=user_list_etag))
+    def list(self, request, *args, **kwargs):
+        """
+        Lists the filtered users, with the fields named by the fields
+        query parameter, a page at a time or, with the stream query
+        parameter set to "ndjson" or "json", all of them in one streamed
+        response, read with a server-side cursor so memory use does not
+        grow with the number of users.
+
+        Pages are cached until any user changes, and answered with 304
+        Not Modified when the ETag sent in If-None-Match is current, as
+        long as the cache holding the versions is shared.
+        """
+        stream = request.query_params.get("stream")
+        if stream is None:
+            # The version is read before the query, so the page is never
+            # cached under a version newer than its data.
+            version = get_version()
+            if version is None:
+                return super().list(request, *args, **kwargs)
+            key = "accounts:users:page:" + _representation_key(
+                request, version)
+            data = cache.get(key)
+            if data is not None:
+                return Response(data)
+            response = super().list(request, *args, **kwargs)
+            cache.set(key, response.data, settings.USER_LIST_CACHE_TIMEOUT)
+            return response
+        if stream not in STREAM_CONTENT_TYPES:
+            return Response(
+                {"stream": [f"Unknown format {stream!r}."]},
+                status=status.HTTP_400_BAD_REQUEST)
+        return StreamingHttpResponse(
+            self.stream_users(
+                self.filter_queryset(self.get_queryset()), stream),
+            content_type=STREAM_CONTENT_TYPES[stream],
+        )
+
+    @method_decorator(condition(etag_func=user_etag))
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Returns a user, or 304 Not Modified when the ETag sent in
+        If-None-Match is current.
+        """
+        return super().retrieve(request, *args, **kwargs)
+
+    def stream_users(self, queryset, stream):
+        """
+        Serializes users stream_chunk_size at a time.
+
+        Args:
+            queryset (QuerySet): The users to serialize.
+            stream (str): "ndjson" for one JSON object per line, or
+                "json" for a single JSON array.
+
+        Yields:
+            The response body, one chunk of users at a time.
+        """
+        users = queryset.iterator(chunk_size=self.stream_chunk_size)
+        separator = "\n" if stream == "ndjson" else ","
+        first = True
+        if stream == "json":
+            yield "["
+        while True:
+            chunk = list(itertools.islice(users, self.stream_chunk_size))
+            if not chunk:
+                break
+            text = separator.join(
+                json.dumps(data, cls=JSONEncoder)
+                for data in self.get_serializer(chunk, many=True).data)
+            if stream == "ndjson":
+                yield text + "\n"
+            else:
+                yield text if first else separator + text
+            first = False
+        if stream == "json":
+            yield "]"
+
+    def get_file_format(self, content_type=None):
+        file_format = self.request.query_params.get("file_format")
+        if file_format is None and content_type:
+            file_format = next(
+                (name for name, value in CONTENT_TYPES.items()
+                 if content_type.startswith(value)), None)
+        return file_format or "csv"
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_users(self, request):
+        """
+        Creates users from the CSV or NDJSON request body, read as it is
+        received. The format is taken from the file_format query
+        parameter or the content type, CSV by default. Bodies larger than
+        USER_IMPORT_MAX_SIZE bytes are refused before any is read.
+        """
+        file_format = self.get_file_format(request.content_type)
+        if file_format not in CONTENT_TYPES:
+            return Response(
+                {"file_format": [f"Unknown format {file_format!r}."]},
+                status=status.HTTP_400_BAD_REQUEST)
+        size = int(request.META.get("CONTENT_LENGTH") or 0)
+        if size > settings.USER_IMPORT_MAX_SIZE:
+            return Response(
+                {"detail": f"The file is larger than "
+                           f"{settings.USER_IMPORT_MAX_SIZE} bytes; import "
+                           f"it with the import_users command."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        stream = codecs.getreader("utf-8")(request.stream or io.BytesIO())
+        report = import_users(
+            read_rows(stream, file_format),
+            get_password_hashing_pool(),
+            self.import_batch_size,
+        )
+        return Response(report, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export_users(self, request):
+        """
+        Streams the filtered users as CSV or NDJSON, chosen with the
+        file_format query parameter, CSV by default.
+        """
+        file_format = self.get_file_format()
+        if file_format not in CONTENT_TYPES:
+            return Response(
+                {"file_format": [f"Unknown format {file_format!r}."]},
+                status=status.HTTP_400_BAD_REQUEST)
+        response = StreamingHttpResponse(
+            export_users(
+                self.filter_queryset(self.get_queryset()), file_format),
+            content_type=CONTENT_TYPES[file_format],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="users.{file_format}"')
+        return response
+
+
+class HistoryListAPIView(generics.ListAPIView):
+    """
+    Base API view listing the history of the requesting user, newest
+    first, with cursor pagination.
+    """
+
+    model = None
+    # Interned values joined in so serializing a page takes one query.
+    related_fields = ()
+    authentication_classes = STATELESS_AUTHENTICATION_CLASSES
+    permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = HistoryCursorPagination
+
+    def get_queryset(self):
+        return self.model.objects.filter(
+            user_id=self.request.user.pk).select_related(
+                *self.related_fields)
+
+
+class UserVisitHistoryAPIView(HistoryListAPIView):
+    """
+    API view listing the user's visit history.
+    """
+
+    model = UserVisitHistory
+    related_fields = ("user_agent_ref",)
+    serializer_class = UserVisitHistorySerializer
+
+
+class LoginHistoryTrailAPIView(HistoryListAPIView):
+    """
+    API view listing the user's login history trail.
+    """
+
+    model = LoginHistoryTrail
+    related_fields = ("user_agent_ref", "location_ref")
+    serializer_class = LoginHistoryTrailSerializer
+
+
+class LoginAttemptsHistoryAPIView(HistoryListAPIView):
+    """
+    API view listing the user's login attempts.
+    """
+
+    model = LoginAttemptsHistory
+    related_fields = ("user_agent_ref", "location_ref")
+    serializer_class = LoginAttemptsHistorySerializer
+
+
+class ExtraDataAPIView(HistoryListAPIView):
+    """
+    API view listing the extra data recorded about the user's activity.
+    """
+
+    model = ExtraData
+    related_fields = ("browser_ref", "device_ref", "os_ref", "location_ref")
+    serializer_class = ExtraDataSerializer
+
+
+class LoginTokenObtainPairView(TokenObtainPairView):
+    """
+    API view issuing JWT tokens, with a lockout after repeated failures.
+
+    Failures are counted per account and per IP address in the cache, so
+    a locked out request is rejected before any database query. Every
+    attempt is recorded as a LoginEvent by a Celery task; attempts that
+    cannot be queued, while the broker is down, are logged and dropped
+    rather than failing the login.
+    """
+
+    serializer_class = ClaimsTokenObtainPairSerializer
+
+    def post(self, request, *args, **kwargs):
+        username = str(request.data.get(CustomUser.USERNAME_FIELD, ""))
+        ip_address = get_client_ip(request)
+        throttle = LoginThrottle()
+
+        wait = throttle.locked_for(username, ip_address)
+        if wait:
+            raise Throttled(wait)
+
+        try:
+            response = super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            throttle.failed(username, ip_address)
+            self.record(request, username, ip_address, successful=False)
+            raise
+        throttle.succeeded(username)
+        self.record(request, username, ip_address, successful=True)
+        return response
+
+    def record(self, request, username, ip_address, successful):
+        attempt = (
+            username,
+            successful,
+            ip_address,
+            request.META.get("HTTP_USER_AGENT", ""),
+            timezone.now().isoformat(),
+        )
+        transaction.on_commit(lambda: self.enqueue(attempt))
+
+    @staticmethod
+    def enqueue(attempt):
+        try:
+            record_login_attempt.delay(*attempt)
+        except OperationalError:
+            db_logger.exception(
+                "Login attempt of %s from %s not recorded", attempt[0],
+                attempt[2])
+
+
+class TokenRevokeView(TokenViewBase):
+    """
+    API view revoking a refresh token, for example on logout. The token
+    can no longer be refreshed or verified.
+    """
+
+    serializer_class = TokenRevokeSerializer
@@ -0,0 +1,208 @@
+import atexit
+import collections
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection
+from django.utils import timezone
+
+from .models import CustomUser, UserVisitHistory
+
+db_logger = logging.getLogger("db")
+
+
+class VisitBuffer:
+    """
+    Bounded in-process buffer of page visits that are written to
+    UserVisitHistory in batches.
+
+    Recording a visit only appends a tuple to a deque. Once the buffer is
+    full, new visits are dropped and counted instead of blocking the
+    request. The buffer is drained with bulk_create, batch_size rows at a
+    time, whenever a batch is full or flush_interval seconds have passed
+    since the last flush. A timer thread also flushes the buffer
+    flush_interval seconds after a visit arrives in an empty buffer, so
+    visits are written even when no further request finishes.
+
+    Attributes:
+        dropped: The number of visits rejected because the buffer was full.
+        written: The number of visits written to the database.
+        failed: The number of visits lost because a batch insert failed or
+            their user was deleted before they were written.
+    """
+
+    def __init__(self, capacity, batch_size, flush_interval):
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self._visits = collections.deque()
+        self._drop_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._timer = None
+        self._timer_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._visits)
+
+    def append(self, user_id, url, referer, user_agent):
+        """
+        Records a visit.
+
+        Returns:
+            True if the visit was buffered, False if it was dropped.
+        """
+        if len(self._visits) >= self.capacity:
+            with self._drop_lock:
+                self.dropped += 1
+            return False
+        self._visits.append(
+            (user_id, timezone.now(), url, referer, user_agent))
+        if self._timer is None:
+            self._start_timer()
+        return True
+
+    def flush_due(self):
+        """
+        Whether a full batch is waiting or the flush interval has passed.
+        """
+        pending = len(self._visits)
+        return pending >= self.batch_size or bool(
+            pending
+            and time.monotonic() - self._last_flush >= self.flush_interval
+        )
+
+    def flush(self):
+        """
+        Writes the buffered visits to the database in batches. Returns
+        immediately if another thread is already flushing.
+
+        Returns:
+            The number of visits written.
+        """
+        if not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            written = 0
+            for _ in range(len(self._visits) // self.batch_size + 1):
+                batch = self._drain(self.batch_size)
+                if not batch:
+                    break
+                written += self._write(batch)
+            self.written += written
+            self._last_flush = time.monotonic()
+            return written
+        finally:
+            self._flush_lock.release()
+
+    def stats(self):
+        """
+        Returns the buffer counters as a dict.
+        """
+        return {
+            "pending": len(self._visits),
+            "dropped": self.dropped,
+            "written": self.written,
+            "failed": self.failed,
+        }
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._visits.popleft())
+            except IndexError:
+                break
+        return batch
+
+    def _write(self, batch):
+        """
+        Inserts drained visits. If the insert fails, the visits of users
+        deleted since they were recorded are discarded and the others are
+        inserted once more.
+
+        Returns:
+            The number of visits written.
+        """
+        try:
+            try:
+                UserVisitHistory.objects.bulk_create(self._build(batch))
+            except IntegrityError:
+                user_ids = set(CustomUser.objects.filter(
+                    pk__in={visit[0] for visit in batch},
+                ).values_list("pk", flat=True))
+                kept = [visit for visit in batch if visit[0] in user_ids]
+                if len(kept) == len(batch):
+                    raise
+                db_logger.warning(
+                    "Discarded %d visits of deleted users",
+                    len(batch) - len(kept))
+                self.failed += len(batch) - len(kept)
+                batch = kept
+                UserVisitHistory.objects.bulk_create(self._build(batch))
+        except DatabaseError:
+            self.failed += len(batch)
+            db_logger.exception("Could not write %d user visits", len(batch))
+            return 0
+        return len(batch)
+
+    def _build(self, batch):
+        # Interning the user agents may query the database as well.
+        return [
+            UserVisitHistory(
+                user_id=user_id,
+                timestamp=timestamp,
+                url=url,
+                referer=referer,
+                user_agent=user_agent,
+            )
+            for user_id, timestamp, url, referer, user_agent in batch
+        ]
+
+    def _start_timer(self):
+        with self._timer_lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(
+                self.flush_interval, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self):
+        with self._timer_lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # The timer thread's connection is never reused.
+            connection.close()
+        if self._visits:
+            self._start_timer()
+
+
+_visit_buffer = None
+_visit_buffer_lock = threading.Lock()
+
+
+def get_visit_buffer():
+    """
+    Returns the process-wide VisitBuffer, configured from the
+    VISIT_BUFFER_SIZE, VISIT_FLUSH_BATCH_SIZE and VISIT_FLUSH_INTERVAL
+    settings. The buffer is flushed once more when the process exits.
+    """
+    global _visit_buffer
+    if _visit_buffer is None:
+        with _visit_buffer_lock:
+            if _visit_buffer is None:
+                _visit_buffer = VisitBuffer(
+                    capacity=settings.VISIT_BUFFER_SIZE,
+                    batch_size=settings.VISIT_FLUSH_BATCH_SIZE,
+                    flush_interval=settings.VISIT_FLUSH_INTERVAL,
+                )
+                atexit.register(_visit_buffer.flush)
+    return _visit_buffer
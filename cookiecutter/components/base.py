@@ -29,7 +29,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
-    "django.contrib.sessions.middleware.SessionMiddleware",
+    "apps.accounts.middleware.PathSessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -57,6 +57,44 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "cookiecutter.wsgi.application"
 
+# Password hashers by profile. The first hasher of the selected profile
+# hashes new passwords; the others only verify existing hashes, which are
+# upgraded to the first hasher when their user logs in.
+PASSWORD_HASHER_PROFILES = {
+    "pbkdf2": [
+        "apps.accounts.hashers.PBKDF2PasswordHasher",
+        "apps.accounts.hashers.Argon2PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+        "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+        "django.contrib.auth.hashers.ScryptPasswordHasher",
+    ],
+    "argon2": [
+        "apps.accounts.hashers.Argon2PasswordHasher",
+        "apps.accounts.hashers.PBKDF2PasswordHasher",
+        "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+        "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+        "django.contrib.auth.hashers.ScryptPasswordHasher",
+    ],
+}
+PASSWORD_HASHING_PROFILE = config("PASSWORD_HASHING_PROFILE", default="pbkdf2")
+PASSWORD_HASHERS = PASSWORD_HASHER_PROFILES[PASSWORD_HASHING_PROFILE]
+
+# Changing a cost rehashes each password at the next login of its user.
+PASSWORD_PBKDF2_ITERATIONS = 600000
+PASSWORD_ARGON2_TIME_COST = 2
+PASSWORD_ARGON2_MEMORY_COST = 102400  # KiB
+PASSWORD_ARGON2_PARALLELISM = 8
+
+# Set to "thread" or "process" to hash passwords on a pool of
+# PASSWORD_HASHING_WORKERS workers instead of the request thread.
+PASSWORD_HASHING_POOL = None
+PASSWORD_HASHING_WORKERS = 2
+
+# Largest body, in bytes, accepted by the user import endpoint, which
+# hashes the passwords during the request. Larger files are imported with
+# the import_users management command.
+USER_IMPORT_MAX_SIZE = 1024 * 1024
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",  # noqa
@@ -85,9 +123,7 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.SessionAuthentication",
-        "rest_framework.authentication.TokenAuthentication",
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "apps.accounts.authentication.SchemeAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework_simplejwt.authentication.JWTAuthentication",
@@ -100,6 +136,11 @@ REST_FRAMEWORK = {
     "DEFAULT_PARSER_CLASSES": [
         "rest_framework.parsers.JSONParser",
     ],
+    # Number of reverse proxies (Nginx) in front of the application. The
+    # client IP, used by throttles and the login lockout, is read from
+    # X-Forwarded-For as set by the outermost of them; use 0 when the
+    # application is reached directly.
+    "NUM_PROXIES": config("NUM_PROXIES", default=1, cast=int),
 }
 
 SPECTACULAR_SETTINGS = {
@@ -118,6 +159,28 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERYD_MAX_TASKS_PER_CHILD = 1000
 CELERY_TASK_RESULT_EXPIRES = 60 * 60 * 24
+CELERY_BEAT_SCHEDULE = {
+    "sweep-expired-otps": {
+        "task": "apps.accounts.tasks.sweep_expired_otps",
+        "schedule": timedelta(minutes=5),
+    },
+    "enrich-locations": {
+        "task": "apps.accounts.tasks.enrich_locations",
+        "schedule": timedelta(minutes=5),
+    },
+    "flush-last-logins": {
+        "task": "apps.accounts.tasks.flush_last_logins",
+        "schedule": timedelta(minutes=1),
+    },
+    "purge-revoked-tokens": {
+        "task": "apps.accounts.tasks.purge_revoked_tokens",
+        "schedule": timedelta(days=1),
+    },
+    "maintain-history-partitions": {
+        "task": "apps.accounts.tasks.maintain_history_partitions",
+        "schedule": timedelta(days=1),
+    },
+}
 
 LOGGING = {
     'version': 1,
@@ -151,12 +214,98 @@ LOGGING = {
 
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
+AUTHENTICATION_BACKENDS = [
+    "apps.accounts.backends.CachedPermissionBackend",
+]
+# Permission sets are cached per user and invalidated on change; bump the
+# version to discard every cached set at once.
+PERMISSION_CACHE_TIMEOUT = 60 * 60
+PERMISSION_CACHE_VERSION = 1
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1*15),
-    "UPDATE_LAST_LOGIN": True,
+    "UPDATE_LAST_LOGIN": False,
+    "TOKEN_OBTAIN_SERIALIZER":
+        "apps.accounts.serializers.ClaimsTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER":
+        "apps.accounts.serializers.RevocableTokenRefreshSerializer",
+    "TOKEN_VERIFY_SERIALIZER":
+        "apps.accounts.serializers.RevocableTokenVerifySerializer",
+}
+# Revoked tokens are checked against a Bloom filter shared through the
+# cache, sized for REVOCATION_FILTER_CAPACITY tokens. Other processes see a
+# revocation within REVOCATION_SYNC_INTERVAL seconds.
+REVOCATION_FILTER_CAPACITY = 100000
+REVOCATION_FILTER_ERROR_RATE = 0.001
+REVOCATION_SYNC_INTERVAL = 5  # seconds
+
+# Token logins buffer last_login in the cache; the flush-last-logins task
+# writes it to the database in batches. Unflushed logins expire after
+# LAST_LOGIN_BUFFER_TIMEOUT seconds.
+LAST_LOGIN_BUFFER_TIMEOUT = 60 * 60 * 24
+LAST_LOGIN_FLUSH_BATCH_SIZE = 1000
+
+# How long the auth_version of a user checked by StatelessJWTAuthentication
+# is cached; it is updated in place when it changes.
+AUTH_VERSION_CACHE_TIMEOUT = 60 * 60
+
+# How long the versions behind the ETags of users are cached; an expired
+# version is replaced, which only costs clients a full response. Pages of
+# the user list are cached for USER_LIST_CACHE_TIMEOUT at most, and
+# outdated as soon as any user changes.
+USER_VERSION_CACHE_TIMEOUT = 60 * 60 * 24
+USER_LIST_CACHE_TIMEOUT = 60 * 5
+
+# Paginated lists count at most this many rows; an unfiltered PostgreSQL
+# table of more rows is counted from the planner's estimate instead.
+ESTIMATED_COUNT_LIMIT = 10000
+
+# Failed logins at login/token/ are counted in the cache over a sliding
+# window; past either limit the endpoint answers 429 until it slides by.
+LOGIN_FAILURE_WINDOW = 15 * 60
+LOGIN_MAX_FAILURES_PER_USER = 5
+LOGIN_MAX_FAILURES_PER_IP = 50
+
+# Path to a MaxMind City or Country database (requires maxminddb) used
+# by the enrich-locations task to fill in the location of login events.
+GEOIP_DATABASE = config("GEOIP_DATABASE", default="")
+GEOIP_CACHE_SIZE = 65536
+GEOIP_BATCH_SIZE = 1000
+GEOIP_MAX_BATCHES = 100
+
+# Authorization header schemes and the authenticator SchemeAuthentication
+# hands each of them to. Requests without the header use the session.
+AUTHENTICATION_SCHEMES = {
+    "Bearer": "rest_framework_simplejwt.authentication.JWTAuthentication",
 }
 
+# URL prefixes served to API clients only. PathSessionMiddleware does not
+# load or save sessions for them.
+SESSIONLESS_PATH_PREFIXES = ["/accounts/", "/login/", "/api/"]
+
+# Use "apps.accounts.otp_backends.CacheOTPBackend" to verify OTPs
+# against the cache instead of the database.
+OTP_VERIFICATION_BACKEND = "apps.accounts.otp_backends.DatabaseOTPBackend"
+
+# Expired and used OTPs are cleaned up by the sweep-expired-otps task.
+OTP_RETENTION = timedelta(days=1)
+OTP_SWEEP_BATCH_SIZE = 1000
+OTP_SWEEP_MAX_BATCHES = 100
+
+# Add "apps.accounts.middleware.UserVisitMiddleware" to MIDDLEWARE to
+# record a UserVisitHistory row for every authenticated request. Visits are
+# buffered in memory and written in batches after the response is sent.
+VISIT_BUFFER_SIZE = 10000
+VISIT_FLUSH_BATCH_SIZE = 2000
+VISIT_FLUSH_INTERVAL = 5  # seconds
+
+# On PostgreSQL the history tables are partitioned by month. Partitions are
+# created this many months ahead, and partitions older than the retention
+# period are dropped. Set HISTORY_RETENTION_MONTHS to None to keep them.
+HISTORY_PARTITIONS_AHEAD = 3
+HISTORY_RETENTION_MONTHS = 12
+
 CORS_ALLOW_ALL_ORIGINS = False
 
 CORS_ALLOWED_ORIGINS = [
@@ -168,6 +317,11 @@ CORS_ALLOWED_ORIGIN_REGEXES = [
     r"^https://\w+\.example\.com$",  # add custom domain
 ]
 
+# The production settings use Redis. The local memory cache of the other
+# settings is not shared between processes, so buffered last logins are
+# written right away, every refresh token and permission check is looked
+# up in the database and user responses get no ETag there; "check
+# --deploy" fails with it.
 # CACHES = {
 #     "default": {
 #         "BACKEND": "django.core.cache.backends.redis.RedisCache",
@@ -23,6 +23,15 @@ MEDIA_URL = f"//{AWS_CLOUDFRONT_DOMAIN}/{MEDIAFILES_LOCATION}/"
 CELERY_BROKER_URL = "redis://redis:6379"
 CELERY_RESULT_BACKEND = "redis://redis:6379"
 
+# Shared by every web and Celery worker: the login lockout, revoked tokens,
+# buffered last logins and user versions rely on it.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": config("CACHE_URL", default="redis://redis:6379/1"),
+    }
+}
+
 
 DATABASES = {
     "default": {
@@ -3,24 +3,25 @@ from django.urls import path, re_path, include
 from django.conf import settings
 from django.views.static import serve
 
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from rest_framework_simplejwt.views import TokenRefreshView
 from rest_framework_simplejwt.views import TokenVerifyView
 from drf_spectacular.views import SpectacularAPIView
 from drf_spectacular.views import SpectacularRedocView
 
+from apps.accounts.views import LoginTokenObtainPairView, TokenRevokeView
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("accounts/", include("apps.accounts.urls")),
     path("login/token/",
-         TokenObtainPairView.as_view(), name="token_obtain_pair"),
+         LoginTokenObtainPairView.as_view(), name="token_obtain_pair"),
     path("login/token/refresh/",
          TokenRefreshView.as_view(), name="token_refresh"),
     path("login/token/verify/",
          TokenVerifyView.as_view(), name="token_verify"),
+    path("login/token/revoke/",
+         TokenRevokeView.as_view(), name="token_revoke"),
     path('api/schema/',
          SpectacularAPIView.as_view(), name='schema'),
     path('',